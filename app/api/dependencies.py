@@ -7,14 +7,20 @@
 @Date    ：2025-04-04 16:53:53
 """
 from typing import Dict, Any, Annotated
+from app.core.config import config
 from app.core.security import jwt_manager
+from app.core.revocation import revocation_index
+from app.core.rate_limit import auth_rate_limiter
+from app.schemas.request.auth import LoginUser
 from app.enums.status_code import StatusCode
 from app.exceptions.custom import AuthException
+from app.utils.data_loader import DataLoader
 from app.utils.request_util import request_util
+from app.core.principal_cache import principal_cache
 from app.schemas.security import DecodeTokenData
 from app.services.auth_service import AuthService
 from app.services.user_service import UserService
-from app.repositories.user_repo import UserRepository
+from app.repositories.backend import UserRepositoryProtocol, create_user_repo
 from fastapi import Request, Depends, HTTPException, Security, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -38,14 +44,18 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     try:
-        decoded_data = jwt_manager.decode_token(credentials.credentials)
-        if decoded_data.type != "access":
-            raise AuthException(
-                code=StatusCode.TOKEN_TYPE_ERROR.get_code(),
-                message=StatusCode.TOKEN_TYPE_ERROR.get_message()
-            )
-        user = await UserRepository.get_user_by_id(decoded_data.user_id, True)
-        if not user or credentials.credentials !=  user.get('access_token'):
+        # 命中缓存时跳过 token 解析
+        decoded_data = principal_cache.get(credentials.credentials)
+        if decoded_data is None:
+            decoded_data = jwt_manager.decode_token(credentials.credentials)
+            if decoded_data.type != "access":
+                raise AuthException(
+                    code=StatusCode.TOKEN_TYPE_ERROR.get_code(),
+                    message=StatusCode.TOKEN_TYPE_ERROR.get_message()
+                )
+            principal_cache.set(credentials.credentials, decoded_data)
+        # 吊销校验只查内存索引，不读取用户文档
+        if revocation_index.is_revoked(decoded_data):
             raise AuthException(code=StatusCode.TOKEN_INVALID.get_code(),
                                 message=StatusCode.TOKEN_INVALID.get_message())
         return decoded_data
@@ -57,15 +67,29 @@ async def get_current_user(
         )
 
 
-async def get_user_repo() -> UserRepository:
+async def get_current_admin(current_user: DecodeTokenData = Depends(get_current_user)) -> DecodeTokenData:
     """
-    获取用户数据库操作实例
-    :return: UserRepository
+    依赖函数：校验当前用户是否为管理员
+    :param current_user: 当前用户
+    :return: DecodeTokenData
+    """
+    if current_user.role_id != config.PROJECT_ADMIN_ROLE_ID:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=StatusCode.FORBIDDEN.get_message(),
+        )
+    return current_user
+
+
+async def get_user_repo() -> UserRepositoryProtocol:
+    """
+    获取用户数据库操作实例，按 REPOSITORY_BACKEND 选择实现，mongo 后端启用用户缓存时返回带缓存的实现
+    :return: UserRepositoryProtocol
     """
-    return UserRepository()
+    return create_user_repo()
 
 
-async def get_auth_service(repo: UserRepository = Depends(get_user_repo)) -> AuthService:
+async def get_auth_service(repo: UserRepositoryProtocol = Depends(get_user_repo)) -> AuthService:
     """
     获取授权服务实例
     :param repo: 用户数据库操作实例
@@ -73,13 +97,24 @@ async def get_auth_service(repo: UserRepository = Depends(get_user_repo)) -> Aut
     """
     return AuthService(repo)
 
-async def get_user_service(repo: UserRepository = Depends(get_user_repo)) -> UserService:
+async def get_user_loader(repo: UserRepositoryProtocol = Depends(get_user_repo)) -> DataLoader[str, Dict[str, Any]]:
+    """
+    获取请求级用户加载器，同一请求内依赖缓存保证只创建一次
+    :param repo: 用户数据库操作实例
+    :return: 按 user_id 批量加载用户的 DataLoader
+    """
+    return DataLoader(repo.get_users_by_ids, name="user")
+
+
+async def get_user_service(repo: UserRepositoryProtocol = Depends(get_user_repo),
+                           user_loader: DataLoader = Depends(get_user_loader)) -> UserService:
     """
     获取用户服务实例
     :param repo: 用户数据库操作实例
+    :param user_loader: 请求级用户加载器
     :return: UserService
     """
-    return UserService(repo)
+    return UserService(repo, user_loader)
 
 
 async def get_request_info(request: Request) -> Dict[str, Any]:
@@ -89,3 +124,25 @@ async def get_request_info(request: Request) -> Dict[str, Any]:
     """
     request_info = await request_util.get_request_info(request)
     return request_info.model_dump()
+
+
+async def login_rate_limit(user_data: LoginUser, request: Request) -> None:
+    """
+    依赖函数：登录限流，按 IP 与邮箱分别计数，在查询数据库和校验密码之前拒绝超限请求
+    :param user_data: 登录数据
+    :param request: 请求对象
+    :return: None
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    await auth_rate_limiter.hit("login_ip", client_ip)
+    await auth_rate_limiter.hit("login_email", user_data.email)
+
+
+async def register_rate_limit(request: Request) -> None:
+    """
+    依赖函数：注册限流，按 IP 计数
+    :param request: 请求对象
+    :return: None
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    await auth_rate_limiter.hit("register_ip", client_ip)
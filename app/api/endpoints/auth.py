@@ -8,29 +8,32 @@
 """
 from typing import Annotated
 from fastapi import APIRouter, Depends
-from app.schemas.response import Response
+from app.schemas.response import Response, ApiResponse
 from app.schemas.security import DecodeTokenData
 from app.services.auth_service import AuthService
-from app.api.dependencies import get_auth_service, get_request_info, get_current_user
-from app.schemas.request.auth import RegisterUser, LoginUser, RefreshToken
+from app.schemas.request.auth import RegisterUser, LoginUser, RefreshToken, RevokeRole
+from app.api.dependencies import get_auth_service, get_request_info, get_current_user, get_current_admin, \
+    login_rate_limit, register_rate_limit
 
 
 auth_router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
-@auth_router.post("/register", summary="注册", response_model=Response, response_model_exclude_none=True)
+@auth_router.post("/register", summary="注册", response_model=Response, response_model_exclude_none=True,
+                  dependencies=[Depends(register_rate_limit)])
 async def register(user_data: RegisterUser, request = Depends(get_request_info),
                    auth_service: AuthService = Depends(get_auth_service)):
     """ 注册用户 """
     result = await auth_service.register(user_data, request)
-    return Response(data=result)
+    return ApiResponse(data=result)
 
 
-@auth_router.post("/login", summary="登录", response_model=Response, response_model_exclude_none=True)
+@auth_router.post("/login", summary="登录", response_model=Response, response_model_exclude_none=True,
+                  dependencies=[Depends(login_rate_limit)])
 async def login(user_data: LoginUser, auth_service: AuthService = Depends(get_auth_service)):
     """ 登录用户 """
     result = await auth_service.login(user_data)
-    return Response(data=result)
+    return ApiResponse(data=result)
 
 
 @auth_router.post("/logout", summary="退出登录", response_model=Response, response_model_exclude_none=True)
@@ -38,11 +41,27 @@ async def logout(current_user: Annotated[DecodeTokenData, Depends(get_current_us
                  auth_service: AuthService = Depends(get_auth_service)):
     """ 退出登录 """
     await auth_service.logout(current_user)
-    return Response()
+    return ApiResponse()
+
+
+@auth_router.post("/logout-all", summary="退出所有设备", response_model=Response, response_model_exclude_none=True)
+async def logout_all(current_user: Annotated[DecodeTokenData, Depends(get_current_user)],
+                     auth_service: AuthService = Depends(get_auth_service)):
+    """ 退出所有设备 """
+    await auth_service.logout_all(current_user)
+    return ApiResponse()
+
+
+@auth_router.post("/revoke-role", summary="按角色吊销token", response_model=Response, response_model_exclude_none=True)
+async def revoke_role(role: RevokeRole, _: Annotated[DecodeTokenData, Depends(get_current_admin)],
+                      auth_service: AuthService = Depends(get_auth_service)):
+    """ 按角色吊销token """
+    await auth_service.revoke_role(role.role_id)
+    return ApiResponse()
 
 
 @auth_router.get('/refresh-token', summary="刷新token", response_model=Response, response_model_exclude_none=True)
 async def refresh_token(token: RefreshToken, auth_service: AuthService = Depends(get_auth_service)):
     """ 刷新token """
     result = await auth_service.refresh_token(token)
-    return Response(data=result)
+    return ApiResponse(data=result)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：system.py
+@Author  ：晴天
+@Date    ：2025-04-16 14:20:08
+"""
+from fastapi import APIRouter, Depends
+from app.core.metrics import metrics
+from app.schemas.security import DecodeTokenData
+from app.api.dependencies import get_current_admin
+from app.schemas.response import Response, ApiResponse
+
+
+system_router = APIRouter(prefix='/system', tags=['System'])
+
+
+@system_router.get('/metrics', summary='获取运行指标', response_model=Response, response_model_exclude_none=True)
+async def get_metrics(_: DecodeTokenData = Depends(get_current_admin)):
+    """ 获取运行指标，包含缓存统计与数据库节点地址，仅管理员可见 """
+    return ApiResponse(data=metrics.snapshot())
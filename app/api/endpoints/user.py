@@ -6,33 +6,44 @@
 @Author  ：晴天
 @Date    ：2025-04-14 14:43:06
 """
-from fastapi import APIRouter, Depends
-from app.schemas.response import Response
+from typing import Optional, Literal
+from app.core.config import config
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.schemas.response import Response, ApiResponse, MSGPACK_RESPONSES
 from app.enums.status_code import StatusCode
 from app.schemas.security import DecodeTokenData
 from app.services.user_service import UserService
 from app.exceptions.custom import BusinessException
-from app.api.dependencies import get_current_user, get_user_service
+from app.api.dependencies import get_current_user, get_current_admin, get_user_service
 
 
 user_router = APIRouter(prefix='/user', tags=['User'])
 
 
-@user_router.get('/get-info', summary='获取用户信息', response_model=Response, response_model_exclude_none=True)
+@user_router.get('/get-info', summary='获取用户信息', response_model=Response, response_model_exclude_none=True,
+                 responses=MSGPACK_RESPONSES)
 async def get_user_info(current_user: DecodeTokenData = Depends(get_current_user),
                         user_service: UserService = Depends(get_user_service)):
     """ 获取用户信息 """
     result = await user_service.get_user_info(user_id=current_user.user_id)
-    return Response(data=result)
+    return ApiResponse(data=result)
 
 
-@user_router.get('/get-user-list', summary='获取用户列表', response_model=Response, response_model_exclude_none=True)
+@user_router.get('/get-user-list', summary='获取用户列表', response_model=Response, response_model_exclude_none=True,
+                 responses=MSGPACK_RESPONSES)
 async def get_user_list(
-        page: int = 1, page_size: int = 10, sort_by: int = 0, _: DecodeTokenData = Depends(get_current_user),
+        page: int = Query(1, ge=1, description="页码，游标分页时忽略"),
+        page_size: int = Query(10, ge=1, le=100, description="每页数量"),
+        sort_by: int = Query(0, ge=0, le=1, description="排序方式 0: 降序, 1: 升序，游标分页时以游标为准"),
+        cursor: Optional[str] = Query(None, max_length=256, description="上一页返回的 next_cursor"),
+        with_total: bool = Query(True, description="是否返回总数，不需要总数时关闭可省去计数查询"),
+        _: DecodeTokenData = Depends(get_current_user),
         user_service: UserService = Depends(get_user_service)):
     """ 获取用户列表 """
-    result = await user_service.get_user_pagination_list(page=page, page_size=page_size, sort_by=sort_by)
-    return Response(data=result)
+    result = await user_service.get_user_pagination_list(page=page, page_size=page_size, sort_by=sort_by,
+                                                         cursor=cursor, with_total=with_total)
+    return ApiResponse(data=result)
 
 
 @user_router.get('/get-user', summary='获取用户信息', response_model=Response, response_model_exclude_none=True)
@@ -44,4 +55,42 @@ async def get_user(user_id: str, _: DecodeTokenData = Depends(get_current_user),
                                 message=StatusCode.USER_ID_NOT_NULL.get_message())
 
     result = await user_service.get_user_info(user_id=user_id)
-    return Response(data=result)
+    return ApiResponse(data=result)
+
+
+@user_router.post('/delete', summary='删除用户', response_model=Response, response_model_exclude_none=True)
+async def delete_user(user_id: str = Query(..., min_length=1, description="用户ID"),
+                      current_admin: DecodeTokenData = Depends(get_current_admin),
+                      user_service: UserService = Depends(get_user_service)):
+    """ 逻辑删除用户，已签发的 token 随之失效，可通过恢复接口撤销 """
+    await user_service.delete_user(user_id=user_id, operator_id=current_admin.user_id)
+    return ApiResponse()
+
+
+@user_router.post('/restore', summary='恢复已删除用户', response_model=Response, response_model_exclude_none=True)
+async def restore_user(user_id: str = Query(..., min_length=1, description="用户ID"),
+                       current_admin: DecodeTokenData = Depends(get_current_admin),
+                       user_service: UserService = Depends(get_user_service)):
+    """ 恢复已删除的用户，已归档的用户从归档集合移回 """
+    result = await user_service.restore_user(user_id=user_id, operator_id=current_admin.user_id)
+    return ApiResponse(data=result)
+
+
+@user_router.get('/export', summary='导出用户', response_class=StreamingResponse)
+async def export_users(
+        export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format", description="导出格式 ndjson / csv"),
+        sort_by: int = Query(0, ge=0, le=1, description="排序方式 0: 降序, 1: 升序"),
+        is_active: Optional[bool] = Query(None, description="按激活状态过滤"),
+        role_id: Optional[str] = Query(None, description="按角色过滤"),
+        batch_size: int = Query(config.EXPORT_BATCH_SIZE, ge=1, le=10000, description="每批读取的文档数"),
+        _: DecodeTokenData = Depends(get_current_admin),
+        user_service: UserService = Depends(get_user_service)):
+    """ 以流式响应导出用户，内存占用与用户总数无关 """
+    filters = {key: value for key, value in {"is_active": is_active, "role_id": role_id}.items() if value is not None}
+    media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        user_service.export_users(export_format=export_format, sort_by=sort_by, filters=filters,
+                                  batch_size=batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{export_format}"'},
+    )
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：well_known.py
+@Author  ：晴天
+@Date    ：2025-04-18 14:05:36
+"""
+from fastapi import APIRouter, Request
+from app.core.key_ring import key_ring
+from starlette.responses import Response as StarletteResponse
+
+
+well_known_router = APIRouter(prefix='/.well-known', tags=['Well-Known'])
+
+
+@well_known_router.get('/jwks.json', summary='获取JWT验签公钥')
+async def get_jwks(request: Request):
+    """ 获取JWT验签公钥，响应体预先序列化，支持 ETag 协商缓存 """
+    headers = {"ETag": key_ring.jwks_etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("If-None-Match") == key_ring.jwks_etag:
+        return StarletteResponse(status_code=304, headers=headers)
+    return StarletteResponse(content=key_ring.jwks_body, media_type="application/json", headers=headers)
@@ -10,6 +10,8 @@ from fastapi import FastAPI
 from app.core.config import config
 from app.api.endpoints.auth import auth_router
 from app.api.endpoints.user import user_router
+from app.api.endpoints.system import system_router
+from app.api.endpoints.well_known import well_known_router
 
 
 def register_routers(app: FastAPI) -> None:
@@ -20,3 +22,6 @@ def register_routers(app: FastAPI) -> None:
     """
     app.include_router(auth_router, prefix=config.PROJECT_API_PREFIX)
     app.include_router(user_router, prefix=config.PROJECT_API_PREFIX)
+    app.include_router(system_router, prefix=config.PROJECT_API_PREFIX)
+    # 标准路径，不加 API 前缀
+    app.include_router(well_known_router)
@@ -8,9 +8,12 @@
 """
 from fastapi import FastAPI
 from app.core.config import config
+from fastapi.responses import ORJSONResponse
 from app.app_lifespan import lifespan
 from app.api.routers import register_routers
 from app.middleware.logging import register_logging_middleware
+from app.middleware.deadline import register_deadline_middleware
+from app.middleware.content_negotiation import register_content_negotiation_middleware
 from app.exceptions.handlers import register_exception_handlers
 
 
@@ -27,7 +30,8 @@ def create_app() -> FastAPI:
         debug=config.PROJECT_DEBUG,
         docs_url=config.PROJECT_DOCS_URL,
         redoc_url=config.PROJECT_REDOC_URL,
-        openapi_url=config.PROJECT_OPENAPI_URL
+        openapi_url=config.PROJECT_OPENAPI_URL,
+        default_response_class=ORJSONResponse,  # 未显式返回响应对象的路由也使用 orjson 序列化
     )
 
     # 注册路由
@@ -36,5 +40,10 @@ def create_app() -> FastAPI:
     register_exception_handlers(app)
     # 注册日志中间件
     register_logging_middleware(app)
+    # 注册响应格式协商中间件
+    if config.RESPONSE_MSGPACK_ENABLED:
+        register_content_negotiation_middleware(app)
+    # 注册请求截止时间中间件，位于最外层
+    register_deadline_middleware(app)
 
     return app
@@ -10,7 +10,14 @@ from fastapi import FastAPI
 from app.core.logger import logger
 from app.core.config import config
 from contextlib import asynccontextmanager
+from app.core.key_ring import key_ring
+from app.core.revocation import revocation_index
+from app.core.user_archive import user_archiver
+from app.core.write_behind import user_write_behind
+from app.core.password_policy import password_policy
 from app.database.mongodb_con import mongodb_manager
+from app.utils.user_id_util import get_id_generator
+from app.utils.encrypt_util import password_hash_pool
 
 
 @asynccontextmanager
@@ -22,7 +29,18 @@ async def lifespan(app: FastAPI):
     """
     logger.info(f"Application startup, current environment: {config.PROJECT_ENV}")
     try:
-        await mongodb_manager.connect()  # 初始化数据库连接
+        await key_ring.start()  # 加载 JWT 签名密钥并启动轮换
+        await password_policy.calibrate()  # 校准密码哈希成本因子
+        get_id_generator()  # 占用ID生成器工作进程ID
+        if config.REPOSITORY_BACKEND == "mongo":
+            await mongodb_manager.connect()  # 初始化数据库连接
+            if config.USER_ARCHIVE_ENABLED:
+                await user_archiver.start()  # 启动已删除用户归档
+        else:
+            logger.warning(f"Repository backend: {config.REPOSITORY_BACKEND}, data is not persisted")
+        await revocation_index.start()  # 加载 token 吊销索引
+        if config.WRITE_BEHIND_ENABLED:
+            await user_write_behind.start()  # 启动最后修改信息的延迟批量写入
         logger.info("Application life cycle initialization successful")
         yield  # 应用运行期间
     except Exception as e:
@@ -30,7 +48,12 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         try:
+            await user_write_behind.stop()  # 写入剩余的延迟更新，需要在关闭数据库连接之前
+            await user_archiver.stop()  # 停止已删除用户归档
+            await revocation_index.stop()  # 停止 token 吊销索引同步
+            await key_ring.stop()  # 停止 JWT 签名密钥轮换
             await mongodb_manager.disconnect()  # 清理数据库连接
+            password_hash_pool.shutdown()  # 关闭密码哈希工作池
             logger.info("Application life cycle shutdown completed")
         except Exception as e:
             logger.error(f"An error occurred while closing the app: {str(e)}")
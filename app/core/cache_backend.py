@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：cache_backend.py
+@Author  ：晴天
+@Date    ：2025-04-22 15:05:48
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Tuple
+
+
+class CacheBackend(Protocol):
+    """ 多进程共享的二级缓存后端，值为序列化后的字节 """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        获取缓存
+        :param key: 键
+        :return: 值，未命中时返回 None
+        """
+        ...
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        """
+        写入缓存
+        :param key: 键
+        :param value: 值
+        :param ttl: 过期时间（秒）
+        :return: None
+        """
+        ...
+
+    async def delete(self, *keys: str) -> None:
+        """
+        删除缓存
+        :param keys: 键
+        :return: None
+        """
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        """ 获取统计信息 """
+        ...
+
+
+class MemoryCacheBackend:
+    """
+    进程内的二级缓存实现
+
+    与共享后端的接口和序列化方式一致，用于开发环境或单进程部署，
+    部署共享缓存服务时替换为对应实现即可，调用方无需修改。
+    """
+
+    def __init__(self, max_size: int = 100000):
+        """ 初始化 """
+        self._max_size = max_size
+        self._data: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+
+    def _pop(self, key: str) -> None:
+        """ 移除条目并更新占用字节数 """
+        value, _ = self._data.pop(key)
+        self._bytes -= len(value)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= time.monotonic():
+            self._pop(key)
+            return None
+        return item[0]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if key in self._data:
+            self._pop(key)
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._bytes += len(value)
+        while len(self._data) > self._max_size:
+            self._pop(next(iter(self._data)))
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            if key in self._data:
+                self._pop(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "bytes": self._bytes}
+
+
+def create_cache_backend(backend: str) -> Optional[CacheBackend]:
+    """
+    按配置创建二级缓存后端
+    :param backend: 后端名称 none / memory
+    :return: CacheBackend，none 时返回 None
+    """
+    if backend == "memory":
+        return MemoryCacheBackend()
+    if backend == "none":
+        return None
+    raise ValueError(f"Invalid cache backend: {backend}")
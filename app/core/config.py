@@ -44,7 +44,27 @@ class Config(BaseSettings):
     PROJECT_SECRET_KEY: str = os.getenv("PROJECT_SECRET_KEY", "secret_key")
     PROJECT_ALGORITHM: str = os.getenv("PROJECT_ALGORITHM", "HS256")
     PROJECT_ACCESS_TOKEN_EXPIRE_DAYS: int = int(os.getenv("PROJECT_ACCESS_TOKEN_EXPIRE_DAYS", 7))
-    PROJECT_REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("PROJECT_REFRESH_TOKEN_EXPIRE_DAYS", 60 * 24 * 7))
+    PROJECT_REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("PROJECT_REFRESH_TOKEN_EXPIRE_DAYS", 30))
+    PROJECT_ADMIN_ROLE_ID: str = os.getenv("PROJECT_ADMIN_ROLE_ID", "admin")
+    # 非对称签名的私钥目录，所有主机必须共享同一目录（例如共享卷），使用 RS256 / EdDSA 时必须配置
+    PROJECT_JWT_KEY_DIR: str | None = os.getenv("PROJECT_JWT_KEY_DIR") or None
+    PROJECT_JWT_KEY_ROTATION_DAYS: int = int(os.getenv("PROJECT_JWT_KEY_ROTATION_DAYS", 30))
+    PROJECT_JWT_KEY_CHECK_SECONDS: float = float(os.getenv("PROJECT_JWT_KEY_CHECK_SECONDS", 60))
+    TOKEN_REVOCATION_SYNC_SECONDS: float = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 5))
+    REQUEST_DEADLINE_SECONDS: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", 10))  # 请求默认时间预算，0 不限制
+    # 按路径覆盖时间预算，"路径=秒数" 逗号分隔，例如 "/api/user/export=300"
+    REQUEST_DEADLINE_ROUTES: str = os.getenv("REQUEST_DEADLINE_ROUTES", "/api/user/export=300")
+    RESPONSE_MSGPACK_ENABLED: bool = os.getenv("RESPONSE_MSGPACK_ENABLED", True)  # 按 Accept 返回 MessagePack
+
+    #================================== ID 生成配置 ==================================#
+    ID_EPOCH_MS: int = int(os.getenv("ID_EPOCH_MS", 1735689600000))  # 2025-01-01 00:00:00 UTC，发号后不可修改
+    ID_WORKER_ID: int | None = int(os.getenv("ID_WORKER_ID")) if os.getenv("ID_WORKER_ID") else None  # 固定工作进程ID
+    # 多主机部署时每台主机的工作进程ID起始值，各主机的 [起始值, 起始值 + ID_WORKER_SLOTS) 不能重叠
+    ID_WORKER_BASE: int | None = int(os.getenv("ID_WORKER_BASE")) if os.getenv("ID_WORKER_BASE") else None
+    # 声明只有一台主机，未配置 ID_WORKER_BASE 时从 0 开始；未声明且未配置起始值时拒绝启动
+    ID_SINGLE_HOST: bool = os.getenv("ID_SINGLE_HOST", "false").lower() in ("1", "true", "yes")
+    ID_WORKER_SLOTS: int = int(os.getenv("ID_WORKER_SLOTS", 8))  # 单台主机最多的工作进程数
+    ID_WORKER_LOCK_DIR: str = os.getenv("ID_WORKER_LOCK_DIR", os.path.join(BASE_DIR, "run"))
 
     # ================================== 路径配置 ==================================#
     LOG_DIR: str = os.path.join(BASE_DIR, "logs")
@@ -61,8 +81,65 @@ class Config(BaseSettings):
     DB_USER: str = quote_plus(os.getenv("DB_USER", "root"))
     DB_PASSWORD: str = quote_plus(os.getenv("DB_PASSWORD", "123456"))
     DB_NAME: str = os.getenv("DB_NAME", "fastapi_template")
-    DB_URI: str = f'mongodb://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}?authSource=admin'
+    DB_REPLICA_SET: str = os.getenv("DB_REPLICA_SET", "")  # 副本集名称，为空时按单节点连接
+    DB_URI: str = (f'mongodb://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}?authSource=admin'
+                   + (f'&replicaSet={DB_REPLICA_SET}' if DB_REPLICA_SET else ''))
     DB_MAX_CONNECTIONS: int = os.getenv("DB_MAX_CONNECTIONS", 50)
+    # 存储后端 mongo / memory，memory 不连接数据库，数据只保存在进程内，用于压测 HTTP 层
+    REPOSITORY_BACKEND: str = os.getenv("REPOSITORY_BACKEND", "mongo")
+    DB_READ_ROUTING_ENABLED: bool = os.getenv("DB_READ_ROUTING_ENABLED", True)  # 关闭时所有读操作走主节点
+    # 覆盖默认读路由，"仓储类.方法=读偏好" 逗号分隔，例如 "UserRepository.get_user_by_id=primary"
+    DB_READ_ROUTES: str = os.getenv("DB_READ_ROUTES", "")
+    DB_READ_MAX_STALENESS_SECONDS: int = int(os.getenv("DB_READ_MAX_STALENESS_SECONDS", 90))  # -1 不限制，否则不小于 90
+    PAGINATION_MAX_SKIP: int = int(os.getenv("PAGINATION_MAX_SKIP", 1000))  # 页码分页允许跳过的最大记录数，更深的页使用游标分页
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", 500))  # 导出时每批从游标读取的文档数
+    # 登录、退出、刷新 token 时写入的最后修改信息延迟批量写入，token 版本号等安全字段仍同步写入
+    WRITE_BEHIND_ENABLED: bool = os.getenv("WRITE_BEHIND_ENABLED", True)
+    WRITE_BEHIND_FLUSH_SECONDS: float = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", 1))  # 定时刷新间隔
+    WRITE_BEHIND_MAX_BATCH: int = int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500))  # 待写入用户数达到该值时立即刷新
+    WRITE_BEHIND_MAX_PENDING: int = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 50000))  # 写入失败时最多保留的待写入用户数
+
+    #================================== 归档配置 ==================================#
+    USER_ARCHIVE_ENABLED: bool = os.getenv("USER_ARCHIVE_ENABLED", True)  # 定期将已删除用户移到 user_archive
+    USER_ARCHIVE_AFTER_DAYS: float = float(os.getenv("USER_ARCHIVE_AFTER_DAYS", 30))  # 删除超过该天数的用户才归档
+    USER_ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("USER_ARCHIVE_INTERVAL_SECONDS", 3600))
+    USER_ARCHIVE_BATCH_SIZE: int = int(os.getenv("USER_ARCHIVE_BATCH_SIZE", 500))
+    USER_ARCHIVE_BATCH_PAUSE_SECONDS: float = float(os.getenv("USER_ARCHIVE_BATCH_PAUSE_SECONDS", 0.5))  # 批次间隔，限制对主节点的写入压力
+
+    #================================== 缓存配置 ==================================#
+    PRINCIPAL_CACHE_ENABLED: bool = os.getenv("PRINCIPAL_CACHE_ENABLED", True)
+    PRINCIPAL_CACHE_MAX_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", 10000))
+    PRINCIPAL_CACHE_TTL_SECONDS: int = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+    SINGLE_FLIGHT_MAX_KEYS: int = int(os.getenv("SINGLE_FLIGHT_MAX_KEYS", 10000))  # 并发合并最多同时进行的 key 数量
+    COUNT_CACHE_ENABLED: bool = os.getenv("COUNT_CACHE_ENABLED", True)
+    COUNT_CACHE_MAX_SIZE: int = int(os.getenv("COUNT_CACHE_MAX_SIZE", 1000))
+    COUNT_CACHE_TTL_SECONDS: int = int(os.getenv("COUNT_CACHE_TTL_SECONDS", 300))
+    # 集合文档数（估算值）超过该值且精确计数未缓存时，分页总数返回估算值
+    COUNT_ESTIMATE_THRESHOLD: int = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", 1000000))
+    USER_CACHE_ENABLED: bool = os.getenv("USER_CACHE_ENABLED", True)
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+    USER_CACHE_TTL_SECONDS: int = int(os.getenv("USER_CACHE_TTL_SECONDS", 30))  # 进程内一级缓存
+    USER_CACHE_L2_BACKEND: str = os.getenv("USER_CACHE_L2_BACKEND", "none")  # 共享二级缓存 none / memory
+    USER_CACHE_L2_TTL_SECONDS: int = int(os.getenv("USER_CACHE_L2_TTL_SECONDS", 300))
+
+    #================================== 密码哈希配置 ==================================#
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # thread / process
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 2))
+    PASSWORD_HASH_ALGORITHM: str = os.getenv("PASSWORD_HASH_ALGORITHM", "bcrypt")  # bcrypt / scrypt
+    PASSWORD_HASH_COST: int | None = int(os.getenv("PASSWORD_HASH_COST")) if os.getenv("PASSWORD_HASH_COST") else None
+    PASSWORD_HASH_TARGET_MS: float = float(os.getenv("PASSWORD_HASH_TARGET_MS", 250))
+
+    #================================== 限流配置 ==================================#
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", True)
+    RATE_LIMIT_STORE: str = os.getenv("RATE_LIMIT_STORE", "memory")  # memory / sqlite
+    RATE_LIMIT_SQLITE_PATH: str = os.getenv("RATE_LIMIT_SQLITE_PATH", os.path.join(BASE_DIR, "logs", "rate_limit.db"))
+    RATE_LIMIT_SHARDS: int = int(os.getenv("RATE_LIMIT_SHARDS", 16))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+    RATE_LIMIT_LOGIN_IP: str = os.getenv("RATE_LIMIT_LOGIN_IP", "20/60")  # 次数/秒数
+    RATE_LIMIT_LOGIN_EMAIL: str = os.getenv("RATE_LIMIT_LOGIN_EMAIL", "5/60")
+    RATE_LIMIT_REGISTER_IP: str = os.getenv("RATE_LIMIT_REGISTER_IP", "10/60")
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：content_negotiation.py
+@Author  ：晴天
+@Date    ：2025-04-25 17:20:36
+"""
+from functools import lru_cache
+from typing import Dict, Optional
+from contextvars import ContextVar, Token
+
+# 支持的响应格式
+JSON = "json"
+MSGPACK = "msgpack"
+
+# Accept 中可识别的媒体类型 -> 响应格式，通配符按 JSON 处理
+ACCEPT_MEDIA_TYPES: Dict[str, str] = {
+    "application/json": JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+# 响应格式 -> 响应的 Content-Type
+RESPONSE_MEDIA_TYPES: Dict[str, str] = {
+    JSON: "application/json",
+    MSGPACK: "application/msgpack",
+}
+
+_current_format: ContextVar[str] = ContextVar("response_format", default=JSON)
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept: Optional[str]) -> str:
+    """
+    按 Accept 请求头选择响应格式：取 q 值最高的可识别类型，q 值相同时取先出现的，没有可识别的类型时返回 JSON。
+    同一服务的调用方 Accept 基本固定，解析结果缓存。
+    :param accept: Accept 请求头，例如 "application/msgpack, application/json;q=0.5"
+    :return: 响应格式 json / msgpack
+    """
+    if not accept:
+        return JSON
+    best, best_q = JSON, -1.0
+    for item in accept.split(","):
+        media_type, _, params = item.partition(";")
+        response_format = ACCEPT_MEDIA_TYPES.get(media_type.strip().lower())
+        if response_format is None:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = response_format, q
+    return best if best_q > 0 else JSON
+
+
+def set_response_format(response_format: str) -> Token:
+    """
+    设置当前请求的响应格式
+    :param response_format: 响应格式
+    :return: 用于恢复的 Token
+    """
+    return _current_format.set(response_format)
+
+
+def reset_response_format(token: Token) -> None:
+    """
+    恢复之前的响应格式
+    :param token: set_response_format 返回的 Token
+    :return: None
+    """
+    _current_format.reset(token)
+
+
+def current_response_format() -> str:
+    """
+    获取当前请求的响应格式
+    :return: 响应格式，请求之外或未协商时为 JSON
+    """
+    return _current_format.get()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：count_cache.py
+@Author  ：晴天
+@Date    ：2025-04-21 14:52:16
+"""
+import json
+import time
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.cache_util import LRUCache
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+
+class CountCache:
+    """
+    分页总数缓存
+
+    以规范化后的过滤条件为键缓存 count_documents 的结果。创建、软删除等写操作通过 apply_change
+    按变更前后的文档增量修正已缓存的计数：只含等值条件的过滤器直接加减，含操作符的过滤器无法在内存中判断，直接失效。
+    集合估算文档数超过 estimate_threshold 时，基准过滤条件（estimate_filters）直接返回集合估算值，不再执行精确计数；
+    集合估算值包含软删除等所有文档，因此只用于基准条件，其它过滤条件最多计数到 estimate_threshold，
+    达到上限时返回该上限并标记为估算值。
+    缓存只在当前进程内生效，多进程部署下其它进程的写入最多在 TTL 秒后体现。
+    """
+
+    def __init__(self, name: str, max_size: int = config.COUNT_CACHE_MAX_SIZE,
+                 ttl: int = config.COUNT_CACHE_TTL_SECONDS,
+                 estimate_threshold: int = config.COUNT_ESTIMATE_THRESHOLD,
+                 estimate_filters: Optional[Dict[str, Any]] = None,
+                 enabled: bool = config.COUNT_CACHE_ENABLED):
+        """
+        初始化
+        :param name: 名称，用于指标
+        :param max_size: 最多缓存的过滤条件数
+        :param ttl: 缓存时间（秒）
+        :param estimate_threshold: 集合估算文档数超过该值时不再精确计数，0 表示始终精确计数
+        :param estimate_filters: 可以用集合估算值代替计数的基准过滤条件
+        :param enabled: 是否启用
+        """
+        self._name = name
+        self._ttl = ttl
+        self._estimate_threshold = estimate_threshold
+        self._estimate_key = self.normalize(estimate_filters) if estimate_filters is not None else None
+        self._enabled = enabled
+        # 值为 [过滤条件, 计数]，增量修正时原地修改，不重置过期时间
+        self._cache = LRUCache(max_size=max_size, default_ttl=ttl)
+        self._estimate: Optional[Tuple[int, float]] = None
+        # 每次写入变更递增，计数期间发生变更时不缓存结果
+        self._generation = 0
+        self.estimated = 0
+
+    @staticmethod
+    def normalize(filters: Dict[str, Any]) -> str:
+        """
+        规范化过滤条件，键顺序不同的等价条件得到同一个缓存键
+        :param filters: 过滤条件
+        :return: 缓存键
+        """
+        return json.dumps(filters, sort_keys=True, default=str, separators=(",", ":"))
+
+    @staticmethod
+    def _is_simple(filters: Dict[str, Any]) -> bool:
+        """ 是否只包含等值条件 """
+        return all(not key.startswith("$") and not isinstance(value, dict) for key, value in filters.items())
+
+    @staticmethod
+    def _matches(filters: Dict[str, Any], doc: Optional[Dict[str, Any]]) -> bool:
+        """ 文档是否满足等值过滤条件 """
+        return doc is not None and all(doc.get(key) == value for key, value in filters.items())
+
+    async def _estimated_count(self, collection: AsyncIOMotorCollection, command: Dict[str, int]) -> int:
+        """ 集合估算文档数，读取元数据，按 TTL 缓存 """
+        now = time.monotonic()
+        if self._estimate is None or self._estimate[1] <= now:
+            self._estimate = (await collection.estimated_document_count(**command), now + self._ttl)
+        return self._estimate[0]
+
+    async def count(self, collection: AsyncIOMotorCollection, filters: Dict[str, Any],
+                    max_time_ms: Optional[int] = None) -> Tuple[int, bool]:
+        """
+        获取满足过滤条件的文档数
+        :param collection: motor 集合
+        :param filters: 过滤条件
+        :param max_time_ms: 计数查询的最长执行时间（毫秒），为空时不限制
+        :return: (文档数, 是否为估算值)
+        """
+        command = {"maxTimeMS": max_time_ms} if max_time_ms is not None else {}
+        if not self._enabled:
+            return await collection.count_documents(filters, **command), False
+        key = self.normalize(filters)
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry[1], False
+        limit = 0
+        if self._estimate_threshold > 0:
+            estimate = await self._estimated_count(collection, command)
+            if estimate > self._estimate_threshold:
+                if key == self._estimate_key:
+                    self.estimated += 1
+                    metrics.inc(f"count_cache.{self._name}.estimated")
+                    return estimate, True
+                limit = self._estimate_threshold
+        generation = self._generation
+        if limit:
+            total = await collection.count_documents(filters, limit=limit, **command)
+            if total >= limit:
+                # 达到计数上限，返回下限值，不缓存
+                self.estimated += 1
+                metrics.inc(f"count_cache.{self._name}.capped")
+                return total, True
+        else:
+            total = await collection.count_documents(filters, **command)
+        if generation == self._generation:
+            self._cache.set(key, [filters, total])
+        return total, False
+
+    def apply_change(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """
+        按写操作前后的文档修正已缓存的计数
+        :param before: 变更前的文档，新建时为 None
+        :param after: 变更后的文档，物理删除时为 None
+        :return: None
+        """
+        self._generation += 1
+        if not self._enabled:
+            return
+        stale: List[str] = []
+        for key, entry in self._cache.items():
+            filters = entry[0]
+            if not self._is_simple(filters):
+                stale.append(key)
+                continue
+            entry[1] += int(self._matches(filters, after)) - int(self._matches(filters, before))
+        for key in stale:
+            self._cache.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 缓存统计与估算次数
+        """
+        return {**self._cache.stats(), "estimated": self.estimated}
+
+
+user_count_cache = CountCache("user", estimate_filters={"is_deleted": False})
+metrics.register_collector("count_cache.user", user_count_cache.stats)
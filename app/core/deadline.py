@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：deadline.py
+@Author  ：晴天
+@Date    ：2025-04-24 10:05:37
+"""
+import time
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.enums.status_code import StatusCode
+from app.exceptions.custom import ServiceException
+
+
+class Deadline:
+    """
+    请求截止时间
+
+    由 DeadlineMiddleware 在请求开始时创建并放入 contextvar，同一请求内的协程和子任务共享同一个对象。
+    数据库调用按剩余时间设置 maxTimeMS，超时后由服务端中止查询并释放连接。
+    exceeded 标记本次请求因截止时间失败，中间件据此返回 504。
+    """
+
+    __slots__ = ("expires_at", "budget", "exceeded")
+
+    def __init__(self, budget: float):
+        """
+        初始化
+        :param budget: 时间预算（秒）
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.exceeded = False
+
+    def remaining(self) -> float:
+        """
+        剩余时间
+        :return: 秒，可能为负数
+        """
+        return self.expires_at - time.monotonic()
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def set_deadline(deadline: Optional[Deadline]) -> Token:
+    """
+    设置当前上下文的截止时间
+    :param deadline: 截止时间，为空时不限制
+    :return: 用于恢复的 Token
+    """
+    return _current_deadline.set(deadline)
+
+
+def reset_deadline(token: Token) -> None:
+    """
+    恢复之前的截止时间
+    :param token: set_deadline 返回的 Token
+    :return: None
+    """
+    _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    获取当前上下文的截止时间
+    :return: Deadline，请求之外（例如后台任务）返回 None
+    """
+    return _current_deadline.get()
+
+
+def deadline_exceeded() -> ServiceException:
+    """
+    标记当前请求已超时
+    :return: 供调用方抛出的异常
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.exceeded = True
+    metrics.inc("deadline.exceeded")
+    logger.warning("Request deadline exceeded")
+    return ServiceException(code=StatusCode.REQUEST_TIMEOUT.get_code(),
+                            message=StatusCode.REQUEST_TIMEOUT.get_message())
+
+
+def max_time_ms() -> Optional[int]:
+    """
+    当前请求剩余的毫秒数，用作查询的 max_time_ms
+    :return: 毫秒，没有截止时间时返回 None
+    :raises ServiceException: 截止时间已过，不再发起查询
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise deadline_exceeded()
+    return max(1, int(remaining * 1000))
+
+
+def max_time_command() -> Dict[str, int]:
+    """
+    当前请求剩余的毫秒数，以命令参数的形式返回，用于 find_one_and_update、count_documents 等接受命令参数的方法
+    :return: {"maxTimeMS": 毫秒}，没有截止时间时返回空字典
+    """
+    ms = max_time_ms()
+    return {"maxTimeMS": ms} if ms is not None else {}
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：key_ring.py
+@Author  ：晴天
+@Date    ：2025-04-18 09:42:17
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+from app.core.logger import logger
+from app.core.config import config
+from typing import Dict, Any, List, Optional, Set, Tuple
+from jwt.algorithms import RSAAlgorithm, OKPAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+
+# 支持的非对称签名算法
+ASYMMETRIC_ALGORITHMS = {"RS256", "EdDSA"}
+# RFC 7638 指纹计算使用的 JWK 必需成员
+THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "OKP": ("crv", "kty", "x")}
+
+
+def jwk_thumbprint(jwk: Dict[str, Any]) -> str:
+    """
+    计算 JWK 的 RFC 7638 SHA-256 指纹
+    :param jwk: 公钥 JWK
+    :return: base64url 编码（无填充）的指纹
+    """
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode("utf-8")).digest()
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+class SigningKey:
+    """ 签名密钥，保存解析后的私钥、公钥对象及其 JWK """
+
+    __slots__ = ("kid", "algorithm", "private_key", "public_key", "period", "created_at", "jwk")
+
+    def __init__(self, algorithm: str, private_key: Any, period: int, created_at: int):
+        """
+        初始化，kid 由算法、轮换周期与公钥指纹组成，同一周期不同的密钥文件 kid 不会相同
+        :param algorithm: 签名算法
+        :param private_key: 私钥对象
+        :param period: 轮换周期序号
+        :param created_at: 生效时间戳（秒）
+        """
+        self.algorithm = algorithm
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.period = period
+        self.created_at = created_at
+        if algorithm == "RS256":
+            jwk = RSAAlgorithm.to_jwk(self.public_key, as_dict=True)
+        else:
+            jwk = OKPAlgorithm.to_jwk(self.public_key, as_dict=True)
+        self.kid = f"{algorithm.lower()}-{period}-{jwk_thumbprint(jwk)[:16]}"
+        self.jwk = {**jwk, "kid": self.kid, "alg": algorithm, "use": "sig"}
+
+
+class KeyRing:
+    """
+    JWT 签名密钥环
+
+    私钥以 <算法>-<轮换周期序号>.pem 文件保存在密钥目录中，kid 在此基础上附加公钥的 RFC 7638 指纹。
+    密钥目录必须由所有主机共享：各主机使用各自目录时会各自生成私钥、各自提供 JWKS，
+    负载均衡到其它主机的 token 找不到签名密钥而验证失败，因此启用非对称签名时未配置 PROJECT_JWT_KEY_DIR 拒绝启动。
+    同一周期内多个进程或主机并发生成时通过 os.link 保证只有一个文件生效，其余进程重新加载即可。
+    每次检查同时生成下一周期的密钥，使其提前出现在 JWKS 中，验证方在切换前就已缓存新公钥。
+    解析后的密钥对象按 kid 缓存，JWKS 响应体与 ETag 在密钥变化时预先计算。
+    生成密钥与读取文件都在线程中执行，签名与验证路径只查内存，不阻塞事件循环。
+    """
+
+    def __init__(self, key_dir: Optional[str] = config.PROJECT_JWT_KEY_DIR, algorithm: str = config.PROJECT_ALGORITHM,
+                 rotation_days: int = config.PROJECT_JWT_KEY_ROTATION_DAYS,
+                 check_interval: float = config.PROJECT_JWT_KEY_CHECK_SECONDS):
+        """ 初始化 """
+        self._key_dir = key_dir
+        self._algorithm = algorithm
+        self._rotation_seconds = rotation_days * 86400
+        # 签发的 token 在 刷新 token 有效期 内都可能被验证，公钥至少保留到该时间之后
+        self._retention_seconds = self._rotation_seconds + config.PROJECT_REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        self._check_interval = check_interval
+        self._keys: Dict[str, SigningKey] = {}
+        # 轮换周期序号 -> kid，已读取过的密钥文件名
+        self._period_kids: Dict[int, str] = {}
+        self._loaded_files: Set[str] = set()
+        self._jwks_body: bytes = b'{"keys":[]}'
+        self._jwks_etag: str = self._compute_etag(self._jwks_body)
+        self._last_reload = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        """ 是否使用非对称签名 """
+        return self._algorithm in ASYMMETRIC_ALGORITHMS
+
+    @property
+    def jwks_body(self) -> bytes:
+        """ 预先序列化的 JWKS 响应体 """
+        return self._jwks_body
+
+    @property
+    def jwks_etag(self) -> str:
+        """ JWKS 响应体的 ETag """
+        return self._jwks_etag
+
+    @staticmethod
+    def _compute_etag(body: bytes) -> str:
+        """ 计算 ETag """
+        return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def _period(self, timestamp: float) -> int:
+        """ 计算时间所在的轮换周期序号 """
+        return int(timestamp // self._rotation_seconds)
+
+    def _filename(self, period: int) -> str:
+        """ 生成周期对应的私钥文件名 """
+        return f"{self._algorithm.lower()}-{period}.pem"
+
+    def _generate_private_key(self) -> Any:
+        """ 按算法生成私钥 """
+        if self._algorithm == "RS256":
+            return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def _write_key(self, period: int) -> None:
+        """
+        生成并写入指定周期的私钥，文件已存在时跳过
+        :param period: 轮换周期序号
+        :return: None
+        """
+        path = os.path.join(self._key_dir, self._filename(period))
+        if os.path.exists(path):
+            return
+        pem = self._generate_private_key().private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pem)
+            # 原子地发布完整文件，其它进程已生成时放弃本次结果
+            os.link(tmp_path, path)
+            logger.info(f"JWT signing key generated: {self._filename(period)}")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+
+    def _read_keys(self, loaded_files: Set[str]) -> List[Tuple[str, int, Any]]:
+        """
+        读取密钥目录中尚未加载的私钥文件，只读文件，可在线程中执行
+        :param loaded_files: 已读取过的文件名
+        :return: (文件名, 轮换周期序号, 私钥对象) 列表
+        """
+        if not os.path.isdir(self._key_dir):
+            return []
+        prefix = f"{self._algorithm.lower()}-"
+        keys = []
+        for filename in os.listdir(self._key_dir):
+            if not (filename.startswith(prefix) and filename.endswith(".pem")) or filename in loaded_files:
+                continue
+            try:
+                period = int(filename[len(prefix):-len(".pem")])
+                with open(os.path.join(self._key_dir, filename), "rb") as f:
+                    private_key = serialization.load_pem_private_key(f.read(), password=None)
+            except (ValueError, OSError) as e:
+                logger.error(f"Failed to load JWT signing key {filename}: {e}")
+                continue
+            keys.append((filename, period, private_key))
+        return keys
+
+    async def reload(self) -> None:
+        """
+        在线程中读取密钥目录的新文件，密钥表只在事件循环线程中更新，已解析的密钥直接复用
+        :return: None
+        """
+        self._last_reload = time.time()
+        keys = await asyncio.to_thread(self._read_keys, set(self._loaded_files))
+        changed = False
+        for filename, period, private_key in keys:
+            key = SigningKey(self._algorithm, private_key, period, period * self._rotation_seconds)
+            self._loaded_files.add(filename)
+            self._keys[key.kid] = key
+            self._period_kids[period] = key.kid
+            changed = True
+        # 淘汰超过保留期的密钥，文件名仍记为已读取，不会被重新加载
+        now = time.time()
+        for kid in [kid for kid, key in self._keys.items() if key.created_at + self._retention_seconds < now]:
+            key = self._keys.pop(kid)
+            if self._period_kids.get(key.period) == kid:
+                self._period_kids.pop(key.period)
+            changed = True
+        if changed:
+            self._build_jwks()
+
+    def _schedule_reload(self) -> None:
+        """ 在后台重新加载密钥目录，最多每秒一次，同一时间只有一个加载任务 """
+        if self._reload_task is not None and not self._reload_task.done():
+            return
+        if time.time() - self._last_reload <= 1:
+            return
+        try:
+            self._reload_task = asyncio.get_running_loop().create_task(self.reload())
+        except RuntimeError:
+            # 不在事件循环中，由定时轮换任务加载
+            pass
+
+    def _build_jwks(self) -> None:
+        """ 预先序列化 JWKS 并计算 ETag """
+        keys: List[Dict[str, Any]] = [key.jwk for key in sorted(self._keys.values(), key=lambda k: k.created_at)]
+        self._jwks_body = json.dumps({"keys": keys}, separators=(",", ":")).encode("utf-8")
+        self._jwks_etag = self._compute_etag(self._jwks_body)
+
+    def _ensure_keys(self) -> None:
+        """ 确保当前周期与下一周期的密钥文件存在，只读写文件，可在线程中执行 """
+        os.makedirs(self._key_dir, mode=0o700, exist_ok=True)
+        period = self._period(time.time())
+        self._write_key(period)
+        self._write_key(period + 1)
+
+    def active_key(self) -> SigningKey:
+        """
+        获取当前用于签名的密钥，只查内存；当前周期的密钥通常已提前一个周期生成并加载，
+        未加载时沿用最近一个周期的密钥并在后台重新加载
+        :return: SigningKey
+        """
+        period = self._period(time.time())
+        kid = self._period_kids.get(period)
+        if kid is not None:
+            return self._keys[kid]
+        self._schedule_reload()
+        previous = [key for key in self._keys.values() if key.period < period]
+        if not previous:
+            raise RuntimeError("JWT key ring has no signing key, it must be started before issuing tokens")
+        return max(previous, key=lambda k: k.period)
+
+    def get_key(self, kid: str) -> Optional[SigningKey]:
+        """
+        按 kid 获取密钥，只查内存；未知 kid 时在后台重新加载密钥目录，本次返回 None
+        :param kid: 密钥ID
+        :return: SigningKey，不存在时返回 None
+        """
+        key = self._keys.get(kid)
+        if key is None:
+            self._schedule_reload()
+        return key
+
+    async def _rotate_loop(self) -> None:
+        """ 定时轮换任务 """
+        while True:
+            await asyncio.sleep(self._check_interval)
+            try:
+                # 生成密钥较慢，放到线程中执行，密钥表只在事件循环线程中更新
+                await asyncio.to_thread(self._ensure_keys)
+                await self.reload()
+            except Exception as e:
+                logger.error(f"JWT signing key rotation failed: {e}")
+
+    async def start(self) -> None:
+        """
+        加载密钥并启动定时轮换
+        :return: None
+        """
+        if not self.enabled:
+            return
+        if not self._key_dir:
+            raise RuntimeError(f"PROJECT_JWT_KEY_DIR must be set to a directory shared by all hosts "
+                               f"when PROJECT_ALGORITHM is {self._algorithm}")
+        await asyncio.to_thread(self._ensure_keys)
+        await self.reload()
+        self._task = asyncio.create_task(self._rotate_loop())
+        logger.info(f"JWT key ring loaded, algorithm: {self._algorithm}, keys: {len(self._keys)}")
+
+    async def stop(self) -> None:
+        """
+        停止定时轮换
+        :return: None
+        """
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            self._reload_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+key_ring = KeyRing()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：metrics.py
+@Author  ：晴天
+@Date    ：2025-04-16 10:12:45
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Callable
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表
+
+    提供计数器（counter）、仪表（gauge）、分布（histogram）三类指标，以及按需采集的 collector，
+    通过 snapshot 统一导出，供 /system/metrics 接口返回。
+    """
+
+    def __init__(self):
+        """ 初始化 """
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Dict[str, float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """
+        计数器累加
+        :param name: 指标名称
+        :param value: 累加值，默认: 1
+        :return: None
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        设置仪表值
+        :param name: 指标名称
+        :param value: 当前值
+        :return: None
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        记录一次观测值（如耗时），汇总为 count/sum/min/max
+        :param name: 指标名称
+        :param value: 观测值
+        :return: None
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                self._histograms[name] = {"count": 1, "sum": value, "min": value, "max": value}
+                return
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["min"] = min(histogram["min"], value)
+            histogram["max"] = max(histogram["max"], value)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+        """
+        注册采集函数，导出时调用，用于缓存命中率、队列长度等由组件自身维护的状态
+        :param name: 采集器名称
+        :param collector: 返回指标字典的函数
+        :return: None
+        """
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        导出当前所有指标
+        :return: 指标字典
+        """
+        with self._lock:
+            histograms = {}
+            for name, histogram in self._histograms.items():
+                histograms[name] = {**histogram, "avg": histogram["sum"] / histogram["count"]}
+            data = {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": histograms,
+            }
+            collectors = dict(self._collectors)
+        data["collectors"] = {name: collector() for name, collector in collectors.items()}
+        return data
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：password_policy.py
+@Author  ：晴天
+@Date    ：2025-04-19 15:32:10
+"""
+import math
+from typing import Dict, Optional
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.encrypt_util import (HASH_ALGORITHMS, password_hash_pool, async_encrypt_password,
+                                    parse_password_hash, benchmark_password_hash)
+
+# 各算法成本因子的取值范围，成本因子每加 1 耗时约翻倍
+COST_BOUNDS: Dict[str, tuple] = {"bcrypt": (10, 16), "scrypt": (14, 20)}
+
+
+class PasswordPolicy:
+    """
+    密码哈希策略
+
+    启动时在当前主机上测量哈希耗时，选出不超过目标校验耗时的最大成本因子；
+    也可以通过 PASSWORD_HASH_COST 固定成本因子跳过校准。
+    登录成功时若已存储密文的算法与策略不一致或成本因子低于策略，透明地重新哈希。
+    """
+
+    def __init__(self, algorithm: str = config.PASSWORD_HASH_ALGORITHM,
+                 cost: Optional[int] = config.PASSWORD_HASH_COST,
+                 target_ms: float = config.PASSWORD_HASH_TARGET_MS):
+        """ 初始化 """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Invalid password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self._fixed_cost = cost
+        self._target_ms = target_ms
+        self.cost = cost or COST_BOUNDS[algorithm][0]
+
+    async def calibrate(self) -> int:
+        """
+        校准成本因子：先测最小成本的耗时，按每级翻倍估算目标成本，再实测一次，超出目标则降一级
+        :return: 选定的成本因子
+        """
+        if self._fixed_cost:
+            return self.cost
+        min_cost, max_cost = COST_BOUNDS[self.algorithm]
+        target = self._target_ms / 1000
+        elapsed = await password_hash_pool.run(benchmark_password_hash, self.algorithm, min_cost,
+                                               operation="calibrate")
+        cost = min_cost + int(math.log2(target / elapsed)) if elapsed < target else min_cost
+        cost = max(min_cost, min(max_cost, cost))
+        if cost > min_cost:
+            elapsed = await password_hash_pool.run(benchmark_password_hash, self.algorithm, cost,
+                                                   operation="calibrate")
+            if elapsed > target:
+                cost -= 1
+        self.cost = cost
+        metrics.set_gauge("password_hash.policy_cost", cost)
+        logger.info(f"Password hash policy calibrated, algorithm: {self.algorithm}, cost: {cost}, "
+                    f"target: {self._target_ms}ms")
+        return cost
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """
+        判断密文是否低于当前策略
+        :param hashed_password: 密文密码
+        :return: 是否需要重新哈希
+        """
+        try:
+            algorithm, cost = parse_password_hash(hashed_password)
+        except (IndexError, KeyError, ValueError):
+            logger.warning("Unrecognized password hash format")
+            return True
+        return algorithm != self.algorithm or cost < self.cost
+
+    async def hash_password(self, password: str) -> str:
+        """
+        按当前策略对密码进行加密
+        :param password: 待加密的密码
+        :return: 密文
+        """
+        return await async_encrypt_password(password, self.algorithm, self.cost)
+
+
+password_policy = PasswordPolicy()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：principal_cache.py
+@Author  ：晴天
+@Date    ：2025-04-16 11:05:31
+"""
+import time
+import hashlib
+from collections import defaultdict
+from typing import Dict, Set, Optional
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.cache_util import LRUCache
+from app.schemas.security import DecodeTokenData
+
+
+class PrincipalCache:
+    """
+    已认证用户缓存
+
+    以 token 的 SHA-256 摘要为键缓存校验通过的 DecodeTokenData，命中时跳过数据库查询。
+    条目过期时间取配置 TTL 与 token 剩余有效期中的较小值；同时维护 user_id -> 摘要 的索引，
+    用于登录、退出、刷新 token 时按用户失效。缓存只在当前进程内生效，多进程部署下其它进程的
+    旧条目最多保留 TTL 秒。
+    """
+
+    def __init__(self, max_size: int = config.PRINCIPAL_CACHE_MAX_SIZE,
+                 ttl: int = config.PRINCIPAL_CACHE_TTL_SECONDS,
+                 enabled: bool = config.PRINCIPAL_CACHE_ENABLED):
+        """ 初始化 """
+        self._ttl = ttl
+        self._enabled = enabled
+        self._user_index: Dict[str, Set[str]] = defaultdict(set)
+        self._cache = LRUCache(max_size=max_size, default_ttl=ttl, on_evict=self._on_evict)
+        self.invalidations = 0
+
+    @staticmethod
+    def token_digest(token: str) -> str:
+        """
+        计算 token 摘要，避免在内存中以明文 token 作为键
+        :param token: token
+        :return: 摘要
+        """
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _on_evict(self, digest: str, principal: DecodeTokenData) -> None:
+        """ 条目移除时同步清理用户索引 """
+        digests = self._user_index.get(principal.user_id)
+        if digests is None:
+            return
+        digests.discard(digest)
+        if not digests:
+            self._user_index.pop(principal.user_id, None)
+
+    def get(self, token: str) -> Optional[DecodeTokenData]:
+        """
+        获取缓存的用户信息
+        :param token: access token
+        :return: DecodeTokenData，未命中时返回 None
+        """
+        if not self._enabled:
+            return None
+        return self._cache.get(self.token_digest(token))
+
+    def set(self, token: str, principal: DecodeTokenData) -> None:
+        """
+        写入缓存，过期时间不超过 token 的 exp
+        :param token: access token
+        :param principal: 校验通过的 token 数据
+        :return: None
+        """
+        if not self._enabled:
+            return
+        ttl = float(self._ttl)
+        if principal.exp is not None:
+            ttl = min(ttl, principal.exp - time.time())
+        if ttl <= 0:
+            return
+        digest = self.token_digest(token)
+        self._cache.set(digest, principal, ttl)
+        self._user_index[principal.user_id].add(digest)
+
+    def invalidate_token(self, token: str) -> bool:
+        """
+        失效单个 token
+        :param token: access token
+        :return: 是否存在并删除
+        """
+        removed = self._cache.delete(self.token_digest(token))
+        if removed:
+            self.invalidations += 1
+        return removed
+
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        失效用户的所有 token
+        :param user_id: 用户ID
+        :return: 删除的条目数
+        """
+        digests = list(self._user_index.get(user_id, ()))
+        count = sum(1 for digest in digests if self._cache.delete(digest))
+        self.invalidations += count
+        return count
+
+    def stats(self) -> Dict[str, int | float]:
+        """
+        获取统计信息
+        :return: 命中、未命中、淘汰等计数
+        """
+        return {**self._cache.stats(), "invalidations": self.invalidations, "users": len(self._user_index)}
+
+
+principal_cache = PrincipalCache()
+metrics.register_collector("principal_cache", principal_cache.stats)
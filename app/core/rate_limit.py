@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：rate_limit.py
+@Author  ：晴天
+@Date    ：2025-04-19 10:15:48
+"""
+import time
+import math
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from fastapi import HTTPException, status
+from app.enums.status_code import StatusCode
+from typing import Dict, List, Tuple, Protocol
+
+
+class RateLimitRule:
+    """
+    限流规则：每 window 秒最多 limit 次
+
+    令牌桶与滑动窗口计数同时生效，两者都允许时请求才通过：
+    令牌桶容量为 limit，令牌以 limit / window 的速率连续补充，平滑长期速率；
+    单独使用令牌桶时任意 window 秒内最多可通过 2 * limit 次，滑动窗口计数用上一固定窗口的次数按重叠比例加权，
+    估算最近 window 秒的次数并限制在 limit 以内，消除窗口边界处的突发；
+    估算假设上一窗口的请求均匀分布，集中在上一窗口末尾的请求会被低估，实际上限略高于 limit。
+    """
+
+    __slots__ = ("limit", "window", "refill_rate")
+
+    def __init__(self, limit: int, window: float):
+        """
+        初始化
+        :param limit: 窗口内允许的次数
+        :param window: 窗口长度（秒）
+        """
+        self.limit = limit
+        self.window = window
+        self.refill_rate = limit / window
+
+    @classmethod
+    def parse(cls, rule: str) -> "RateLimitRule":
+        """
+        解析 "次数/秒数" 格式的规则，例如 "5/60"
+        :param rule: 规则字符串
+        :return: RateLimitRule
+        """
+        limit, window = rule.split("/", 1)
+        return cls(int(limit), float(window))
+
+
+# 限流状态：(剩余令牌, 令牌更新时间, 当前固定窗口起点, 当前窗口次数, 上一窗口次数)
+LimitState = Tuple[float, float, float, int, int]
+
+
+class RateLimitStore(Protocol):
+    """ 限流状态存储 """
+
+    async def consume(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        """
+        检查令牌桶与滑动窗口，允许时消耗一个令牌并计数
+        :param key: 限流状态的键
+        :param rule: 限流规则
+        :param now: 当前时间戳
+        :return: (是否允许, 需要等待的秒数)
+        """
+        ...
+
+    def stats(self) -> Dict[str, int]:
+        """ 获取统计信息 """
+        ...
+
+
+def _initial_state(rule: RateLimitRule, now: float) -> LimitState:
+    """ 新键的限流状态：令牌桶已满，窗口计数为零 """
+    return rule.limit, now, now - now % rule.window, 0, 0
+
+
+def _consume_state(state: LimitState, rule: RateLimitRule, now: float) -> Tuple[bool, LimitState, float]:
+    """
+    按经过的时间补充令牌、滑动窗口，两者都允许时消耗一个令牌并计数，拒绝的请求不计数
+    :param state: 限流状态
+    :param rule: 限流规则
+    :param now: 当前时间戳
+    :return: (是否允许, 新的限流状态, 需要等待的秒数)
+    """
+    tokens, updated, window_start, current, previous = state
+    tokens = min(rule.limit, tokens + (now - updated) * rule.refill_rate)
+    # 进入新的固定窗口时，当前窗口计数移为上一窗口；跨过不止一个窗口时上一窗口计数为零
+    elapsed_windows = int((now - window_start) // rule.window)
+    if elapsed_windows > 0:
+        previous = current if elapsed_windows == 1 else 0
+        current = 0
+        window_start += elapsed_windows * rule.window
+    # 上一窗口与最近 window 秒重叠的比例
+    overlap = 1 - (now - window_start) / rule.window
+    estimated = previous * overlap + current
+    if tokens >= 1 and estimated + 1 <= rule.limit:
+        return True, (tokens - 1, now, window_start, current + 1, previous), 0.0
+
+    retry_after = (1 - tokens) / rule.refill_rate if tokens < 1 else 0.0
+    if estimated + 1 > rule.limit:
+        if current + 1 <= rule.limit:
+            # 等待上一窗口的加权次数衰减到有余量
+            window_wait = (overlap - (rule.limit - 1 - current) / previous) * rule.window
+        else:
+            # 当前窗口已满，等到下一窗口中本窗口的加权次数衰减到有余量
+            window_wait = overlap * rule.window + (1 - (rule.limit - 1) / current) * rule.window
+        retry_after = max(retry_after, window_wait)
+    return False, (tokens, now, window_start, current, previous), max(retry_after, 0.0)
+
+
+class MemoryRateLimitStore:
+    """
+    进程内分片存储
+
+    键按哈希分布到多个分片，每个分片是一个有容量上限的 LRU 字典，
+    洪水攻击使用大量不同 IP / 邮箱时只会淘汰最久未访问的键，内存占用有上限。
+    """
+
+    def __init__(self, shards: int = config.RATE_LIMIT_SHARDS, max_keys: int = config.RATE_LIMIT_MAX_KEYS):
+        """ 初始化 """
+        self._shards: List[OrderedDict[str, LimitState]] = [OrderedDict() for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+        self.evictions = 0
+
+    async def consume(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        shard = self._shards[hash(key) % len(self._shards)]
+        state = shard.pop(key, None) or _initial_state(rule, now)
+        allowed, shard[key], retry_after = _consume_state(state, rule, now)
+        if len(shard) > self._max_keys_per_shard:
+            shard.popitem(last=False)
+            self.evictions += 1
+        return allowed, retry_after
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": sum(len(shard) for shard in self._shards), "evictions": self.evictions}
+
+
+class SqliteRateLimitStore:
+    """
+    基于本地 SQLite 文件的共享存储
+
+    同一主机上的多个 uvicorn worker 指向同一个文件即可共享限流状态，
+    每次消耗在一个 IMMEDIATE 事务中完成，定期清理长时间未访问的键以限制文件大小。
+    """
+
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str = config.RATE_LIMIT_SQLITE_PATH):
+        """ 初始化 """
+        self._path = path
+        self._local = threading.local()
+        self._operations = 0
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limit_state "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, window_start REAL NOT NULL, "
+                         "current INTEGER NOT NULL, previous INTEGER NOT NULL, expire REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_state_expire ON rate_limit_state (expire)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """ 每个线程复用一个连接 """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=1, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _consume(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        """ 在事务中读取、更新并写回限流状态 """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated, window_start, current, previous FROM rate_limit_state "
+                               "WHERE key = ?", (key,)).fetchone()
+            allowed, state, retry_after = _consume_state(tuple(row) if row else _initial_state(rule, now), rule, now)
+            conn.execute("INSERT OR REPLACE INTO rate_limit_state "
+                         "(key, tokens, updated, window_start, current, previous, expire) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, *state, now + 2 * rule.window))
+            self._operations += 1
+            if self._operations % self._PRUNE_EVERY == 0:
+                # 超过两个窗口未访问的键令牌已补满、窗口计数已归零，删除与保留等价
+                conn.execute("DELETE FROM rate_limit_state WHERE expire < ?", (now,))
+            conn.execute("COMMIT")
+            return allowed, retry_after
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def consume(self, key: str, rule: RateLimitRule, now: float) -> Tuple[bool, float]:
+        return await asyncio.to_thread(self._consume, key, rule, now)
+
+    def stats(self) -> Dict[str, int]:
+        return {"operations": self._operations}
+
+
+class RateLimiter:
+    """ 认证接口限流器，在业务逻辑之前按 IP、邮箱等维度拒绝超限请求 """
+
+    def __init__(self, store: RateLimitStore, rules: Dict[str, RateLimitRule],
+                 enabled: bool = config.RATE_LIMIT_ENABLED):
+        """
+        初始化
+        :param store: 限流状态存储
+        :param rules: 维度名称 -> 限流规则，例如 {"login_ip": RateLimitRule(20, 60)}
+        :param enabled: 是否启用
+        """
+        self._store = store
+        self._rules = rules
+        self._enabled = enabled
+        self._rejected: Dict[str, int] = {name: 0 for name in rules}
+
+    async def hit(self, scope: str, identifier: str) -> None:
+        """
+        记录一次请求，超限时抛出 429
+        :param scope: 维度名称
+        :param identifier: 维度取值，例如 IP 地址或邮箱
+        :return: None
+        :raises HTTPException: 超出限流
+        """
+        if not self._enabled:
+            return
+        rule = self._rules[scope]
+        try:
+            allowed, retry_after = await self._store.consume(f"{scope}:{identifier}", rule, time.time())
+        except Exception as e:
+            # 限流存储异常时放行，避免限流组件成为单点故障
+            logger.error(f"Rate limit store error: {e}")
+            return
+        if allowed:
+            return
+        self._rejected[scope] += 1
+        metrics.inc(f"rate_limit.rejected.{scope}")
+        logger.warning(f"Rate limit exceeded -> scope: {scope} identifier: {identifier}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=StatusCode.TOO_MANY_REQUESTS.get_message(),
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        获取统计信息
+        :return: 各维度拒绝次数与存储状态
+        """
+        return {"rejected": dict(self._rejected), "store": self._store.stats()}
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """
+    按配置创建限流存储
+    :return: RateLimitStore
+    """
+    if config.RATE_LIMIT_STORE == "sqlite":
+        return SqliteRateLimitStore()
+    return MemoryRateLimitStore()
+
+
+auth_rate_limiter = RateLimiter(
+    store=create_rate_limit_store(),
+    rules={
+        "login_ip": RateLimitRule.parse(config.RATE_LIMIT_LOGIN_IP),
+        "login_email": RateLimitRule.parse(config.RATE_LIMIT_LOGIN_EMAIL),
+        "register_ip": RateLimitRule.parse(config.RATE_LIMIT_REGISTER_IP),
+    },
+)
+metrics.register_collector("auth_rate_limit", auth_rate_limiter.stats)
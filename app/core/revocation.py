@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：revocation.py
+@Author  ：晴天
+@Date    ：2025-04-17 11:30:04
+"""
+import time
+import asyncio
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+from app.schemas.security import DecodeTokenData
+from app.repositories.backend import TokenRevocationRepositoryProtocol, create_token_revocation_repo
+
+
+class RevocationIndex:
+    """
+    token 吊销索引
+
+    内存中维护用户版本号、角色最早签发时间、已吊销会话三张字典，
+    请求认证时只做字典查找，不再读取用户文档。吊销记录持久化在 token_revocation 集合，
+    启动时全量加载，之后每 sync_interval 秒增量同步，多进程部署下其它进程的吊销最多延迟一个同步周期生效。
+    """
+
+    def __init__(self, repo: TokenRevocationRepositoryProtocol,
+                 sync_interval: float = config.TOKEN_REVOCATION_SYNC_SECONDS):
+        """
+        初始化
+        :param repo: 吊销记录存储
+        :param sync_interval: 增量同步间隔（秒）
+        """
+        self._repo = repo
+        self._sync_interval = sync_interval
+        # 以下字典的值均为 (吊销值, 过期时间戳)
+        self._user_versions: Dict[str, Tuple[int, float]] = {}
+        self._role_not_before: Dict[str, Tuple[int, float]] = {}
+        self._sessions: Dict[str, Tuple[bool, float]] = {}
+        self._last_sync: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _refresh_expire_at(issued_at: Optional[int] = None) -> datetime:
+        """
+        计算吊销记录的过期时间：与 token 一同签发的刷新 token 过期之后，吊销记录不再需要
+        :param issued_at: token 签发时间（秒），为空时使用当前时间
+        :return: 过期时间（UTC）
+        """
+        issued = datetime.fromtimestamp(issued_at or time.time(), tz=timezone.utc)
+        return issued + timedelta(days=config.PROJECT_REFRESH_TOKEN_EXPIRE_DAYS)
+
+    @staticmethod
+    def _session_expire_at(token: DecodeTokenData) -> datetime:
+        """
+        计算会话吊销记录的过期时间：会话内最晚过期的是刷新 token，之后记录不再需要
+        :param token: token 解码数据
+        :return: 过期时间（UTC）
+        """
+        if token.type == "refresh" and token.exp:
+            return datetime.fromtimestamp(token.exp, tz=timezone.utc)
+        return RevocationIndex._refresh_expire_at(token.iat)
+
+    def is_revoked(self, token: DecodeTokenData) -> bool:
+        """
+        判断 token 是否已被吊销
+        :param token: token 解码数据
+        :return: 是否已吊销
+        """
+        # 没有会话ID的 token 签发于会话吊销之前，无法单独吊销（退出登录不生效），视为失效，需重新登录
+        if token.sid is None:
+            return True
+        user_version = self._user_versions.get(token.user_id)
+        if user_version is not None and token.ver < user_version[0]:
+            return True
+        if token.role_id is not None:
+            role_not_before = self._role_not_before.get(token.role_id)
+            if role_not_before is not None and (token.iat or 0) < role_not_before[0]:
+                return True
+        return token.sid in self._sessions
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """
+        将一条吊销记录合并到内存索引，重复应用结果不变
+        :param record: 吊销记录
+        :return: None
+        """
+        expire_at: datetime = record["expire_at"]
+        if expire_at.tzinfo is None:
+            expire_at = expire_at.replace(tzinfo=timezone.utc)
+        expire_ts = expire_at.timestamp()
+        kind, key = record["kind"], record["key"]
+        if kind == "user":
+            current = self._user_versions.get(key, (0, 0))
+            self._user_versions[key] = (max(current[0], record["version"]), max(current[1], expire_ts))
+        elif kind == "role":
+            current = self._role_not_before.get(key, (0, 0))
+            self._role_not_before[key] = (max(current[0], record["not_before"]), max(current[1], expire_ts))
+        elif kind == "session":
+            self._sessions[key] = (True, expire_ts)
+
+    def _prune(self) -> None:
+        """ 清理已过期的条目 """
+        now = time.time()
+        for table in (self._user_versions, self._role_not_before, self._sessions):
+            for key in [key for key, (_, expire_ts) in table.items() if expire_ts <= now]:
+                table.pop(key, None)
+
+    async def revoke_user(self, user_id: str, version: int) -> None:
+        """
+        吊销用户版本号低于 version 的所有 token（退出所有设备）
+        :param user_id: 用户ID
+        :param version: 最小有效版本号
+        :return: None
+        """
+        expire_at = self._refresh_expire_at()
+        await self._repo.upsert("user", user_id, expire_at, version=version)
+        self._apply({"kind": "user", "key": user_id, "version": version, "expire_at": expire_at})
+        metrics.inc("token_revocation.user")
+
+    async def revoke_role(self, role_id: str) -> None:
+        """
+        吊销该角色当前已签发的所有 token
+        :param role_id: 角色ID
+        :return: None
+        """
+        # iat 精度为秒，当前秒内签发的 token 同样失效，吊销之后下一秒起签发的 token 不受影响
+        not_before = int(time.time()) + 1
+        expire_at = self._refresh_expire_at()
+        await self._repo.upsert("role", role_id, expire_at, not_before=not_before)
+        self._apply({"kind": "role", "key": role_id, "not_before": not_before, "expire_at": expire_at})
+        metrics.inc("token_revocation.role")
+
+    async def revoke_session(self, token: DecodeTokenData) -> None:
+        """
+        吊销 token 所属会话（退出当前设备）
+        :param token: token 解码数据
+        :return: None
+        """
+        if token.sid is None:
+            # is_revoked 已将这类 token 视为失效
+            return
+        expire_at = self._session_expire_at(token)
+        await self._repo.upsert("session", token.sid, expire_at)
+        self._apply({"kind": "session", "key": token.sid, "expire_at": expire_at})
+        metrics.inc("token_revocation.session")
+
+    async def retire_session(self, token: DecodeTokenData) -> bool:
+        """
+        刷新 token 时结束原会话，原会话的 access / refresh token 随之失效；
+        依赖 (kind, key) 唯一索引，同一会话并发刷新时只有一个成功
+        :param token: 刷新 token 解码数据
+        :return: 是否成功结束会话
+        """
+        if token.sid is None or token.sid in self._sessions:
+            return False
+        expire_at = self._session_expire_at(token)
+        if not await self._repo.insert_once("session", token.sid, expire_at):
+            return False
+        self._apply({"kind": "session", "key": token.sid, "expire_at": expire_at})
+        return True
+
+    async def sync(self) -> None:
+        """
+        从数据库增量同步吊销记录
+        :return: None
+        """
+        # 向前多取一个同步周期，容忍各进程之间的时钟偏差
+        since = self._last_sync - timedelta(seconds=self._sync_interval) if self._last_sync else None
+        sync_start = datetime.now(timezone.utc)
+        records = await self._repo.find_modified_since(since)
+        for record in records:
+            self._apply(record)
+        self._last_sync = sync_start
+        self._prune()
+
+    async def _sync_loop(self) -> None:
+        """ 后台同步任务 """
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {e}")
+
+    async def start(self) -> None:
+        """
+        全量加载吊销记录并启动后台同步
+        :return: None
+        """
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_loop())
+        logger.info(f"Token revocation index loaded, users: {len(self._user_versions)}, "
+                    f"roles: {len(self._role_not_before)}, sessions: {len(self._sessions)}")
+
+    async def stop(self) -> None:
+        """
+        停止后台同步
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+        :return: 各类吊销条目数量
+        """
+        return {
+            "users": len(self._user_versions),
+            "roles": len(self._role_not_before),
+            "sessions": len(self._sessions),
+        }
+
+
+revocation_index = RevocationIndex(create_token_revocation_repo())
+metrics.register_collector("token_revocation", revocation_index.stats)
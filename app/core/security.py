@@ -6,11 +6,13 @@
 @Author  ：晴天
 @Date    ：2025-04-10 16:14:30
 """
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, Optional
 from app.core.logger import logger
 from app.core.config import config
-from datetime import datetime, timedelta
-from jwt import encode, decode, PyJWTError
+from datetime import datetime, timedelta, timezone
+from app.core.key_ring import key_ring
+from jwt import encode, decode, get_unverified_header, PyJWTError
 from app.enums.status_code import StatusCode
 from app.exceptions.custom import AuthException
 from app.schemas.security import DecodeTokenData, TokenData
@@ -23,20 +25,54 @@ class JWTManager:
         """ 初始化 """
         self.secret_key = config.PROJECT_SECRET_KEY
         self.algorithm = config.PROJECT_ALGORITHM
+        self.key_ring = key_ring
 
-    def create_token(self, data: Dict[str, Any]) -> TokenData:
+    def _encode(self, payload: Dict[str, Any]) -> str:
+        """
+        签名 token，非对称算法使用密钥环中的当前密钥并在头部写入 kid
+        :param payload: 载荷
+        :return: token
+        """
+        if not self.key_ring.enabled:
+            return encode(payload=payload, key=self.secret_key, algorithm=self.algorithm)
+        signing_key = self.key_ring.active_key()
+        return encode(payload=payload, key=signing_key.private_key, algorithm=signing_key.algorithm,
+                      headers={"kid": signing_key.kid})
+
+    def _decode(self, token: str) -> Dict[str, Any]:
+        """
+        验证并解析 token，非对称算法按头部 kid 选择公钥
+        :param token: token
+        :return: 载荷
+        """
+        if not self.key_ring.enabled:
+            return decode(token, self.secret_key, algorithms=[self.algorithm])
+        kid = get_unverified_header(token).get("kid")
+        signing_key = self.key_ring.get_key(kid) if kid else None
+        if signing_key is None:
+            raise AuthException(code=StatusCode.TOKEN_INVALID.get_code(),
+                                message=StatusCode.TOKEN_INVALID.get_message())
+        return decode(token, signing_key.public_key, algorithms=[signing_key.algorithm])
+
+    def create_token(self, data: Dict[str, Any], token_version: int = 0,
+                     session_id: Optional[str] = None) -> TokenData:
         """
         创建token
         :param data: 数据
+        :param token_version: 用户当前 token 版本号，写入 ver 声明
+        :param session_id: 会话ID，刷新 token 时沿用原会话，为空时新建会话
         :return: TokenData
         """
         copy_data = data.copy()
-        access_token_expire = datetime.now() + timedelta(days=config.PROJECT_ACCESS_TOKEN_EXPIRE_DAYS)
-        refresh_token_expire = datetime.now() + timedelta(days=config.PROJECT_REFRESH_TOKEN_EXPIRE_DAYS)
-        copy_data.update({"exp": access_token_expire, "type": "access"})
-        access_token = encode(payload=copy_data, key=self.secret_key, algorithm=self.algorithm)
-        copy_data.update({"exp": refresh_token_expire, "type": "refresh"})
-        refresh_token = encode(payload=copy_data, key=self.secret_key, algorithm=self.algorithm)
+        # 使用带时区的时间，PyJWT 会把无时区时间按 UTC 处理，非 UTC 时区的服务器上 exp 会偏移
+        now = datetime.now(timezone.utc)
+        access_token_expire = now + timedelta(days=config.PROJECT_ACCESS_TOKEN_EXPIRE_DAYS)
+        refresh_token_expire = now + timedelta(days=config.PROJECT_REFRESH_TOKEN_EXPIRE_DAYS)
+        copy_data.update({"ver": token_version, "sid": session_id or uuid.uuid4().hex, "iat": int(now.timestamp())})
+        copy_data.update({"exp": access_token_expire, "type": "access", "jti": uuid.uuid4().hex})
+        access_token = self._encode(copy_data)
+        copy_data.update({"exp": refresh_token_expire, "type": "refresh", "jti": uuid.uuid4().hex})
+        refresh_token = self._encode(copy_data)
 
         return TokenData(
             access_token=access_token,
@@ -54,7 +90,7 @@ class JWTManager:
         :return: DecodeTokenData
         """
         try:
-            payload = decode(token, self.secret_key, algorithms=[self.algorithm])
+            payload = self._decode(token)
             if payload is None or payload.get("user_id") is None:
                 raise AuthException(code=StatusCode.TOKEN_INVALID.get_code(),
                                     message=StatusCode.TOKEN_INVALID.get_message())
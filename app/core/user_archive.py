@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：user_archive.py
+@Author  ：晴天
+@Date    ：2025-04-24 16:05:48
+"""
+import os
+import time
+import socket
+import asyncio
+from typing import Any, Dict, Optional
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from datetime import datetime, timedelta
+from app.repositories.user_archive_repo import UserArchiveRepository
+
+
+class UserArchiver:
+    """
+    已删除用户归档任务
+
+    每 interval 秒执行一轮：将删除时间超过 after_days 天的用户按 (delete_date, _id) 顺序分批移到 user_archive，
+    user 集合及其索引只保留有效用户和最近删除的用户。每批完成后保存断点，进程重启后从断点继续；
+    批次之间暂停 batch_pause 秒，避免归档占满主节点的写入能力。
+    多进程部署时通过 archive_checkpoint 集合中的租约保证同一时间只有一个进程执行。
+    """
+
+    JOB = "user_archive"  # 断点记录的任务名
+
+    def __init__(self, after_days: float = config.USER_ARCHIVE_AFTER_DAYS,
+                 interval: float = config.USER_ARCHIVE_INTERVAL_SECONDS,
+                 batch_size: int = config.USER_ARCHIVE_BATCH_SIZE,
+                 batch_pause: float = config.USER_ARCHIVE_BATCH_PAUSE_SECONDS):
+        """
+        初始化
+        :param after_days: 删除超过该天数的用户才归档
+        :param interval: 两轮归档的间隔（秒）
+        :param batch_size: 每批文档数
+        :param batch_pause: 批次之间的暂停时间（秒）
+        """
+        self._after_days = after_days
+        self._interval = interval
+        self._batch_size = batch_size
+        self._batch_pause = batch_pause
+        # 租约有效期：覆盖一个批次的执行时间，每批完成后续约
+        self._lease_ttl = max(60.0, batch_pause * 10)
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._runs = 0
+        self._archived = 0
+        self._last_run_seconds: Optional[float] = None
+
+    async def run_once(self) -> int:
+        """
+        执行一轮归档，存在未完成的断点时从断点继续
+        :return: 本轮移出的用户数，租约被其它进程持有时返回 0
+        """
+        record = await UserArchiveRepository.acquire_lease(self.JOB, self._owner, self._lease_ttl)
+        if record is None:
+            logger.debug("User archive is running in another process, skipped")
+            return 0
+        start = time.perf_counter()
+        checkpoint: Dict[str, Any] | None = record.get("checkpoint")
+        if checkpoint:
+            cutoff: datetime = checkpoint["cutoff"]
+            after = tuple(checkpoint["after"]) if checkpoint.get("after") else None
+            logger.info(f"Resume user archive -> cutoff: {cutoff} after: {after}")
+        else:
+            cutoff = datetime.now() - timedelta(days=self._after_days)
+            after = None
+        moved = 0
+        try:
+            while True:
+                count, last = await UserArchiveRepository.archive_batch(cutoff, after, self._batch_size)
+                if last is None:
+                    break
+                moved += count
+                self._archived += count
+                metrics.inc("user_archive.archived", count)
+                after = last
+                checkpoint = {"cutoff": cutoff, "after": list(after)}
+                if not await UserArchiveRepository.save_checkpoint(self.JOB, self._owner, checkpoint, self._lease_ttl):
+                    logger.warning("User archive lease lost, stop current run")
+                    return moved
+                await asyncio.sleep(self._batch_pause)
+            # 本轮完成，清空断点，下一轮重新计算截止时间
+            await UserArchiveRepository.save_checkpoint(self.JOB, self._owner, None, self._lease_ttl)
+        finally:
+            await UserArchiveRepository.release_lease(self.JOB, self._owner)
+        self._runs += 1
+        self._last_run_seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"User archive completed -> archived: {moved} cost: {self._last_run_seconds}s")
+        return moved
+
+    async def _archive_loop(self) -> None:
+        """ 后台归档任务 """
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                metrics.inc("user_archive.failed")
+                logger.error(f"User archive failed: {e}")
+            await asyncio.sleep(self._interval)
+
+    async def start(self) -> None:
+        """
+        启动后台归档
+        :return: None
+        """
+        self._task = asyncio.create_task(self._archive_loop())
+        logger.info(f"User archive started, after days: {self._after_days}, interval: {self._interval}s, "
+                    f"batch size: {self._batch_size}")
+
+    async def stop(self) -> None:
+        """
+        停止后台归档，当前批次中断时断点保留，下次启动继续
+        :return: None
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 完成轮数、累计归档数、最近一轮耗时
+        """
+        return {"runs": self._runs, "archived": self._archived, "last_run_seconds": self._last_run_seconds}
+
+
+user_archiver = UserArchiver()
+metrics.register_collector("user_archive", user_archiver.stats)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：user_cache.py
+@Author  ：晴天
+@Date    ：2025-04-22 15:41:20
+"""
+import json
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from app.utils.cache_util import LRUCache
+from app.utils.single_flight import SingleFlight
+from app.core.cache_backend import CacheBackend, create_cache_backend
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+UserDict = Dict[str, Any]
+
+
+class UserCache:
+    """
+    用户文档两级缓存
+
+    一级为进程内 LRU，二级为可选的共享后端（值为 JSON）。公开与敏感两种序列化结果使用不同的键分别缓存，
+    敏感数据只进入一级缓存，不写入共享后端。未命中时通过 SingleFlight 合并并发加载，防止缓存击穿。
+    写操作调用 invalidate 删除两级缓存；加载期间发生失效时不回填，避免写入旧数据。
+    多进程部署下其它进程的一级缓存最多保留 TTL 秒。
+    """
+
+    def __init__(self, max_size: int = config.USER_CACHE_MAX_SIZE, ttl: int = config.USER_CACHE_TTL_SECONDS,
+                 l2: Optional[CacheBackend] = create_cache_backend(config.USER_CACHE_L2_BACKEND),
+                 l2_ttl: int = config.USER_CACHE_L2_TTL_SECONDS, enabled: bool = config.USER_CACHE_ENABLED):
+        """ 初始化 """
+        self._enabled = enabled
+        self._l1 = LRUCache(max_size=max_size, default_ttl=ttl, on_evict=self._on_evict)
+        self._l2 = l2
+        self._l2_ttl = l2_ttl
+        self._flight = SingleFlight("user_cache", max_keys=config.SINGLE_FLIGHT_MAX_KEYS)
+        # 一级缓存各条目的近似字节数（JSON 长度）
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        # 每次失效递增，加载期间变化时不回填
+        self._generation = 0
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """ 是否启用 """
+        return self._enabled
+
+    @staticmethod
+    def _key(user_id: str, sensitive: bool) -> str:
+        """ 缓存键，公开与敏感数据分开 """
+        return f"user:{'sensitive' if sensitive else 'public'}:{user_id}"
+
+    def _on_evict(self, key: str, _: UserDict) -> None:
+        """ 一级缓存条目移除时更新占用字节数 """
+        self._bytes -= self._sizes.pop(key, 0)
+
+    def _set_l1(self, key: str, user: UserDict, size: int) -> None:
+        """ 写入一级缓存 """
+        self._l1.set(key, user)
+        self._sizes[key] = size
+        self._bytes += size
+
+    async def _load(self, user_id: str, sensitive: bool,
+                    loader: Callable[[], Awaitable[Optional[UserDict]]]) -> Optional[UserDict]:
+        """ 依次查询二级缓存和数据库，并回填缓存 """
+        key = self._key(user_id, sensitive)
+        generation = self._generation
+        use_l2 = self._l2 is not None and not sensitive
+        if use_l2:
+            try:
+                raw = await self._l2.get(key)
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"User cache L2 get failed: {e}")
+                raw = None
+            if raw is not None:
+                self.l2_hits += 1
+                user = json.loads(raw)
+                if generation == self._generation:
+                    self._set_l1(key, user, len(raw))
+                return user
+            self.l2_misses += 1
+
+        user = await loader()
+        if user is None or generation != self._generation:
+            return user
+        raw = json.dumps(user, ensure_ascii=False, default=str).encode("utf-8")
+        self._set_l1(key, user, len(raw))
+        if use_l2:
+            try:
+                await self._l2.set(key, raw, self._l2_ttl)
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"User cache L2 set failed: {e}")
+        return user
+
+    async def get(self, user_id: str, sensitive: bool,
+                  loader: Callable[[], Awaitable[Optional[UserDict]]]) -> Optional[UserDict]:
+        """
+        读取用户，未命中时调用 loader 加载
+        :param user_id: 用户ID
+        :param sensitive: 是否为包含敏感字段的序列化结果
+        :param loader: 从数据库加载用户的无参协程函数
+        :return: 用户信息副本，不存在时返回 None
+        """
+        if not self._enabled:
+            return await loader()
+        user = self._l1.get(self._key(user_id, sensitive))
+        if user is None:
+            user = await self._flight.do(self._key(user_id, sensitive),
+                                         lambda: self._load(user_id, sensitive, loader))
+        return dict(user) if user is not None else None
+
+    async def get_many(self, user_ids: List[str],
+                       loader: Callable[[List[str]], Awaitable[Dict[str, UserDict]]]) -> Dict[str, UserDict]:
+        """
+        批量读取公开用户信息，一级缓存未命中的部分通过一次 loader 调用加载
+        :param user_ids: 用户ID列表
+        :param loader: 按用户ID列表批量加载的协程函数，返回 用户ID -> 用户信息
+        :return: 用户ID -> 用户信息副本
+        """
+        if not self._enabled:
+            return await loader(user_ids)
+        result: Dict[str, UserDict] = {}
+        missing: List[str] = []
+        for user_id in dict.fromkeys(user_ids):
+            user = self._l1.get(self._key(user_id, False))
+            if user is None:
+                missing.append(user_id)
+            else:
+                result[user_id] = dict(user)
+        if missing:
+            generation = self._generation
+            loaded = await loader(missing)
+            for user_id, user in loaded.items():
+                if generation == self._generation:
+                    raw = json.dumps(user, ensure_ascii=False, default=str).encode("utf-8")
+                    self._set_l1(self._key(user_id, False), user, len(raw))
+                result[user_id] = dict(user)
+        return result
+
+    async def set(self, user: UserDict) -> None:
+        """
+        写入公开用户信息（写穿），用于创建用户后预热缓存
+        :param user: 公开用户信息
+        :return: None
+        """
+        if not self._enabled:
+            return
+        key = self._key(user["user_id"], False)
+        raw = json.dumps(user, ensure_ascii=False, default=str).encode("utf-8")
+        self._set_l1(key, dict(user), len(raw))
+        if self._l2 is not None:
+            try:
+                await self._l2.set(key, raw, self._l2_ttl)
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"User cache L2 set failed: {e}")
+
+    async def invalidate(self, user_id: str) -> None:
+        """
+        失效用户的两级缓存
+        :param user_id: 用户ID
+        :return: None
+        """
+        self._generation += 1
+        if not self._enabled:
+            return
+        self.invalidations += 1
+        self._l1.delete(self._key(user_id, False))
+        self._l1.delete(self._key(user_id, True))
+        if self._l2 is not None:
+            try:
+                await self._l2.delete(self._key(user_id, False))
+            except Exception as e:
+                self.l2_errors += 1
+                logger.warning(f"User cache L2 delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 一级缓存命中率、占用字节数，二级缓存命中与错误次数
+        """
+        l2_lookups = self.l2_hits + self.l2_misses
+        return {
+            "l1": {**self._l1.stats(), "bytes": self._bytes},
+            "l2": {
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_ratio": round(self.l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+                "errors": self.l2_errors,
+                **(self._l2.stats() if self._l2 is not None else {}),
+            },
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache()
+metrics.register_collector("user_cache", user_cache.stats)
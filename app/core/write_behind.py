@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：write_behind.py
+@Author  ：晴天
+@Date    ：2025-04-24 17:36:20
+"""
+import time
+import asyncio
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.repositories.backend import create_user_repo
+
+
+class WriteBehindBuffer:
+    """
+    延迟批量写入缓冲区
+
+    用于丢失少量更新也不影响正确性的字段（例如最后修改信息）：write 只合并到内存中的待写入字典，
+    同一个 key 的多次写入合并为一次，后写入的字段覆盖先写入的；每 interval 秒或待写入 key 数达到 max_batch 时
+    由后台任务一次写入。写入失败时放回缓冲区与之后的更新合并重试，超过 max_pending 时丢弃并计入指标。
+    停止时写入剩余数据；未启动时 write 直接同步写入，失败只记录日志。
+    """
+
+    def __init__(self, name: str, flush_func: Callable[[Dict[str, Dict[str, Any]]], Awaitable[Any]],
+                 interval: float = config.WRITE_BEHIND_FLUSH_SECONDS,
+                 max_batch: int = config.WRITE_BEHIND_MAX_BATCH,
+                 max_pending: int = config.WRITE_BEHIND_MAX_PENDING):
+        """
+        初始化
+        :param name: 名称，用于指标
+        :param flush_func: 批量写入函数，参数为 key -> 字段
+        :param interval: 定时刷新间隔（秒）
+        :param max_batch: 待写入 key 数达到该值时立即刷新
+        :param max_pending: 写入失败时最多保留的待写入 key 数
+        """
+        self._name = name
+        self._flush_func = flush_func
+        self._interval = interval
+        self._max_batch = max_batch
+        self._max_pending = max_pending
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._writes = 0
+        self._flushes = 0
+        self._dropped = 0
+
+    async def write(self, key: str, changes: Dict[str, Any]) -> None:
+        """
+        写入一条更新
+        :param key: 合并的 key，例如用户ID
+        :param changes: 需要写入的字段
+        :return: None
+        """
+        self._writes += 1
+        if self._task is None:
+            try:
+                await self._flush_func({key: changes})
+            except Exception as e:
+                metrics.inc(f"write_behind.{self._name}.failed")
+                logger.warning(f"Write-behind direct write failed -> name: {self._name} key: {key} error: {e}")
+            return
+        pending = self._pending.get(key)
+        if pending is None:
+            self._pending[key] = dict(changes)
+        else:
+            pending.update(changes)
+            metrics.inc(f"write_behind.{self._name}.coalesced")
+        if len(self._pending) >= self._max_batch:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        写入当前所有待写入的数据
+        :return: 写入的 key 数
+        """
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        start = time.perf_counter()
+        try:
+            await self._flush_func(batch)
+        except Exception:
+            # 放回缓冲区，期间的新写入优先
+            for key, changes in batch.items():
+                if key not in self._pending and len(self._pending) >= self._max_pending:
+                    self._dropped += 1
+                    metrics.inc(f"write_behind.{self._name}.dropped")
+                    continue
+                self._pending[key] = {**changes, **self._pending.get(key, {})}
+            metrics.inc(f"write_behind.{self._name}.failed")
+            raise
+        self._flushes += 1
+        metrics.observe(f"write_behind.{self._name}.flush_seconds", time.perf_counter() - start)
+        metrics.observe(f"write_behind.{self._name}.batch_size", len(batch))
+        return len(batch)
+
+    async def _flush_loop(self) -> None:
+        """ 后台刷新任务，按时间或数量触发 """
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed -> name: {self._name} pending: {len(self._pending)} error: {e}")
+
+    async def start(self) -> None:
+        """
+        启动后台刷新
+        :return: None
+        """
+        self._stopping = False
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info(f"Write-behind buffer started -> name: {self._name} interval: {self._interval}s "
+                    f"max batch: {self._max_batch}")
+
+    async def stop(self) -> None:
+        """
+        停止后台刷新并写入剩余数据，之后的 write 直接同步写入
+        :return: None
+        """
+        if self._task is None:
+            return
+        # 不取消任务，等待进行中的写入完成，避免整批丢失
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        try:
+            flushed = await self.flush()
+            logger.info(f"Write-behind buffer drained -> name: {self._name} flushed: {flushed}")
+        except Exception as e:
+            logger.error(f"Write-behind drain failed -> name: {self._name} lost: {len(self._pending)} error: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+        :return: 写入次数、刷新次数、待写入数、丢弃数
+        """
+        return {"writes": self._writes, "flushes": self._flushes, "pending": len(self._pending),
+                "dropped": self._dropped}
+
+
+# 用户最后修改信息的延迟写入
+user_write_behind = WriteBehindBuffer("user", create_user_repo().bulk_update_users)
+metrics.register_collector("write_behind.user", user_write_behind.stats)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：migrations.py
+@Author  ：晴天
+@Date    ：2025-04-23 10:42:57
+"""
+from typing import Any, Dict, List
+from pymongo import IndexModel
+from app.core.logger import logger
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+# 需要唯一的用户字段 -> 被唯一索引替换的旧普通索引名
+USER_UNIQUE_FIELDS: Dict[str, str] = {
+    "email": "email_1",
+    "user_id": "user_id_1",
+    "display_id": "display_id_1",
+}
+# User 模型中定义的唯一索引名
+USER_UNIQUE_INDEXES = ("uniq_email_active", "uniq_user_id_active", "uniq_display_id_active")
+
+
+class DuplicateUserError(RuntimeError):
+    """ 存在重复的未删除用户，无法创建唯一索引 """
+
+    def __init__(self, duplicates: Dict[str, List[Dict[str, Any]]]):
+        self.duplicates = duplicates
+        summary = ", ".join(f"{field}: {len(groups)}" for field, groups in duplicates.items())
+        super().__init__(f"Duplicate active users found, resolve them before building unique indexes -> {summary}")
+
+
+async def find_duplicate_users(database: AsyncIOMotorDatabase, sample_size: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    查找未删除用户中 email / user_id / display_id 重复的记录
+    :param database: 数据库
+    :param sample_size: 每个字段最多返回的重复组数
+    :return: 字段 -> [{"value": 重复值, "count": 数量, "ids": [_id]}]，没有重复时为空字典
+    """
+    duplicates: Dict[str, List[Dict[str, Any]]] = {}
+    for field in USER_UNIQUE_FIELDS:
+        pipeline = [
+            {"$match": {"is_deleted": False}},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "ids": {"$push": "$_id"}}},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$limit": sample_size},
+        ]
+        groups = await database["user"].aggregate(pipeline, allowDiskUse=True).to_list(length=sample_size)
+        if groups:
+            duplicates[field] = [{"value": g["_id"], "count": g["count"], "ids": g["ids"]} for g in groups]
+    return duplicates
+
+
+async def migrate_user_unique_indexes(database: AsyncIOMotorDatabase) -> None:
+    """
+    创建用户唯一索引前的迁移：检查重复数据，删除被替换的旧普通索引，唯一索引随后由 Beanie 创建
+    :param database: 数据库
+    :return: None
+    :raises DuplicateUserError: 存在重复的未删除用户
+    """
+    existing = await database["user"].index_information()
+    if all(name in existing for name in USER_UNIQUE_INDEXES):
+        return
+    duplicates = await find_duplicate_users(database)
+    if duplicates:
+        for field, groups in duplicates.items():
+            for group in groups:
+                logger.error(f"Duplicate user {field}: {group['value']} count: {group['count']} ids: {group['ids']}")
+        raise DuplicateUserError(duplicates)
+    legacy = [name for name in USER_UNIQUE_FIELDS.values() if name in existing and not existing[name].get("unique")]
+    for name in legacy:
+        await database["user"].drop_index(name)
+        logger.info(f"Dropped legacy user index: {name}")
+
+
+async def backfill_user_delete_date(database: AsyncIOMotorDatabase) -> None:
+    """
+    为已删除但没有 delete_date 的用户补齐删除时间，以最后修改时间代替，归档任务据此判断是否到期
+    :param database: 数据库
+    :return: None
+    """
+    result = await database["user"].update_many(
+        {"is_deleted": True, "delete_date": None},
+        [{"$set": {"delete_date": "$last_modify_date"}}],
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled user delete_date: {result.modified_count}")
+
+
+async def ensure_user_archive_indexes(database: AsyncIOMotorDatabase) -> None:
+    """
+    创建 user_archive 集合的索引，恢复时按 user_id 查找，排查时按邮箱和归档时间查找
+    :param database: 数据库
+    :return: None
+    """
+    await database["user_archive"].create_indexes([
+        IndexModel([("user_id", 1), ("archive_date", -1)], name="user_id_archive_date"),
+        IndexModel([("email", 1)], name="email_1"),
+        IndexModel([("archive_date", 1)], name="archive_date_1"),
+    ])
@@ -11,6 +11,9 @@ from beanie import init_beanie
 from app.core.logger import logger
 from app.core.config import config
 from app.models.user_model import User
+from app.database.migrations import migrate_user_unique_indexes, backfill_user_delete_date, ensure_user_archive_indexes
+from app.database.read_routing import read_route_listener
+from app.models.token_revocation_model import TokenRevocation
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo.errors import ConfigurationError, ServerSelectionTimeoutError
 
@@ -31,7 +34,7 @@ class DatabaseManager:
             logger.info("Start initializing Beanie ODM")
             await init_beanie(
                 database=self._database,
-                document_models=[User],
+                document_models=[User, TokenRevocation],
                 allow_index_dropping=False,  # 防止意外删除索引
                 recreate_views=True,  # 确保视图一致性
             )
@@ -52,13 +55,19 @@ class DatabaseManager:
                 serverSelectionTimeoutMS=5000,  # 服务器选择超时
                 connectTimeoutMS=10000,  # 连接超时
                 socketTimeoutMS=30000,  # 套接字超时
+                event_listeners=[read_route_listener],  # 按节点统计读命令，确认读路由是否生效
             )
             self._database = self._client[self._db_name]
             await self._database.command("ping")  # 验证连接是否成功
             logger.info("MongoDB connection successful")
 
+            # 检查重复用户并移除被唯一索引替换的旧索引
+            await migrate_user_unique_indexes(self._database)
             # 初始化 Beanie ODM
             await self._initialize_beanie_odm()
+            # 补齐已删除用户的删除时间并创建归档集合索引
+            await backfill_user_delete_date(self._database)
+            await ensure_user_archive_indexes(self._database)
         except (ServerSelectionTimeoutError, ConfigurationError) as e:
             logger.error(f"MongoDB connection failure: {str(e)}")
             raise
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：read_routing.py
+@Author  ：晴天
+@Date    ：2025-04-23 10:36:27
+"""
+import threading
+from typing import Any, Dict
+from pymongo import monitoring
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+
+# 支持的读偏好，名称与 MongoDB 连接串中的 readPreference 一致
+READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# 默认路由：仓储类.方法 -> 读偏好，未列出的读操作走主节点
+DEFAULT_READ_ROUTES: Dict[str, str] = {
+    # 登录、令牌吊销同步依赖最新数据，固定走主节点
+    "UserRepository.get_user_by_email": "primary",
+    "UserRepository.get_users_by_emails": "primary",
+    "UserRepository.get_user_if": "primary",
+    "TokenRevocationRepository.find_modified_since": "primary",
+    # 按用户ID的读取是用户缓存的回源，写后失效缓存时从从节点回填会把旧数据重新写入缓存并保留到过期，固定走主节点
+    "UserRepository.get_user_by_id": "primary",
+    "UserRepository.get_users_by_ids": "primary",
+    # 公开资料与列表允许读到 max_staleness 秒内的旧数据
+    "UserRepository.get_user_by_display_id": "secondaryPreferred",
+    "UserRepository.get_users_by_display_ids": "secondaryPreferred",
+    "UserRepository.user_pagination_list": "secondaryPreferred",
+    "UserRepository.user_cursor_list": "secondaryPreferred",
+    "UserRepository.iter_users": "secondaryPreferred",
+}
+
+# 计入节点指标的读命令
+READ_COMMANDS = frozenset({"find", "getMore", "aggregate", "count", "distinct"})
+
+
+class ReadRouter:
+    """
+    读操作路由
+
+    按 "仓储类.方法" 为每个读操作选择读偏好：列表、公开资料等读多写少的查询可以走从节点，
+    落后主节点超过 max_staleness 秒的从节点不会被选中；登录、令牌校验等依赖最新数据的读取固定走主节点。
+    未配置的操作和所有写操作都走主节点。每次路由按操作计入指标 db.read_route.<操作>.<读偏好>，
+    实际执行命令的节点由 ReadRouteListener 计入指标 db.reads.<地址>。
+    """
+
+    def __init__(self, routes: Dict[str, str], max_staleness: int = config.DB_READ_MAX_STALENESS_SECONDS,
+                 enabled: bool = config.DB_READ_ROUTING_ENABLED):
+        """
+        初始化
+        :param routes: 仓储类.方法 -> 读偏好
+        :param max_staleness: 从节点允许落后的最大秒数，-1 表示不限制，MongoDB 要求不小于 90
+        :param enabled: 是否启用，关闭时所有读操作走主节点
+        """
+        if max_staleness != -1 and max_staleness < 90:
+            raise ValueError(f"Invalid read max staleness: {max_staleness}, must be -1 or >= 90")
+        for operation, mode in routes.items():
+            if mode not in READ_MODES:
+                raise ValueError(f"Invalid read preference for {operation}: {mode}")
+        self._routes = dict(routes)
+        self._max_staleness = max_staleness
+        self._enabled = enabled
+        self._preferences = {mode: self._build(mode) for mode in set(routes.values()) | {"primary"}}
+
+    @staticmethod
+    def parse_routes(value: str) -> Dict[str, str]:
+        """
+        解析 "操作=读偏好" 逗号分隔的配置，例如 "UserRepository.get_user_by_id=primary"
+        :param value: 配置字符串
+        :return: 操作 -> 读偏好
+        """
+        routes = {}
+        for item in value.split(","):
+            if item.strip():
+                operation, mode = item.split("=", 1)
+                routes[operation.strip()] = mode.strip()
+        return routes
+
+    def _build(self, mode: str):
+        """ 创建读偏好，主节点读偏好不接受 max_staleness """
+        if mode == "primary":
+            return Primary()
+        return READ_MODES[mode](max_staleness=self._max_staleness)
+
+    def mode(self, operation: str) -> str:
+        """
+        获取操作的读偏好
+        :param operation: 仓储类.方法
+        :return: 读偏好名称
+        """
+        if not self._enabled:
+            return "primary"
+        return self._routes.get(operation, "primary")
+
+    def collection(self, collection: AsyncIOMotorCollection, operation: str) -> AsyncIOMotorCollection:
+        """
+        按操作返回带读偏好的集合
+        :param collection: motor 集合
+        :param operation: 仓储类.方法，例如 "UserRepository.user_pagination_list"
+        :return: 主节点读取时返回原集合，否则返回 with_options 后的集合
+        """
+        mode = self.mode(operation)
+        metrics.inc(f"db.read_route.{operation}.{mode}")
+        logger.debug(f"Read route -> {operation}: {mode}")
+        if mode == "primary":
+            return collection
+        return collection.with_options(read_preference=self._preferences[mode])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取路由配置
+        :return: 是否启用、最大延迟与各操作的读偏好
+        """
+        return {
+            "enabled": self._enabled,
+            "max_staleness": self._max_staleness,
+            "routes": {operation: self.mode(operation) for operation in self._routes},
+        }
+
+
+class ReadRouteListener(monitoring.CommandListener):
+    """
+    命令监听器：按实际执行命令的节点地址统计读命令，用于确认路由是否生效
+
+    注册到 AsyncIOMotorClient 的 event_listeners，回调在驱动线程中执行，只做计数。
+    """
+
+    def __init__(self):
+        """ 初始化 """
+        self._lock = threading.Lock()
+        self._reads: Dict[str, int] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in READ_COMMANDS:
+            return
+        host, port = event.connection_id
+        address = f"{host}:{port}"
+        with self._lock:
+            self._reads[address] = self._reads.get(address, 0) + 1
+        metrics.inc(f"db.reads.{address}")
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取各节点的读命令数
+        :return: 地址 -> 次数
+        """
+        with self._lock:
+            return dict(self._reads)
+
+
+read_router = ReadRouter({**DEFAULT_READ_ROUTES, **ReadRouter.parse_routes(config.DB_READ_ROUTES)})
+read_route_listener = ReadRouteListener()
+metrics.register_collector("db_read_routing", read_router.stats)
+metrics.register_collector("db_reads_by_server", read_route_listener.stats)
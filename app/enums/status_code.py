@@ -77,6 +77,8 @@ class StatusCode(Enum):
     DATABASE_ERROR = (501, "数据库操作失败")
     # 服务不可用（HTTP 503）
     SERVICE_UNAVAILABLE = (503, "服务暂时不可用")
+    # 请求处理超时（HTTP 504）
+    REQUEST_TIMEOUT = (504, "请求处理超时")
     # 文件上传失败
     FILE_UPLOAD_ERROR = (510, "文件上传失败")
     # 文件大小超过限制
@@ -87,6 +89,10 @@ class StatusCode(Enum):
     THIRD_PARTY_ERROR = (530, "第三方服务调用失败")
     # 分页大小需要再1-100之间
     PAGE_SIZE_ERROR = (422, "分页大小需要再1-100之间")
+    # 分页过深，需要使用游标分页
+    PAGE_DEPTH_EXCEEDED = (423, "分页过深，请使用 next_cursor 继续翻页")
+    # 分页游标无效
+    CURSOR_INVALID = (424, "分页游标无效")
 
     # ================================== 方法扩展（可选） ==================================
     def get_code(self) -> int:
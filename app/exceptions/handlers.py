@@ -8,7 +8,7 @@
 """
 import traceback
 from app.core.logger import logger
-from fastapi.responses import JSONResponse
+from app.schemas.response import ApiResponse
 from fastapi import Request, FastAPI, status
 from app.exceptions.base import BaseExceptions
 from fastapi.exceptions import RequestValidationError
@@ -31,10 +31,7 @@ def register_exception_handlers(app: FastAPI) -> None:
         :return: JSON响应
         """
         logger.error(f"baseExceptions -> code: {exc.code} message: {exc.message}")
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content={"code": exc.code, "message": exc.message}
-        )
+        return ApiResponse(code=exc.code, message=exc.message, status_code=status.HTTP_200_OK)
 
     @app.exception_handler(StarletteHTTPException)
     async def http_exception_handler(_: Request, exc: StarletteHTTPException):
@@ -45,10 +42,8 @@ def register_exception_handlers(app: FastAPI) -> None:
         :return: JSON响应
         """
         logger.warning(f"HTTPException -> code: {exc.status_code} message: {exc.detail}")
-        return JSONResponse(
-            status_code=exc.status_code,
-            content={"code": exc.status_code, "message": exc.detail}
-        )
+        return ApiResponse(code=exc.status_code, message=exc.detail, status_code=exc.status_code,
+                           headers=getattr(exc, "headers", None))
 
     @app.exception_handler(RequestValidationError)
     async def validation_exception_handler(_: Request, exc: RequestValidationError):
@@ -61,10 +56,8 @@ def register_exception_handlers(app: FastAPI) -> None:
         errors = exc.errors()
         error_msg = "; ".join([f"{err['loc'][-1]}: {err['msg']}" for err in errors])
         logger.warning(f"RequestValidationError -> {error_msg}")
-        return JSONResponse(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content={"code": status.HTTP_422_UNPROCESSABLE_ENTITY, "message": f"参数验证失败: {error_msg}"}
-        )
+        return ApiResponse(code=status.HTTP_422_UNPROCESSABLE_ENTITY, message=f"参数验证失败: {error_msg}",
+                           status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
     @app.exception_handler(Exception)
     async def global_exception_handler(_: Request, exc: Exception):
@@ -76,7 +69,5 @@ def register_exception_handlers(app: FastAPI) -> None:
         """
         stack_trace = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
         logger.error(f"handlerException -> {str(exc)}\nStack Trace:\n{stack_trace}")
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"code": status.HTTP_500_INTERNAL_SERVER_ERROR, "message": "服务器内部错误"}
-        )
+        return ApiResponse(code=status.HTTP_500_INTERNAL_SERVER_ERROR, message="服务器内部错误",
+                           status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
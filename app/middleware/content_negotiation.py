@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：content_negotiation.py
+@Author  ：晴天
+@Date    ：2025-04-25 17:34:09
+"""
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import config
+from app.core.content_negotiation import JSON, negotiate, set_response_format, reset_response_format
+
+
+ACCEPT_HEADER = b"accept"
+
+
+def scope_response_format(scope: Scope) -> str:
+    """
+    按请求的 Accept 头协商响应格式，供协商中间件之外构造的响应（如截止时间中间件的 504）使用
+    :param scope: ASGI scope
+    :return: 响应格式 json / msgpack，未开启 MessagePack 时固定为 JSON
+    """
+    if not config.RESPONSE_MSGPACK_ENABLED:
+        return JSON
+    for name, value in scope["headers"]:
+        if name == ACCEPT_HEADER:
+            return negotiate(value.decode("latin-1"))
+    return JSON
+
+
+class ContentNegotiationMiddleware:
+    """
+    响应格式协商中间件
+
+    按 Accept 请求头选择响应格式（JSON / MessagePack）并放入 contextvar，
+    ApiResponse 据此选择序列化方式，路由与异常处理器不需要感知格式。使用纯 ASGI 实现。
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        初始化
+        :param app: ASGI 应用
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = set_response_format(scope_response_format(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_response_format(token)
+
+
+def register_content_negotiation_middleware(app: FastAPI):
+    """
+    注册响应格式协商中间件，需要在日志中间件之后注册，使异常处理器的响应同样按协商的格式返回
+    :param app: FastAPI 应用实例
+    :return: None
+    """
+    app.add_middleware(ContentNegotiationMiddleware)  # type: ignore
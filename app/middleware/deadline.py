@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：deadline.py
+@Author  ：晴天
+@Date    ：2025-04-24 10:48:12
+"""
+import asyncio
+from typing import Dict, Optional
+from fastapi import FastAPI, status
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from app.schemas.response import ApiResponse
+from app.enums.status_code import StatusCode
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.deadline import Deadline, set_deadline, reset_deadline
+from app.middleware.content_negotiation import scope_response_format
+
+
+class DeadlineMiddleware:
+    """
+    请求截止时间中间件
+
+    按路径取时间预算（REQUEST_DEADLINE_ROUTES，未配置的路径使用 REQUEST_DEADLINE_SECONDS），
+    客户端可以通过 X-Request-Timeout-Ms 请求头缩短预算，不能延长；截止时间放入 contextvar，仓储层据此设置 maxTimeMS。
+    请求处理放在独立的 Task 中，由本中间件唯一读取 receive：只读请求（GET / HEAD / OPTIONS）在客户端断开时取消处理任务，
+    等待中的数据库调用随之返回，服务端查询最迟在 maxTimeMS 到期时中止；其它请求可能由多步写入组成
+    （例如先递增 token 版本号再写入吊销索引），中途取消会留下不一致的状态，断开后继续执行到结束，仍受截止时间限制。
+    请求因截止时间失败且尚未开始响应时，返回 504。
+    使用纯 ASGI 实现，注册在最外层。
+    """
+
+    TIMEOUT_HEADER = b"x-request-timeout-ms"  # 客户端指定的时间预算（毫秒）
+    CANCELLABLE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})  # 客户端断开时可以取消的只读请求方法
+
+    def __init__(self, app: ASGIApp, budget: float = config.REQUEST_DEADLINE_SECONDS,
+                 route_budgets: Optional[Dict[str, float]] = None):
+        """
+        初始化
+        :param app: ASGI 应用
+        :param budget: 默认时间预算（秒），0 表示不限制
+        :param route_budgets: 路径 -> 时间预算（秒）
+        """
+        self.app = app
+        self._budget = budget
+        self._route_budgets = route_budgets if route_budgets is not None else \
+            self.parse_routes(config.REQUEST_DEADLINE_ROUTES)
+
+    @staticmethod
+    def parse_routes(value: str) -> Dict[str, float]:
+        """
+        解析 "路径=秒数" 逗号分隔的配置
+        :param value: 配置字符串
+        :return: 路径 -> 秒数
+        """
+        routes = {}
+        for item in value.split(","):
+            if item.strip():
+                path, seconds = item.split("=", 1)
+                routes[path.strip()] = float(seconds)
+        return routes
+
+    def _get_budget(self, scope: Scope) -> Optional[float]:
+        """
+        计算请求的时间预算，客户端指定的值只在更短时生效
+        :param scope: ASGI scope
+        :return: 秒，不限制时返回 None
+        """
+        budget = self._route_budgets.get(scope["path"], self._budget)
+        for name, value in scope["headers"]:
+            if name == self.TIMEOUT_HEADER:
+                try:
+                    requested = int(value) / 1000
+                except ValueError:
+                    break
+                if requested > 0 and (budget <= 0 or requested < budget):
+                    budget = requested
+                break
+        return budget if budget > 0 else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = self._get_budget(scope)
+        deadline = Deadline(budget) if budget is not None else None
+        token = set_deadline(deadline)
+        try:
+            await self._run(scope, receive, send, deadline)
+        finally:
+            reset_deadline(token)
+
+    async def _run(self, scope: Scope, receive: Receive, send: Send, deadline: Optional[Deadline]) -> None:
+        """ 在独立任务中处理请求，同时监听客户端断开 """
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = False
+        response_complete = False
+        replaced = False
+        disconnected = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started, response_complete, replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            if message["type"] == "http.response.start":
+                if deadline is not None and deadline.exceeded:
+                    # 处理过程中已超时，丢弃原响应，返回 504
+                    replaced = True
+                    response_started = True
+                    logger.warning(f"Request deadline exceeded -> path: {scope['path']} budget: {deadline.budget}s")
+                    await ApiResponse(
+                        code=StatusCode.REQUEST_TIMEOUT.get_code(), message=StatusCode.REQUEST_TIMEOUT.get_message(),
+                        status_code=status.HTTP_504_GATEWAY_TIMEOUT, response_format=scope_response_format(scope),
+                    )(scope, receive, send)
+                    return
+                response_started = True
+            await send(message)
+
+        handler = asyncio.create_task(self.app(scope, messages.get, send_wrapper))
+        cancellable = scope["method"] in self.CANCELLABLE_METHODS
+
+        async def watch_disconnect() -> None:
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    # 响应发送完成后服务器同样返回 http.disconnect，此时处理任务可能仍在执行后台任务，不能取消
+                    if response_complete:
+                        return
+                    disconnected = True
+                    if cancellable:
+                        handler.cancel()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await asyncio.wait({handler})
+        finally:
+            watcher.cancel()
+            handler.cancel()
+        if handler.cancelled() and disconnected:
+            metrics.inc("deadline.client_disconnected")
+            logger.info(f"Client disconnected, request cancelled -> path: {scope['path']} "
+                        f"response_started: {response_started}")
+            return
+        if disconnected:
+            metrics.inc("deadline.client_disconnected_completed")
+            logger.info(f"Client disconnected, write request completed -> path: {scope['path']} "
+                        f"method: {scope['method']}")
+        handler.result()
+
+
+def register_deadline_middleware(app: FastAPI):
+    """
+    注册请求截止时间中间件，需要在其它中间件之后注册，位于最外层
+    :param app: FastAPI 应用实例
+    :return: None
+    """
+    app.add_middleware(DeadlineMiddleware)  # type: ignore
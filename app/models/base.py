@@ -6,10 +6,10 @@
 @Author  ：晴天
 @Date    ：2025-04-04 19:19:37
 """
-from pydantic import Field
 from datetime import datetime
 from app.core.logger import logger
-from typing import Dict, Any, ClassVar
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from typing import Dict, Any, ClassVar, Iterable, List, Tuple
 from app.enums.status_code import StatusCode
 from beanie import Document, PydanticObjectId
 from app.exceptions.custom import ServiceException
@@ -31,6 +31,10 @@ class BaseDocument(Document):
     datetime_fields_to_format: ClassVar[list[str]] = ["create_date", "last_modify_date"]
     # 类变量：是否强制字段排序，控制是否调整字段顺序（id 在前，子类字段次之，父类字段最后）
     enforce_field_order: ClassVar[bool] = False
+    # 类变量：按类编译的序列化器，在子类创建时生成
+    _document_serializer: ClassVar["DocumentSerializer"]
+    # 类变量：只读视图模型，在子类创建时生成
+    _view_model: ClassVar[type["DocumentView"]]
 
     class Config:
         """Pydantic 配置类。
@@ -53,6 +57,52 @@ class BaseDocument(Document):
         use_mongo_time = True  # 使用 MongoDB 的 ISODate 类型来存储 datetime 字段
         collection = "base"  # 设置默认的集合名称，子类可以覆盖此设置
 
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        """ 子类创建完成（字段已确定）后编译该类的序列化器 """
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._document_serializer = DocumentSerializer(cls)
+        cls._view_model = cls._build_view_model()
+
+    @classmethod
+    def _build_view_model(cls) -> type["DocumentView"]:
+        """
+        生成只读视图模型：字段与校验规则同文档类，但不是 Beanie 文档，没有状态快照和 revision_id。
+        """
+        fields = {name: (model_field.annotation, model_field) for name, model_field in cls.model_fields.items()
+                  if name != "revision_id"}
+        view_model = create_model(f"{cls.__name__}View", __base__=DocumentView, __module__=cls.__module__, **fields)
+        view_model._document_serializer = cls._document_serializer
+        return view_model
+
+    @classmethod
+    def view(cls, doc: Dict[str, Any]) -> "DocumentView":
+        """
+        将原始文档校验为只读视图，用于只读取、不保存的场景。
+
+        :param doc: motor 返回的原始文档，需要包含全部必填字段
+        :return: 只读视图实例
+        """
+        return cls._view_model.model_validate(doc)
+
+    @classmethod
+    async def find_readonly(cls, filters: Dict[str, Any], sort: List[Tuple[str, int]] | None = None,
+                            limit: int = 0, include_sensitive: bool = False) -> List["DocumentView"]:
+        """
+        只读查询：按模型校验结果但不经过 Beanie 的状态管理，返回的实例不可修改、不能保存。
+        只需要字典时使用 serialize_raw / serialize_many，不做校验，开销更低。
+
+        :param filters: 查询条件
+        :param sort: 排序，例如 [("create_date", -1)]
+        :param limit: 最多返回的数量，0 表示不限制
+        :param include_sensitive: 是否读取敏感字段
+        :return: 只读视图列表
+        """
+        cursor = cls.get_motor_collection().find(filters, projection=cls.projection(include_sensitive=include_sensitive),
+                                                 sort=sort, limit=limit)
+        view_model = cls._view_model
+        return [view_model.model_validate(doc) async for doc in cursor]
+
     def model_serialize(self, include_sensitive: bool = False) -> Dict[str, Any]:
         """
         自定义序列化方法，将模型数据转换为字典。
@@ -62,28 +112,165 @@ class BaseDocument(Document):
         :raises ServiceException: 如果序列化过程中发生异常，抛出服务内部异常
         """
         try:
-            # 获取所有字段的原始数据，绕过 exclude=True 的限制
-            data = self.__dict__.copy()
+            return self._document_serializer.serialize(self.__dict__, include_sensitive)
+        except Exception as e:
+            logger.error(f"Serialization error: {str(e)}")
+            raise ServiceException(code=StatusCode.SYSTEM_ERROR.get_code(), message=StatusCode.SYSTEM_ERROR.get_message())
+
+    @classmethod
+    def projection(cls, fields: List[str] | None = None, include_sensitive: bool = False) -> Dict[str, int]:
+        """
+        生成 MongoDB 投影，只读取需要的字段。
 
-            # 如果不包含敏感字段，排除标记为 exclude=True 的字段
-            if not include_sensitive:
-                exclude_fields = {field for field, model_field in self.model_fields.items() if model_field.exclude}
-                for field in exclude_fields:
-                    data.pop(field, None)
+        :param fields: 需要的字段名，为空时读取模型的全部字段；id 对应 _id
+        :param include_sensitive: fields 为空时是否包含敏感字段（exclude=True 的字段）
+        :return: 投影字典，例如 {"_id": 0, "user_id": 1}
+        """
+        if fields is None:
+            return dict(cls._document_serializer.projection(include_sensitive))
+        projection = {"_id": 1 if "id" in fields else 0}
+        projection.update({field: 1 for field in fields if field != "id"})
+        return projection
 
-            # 单独处理 id 字段，转换为字符串
-            data["id"] = str(self.id) if self.id else None
+    @classmethod
+    def serialize_raw(cls, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        将 motor 直接返回的原始文档转换为与 model_serialize 相同格式的字典，不经过 pydantic 校验和状态管理。
 
-            # 定义时间格式化函数
-            def format_datetime(dt: datetime | None) -> str | None:
-                return dt.strftime("%Y-%m-%d %H:%M:%S") if dt else None
+        :param doc: 原始文档，会被原地修改
+        :return: 序列化后的数据字典
+        """
+        return cls._document_serializer.serialize_raw(doc)
 
-            # 格式化所有指定的 datetime 字段
-            for field in self.datetime_fields_to_format:
-                if field in data and data[field] is not None:
-                    data[field] = format_datetime(data[field])
+    @classmethod
+    def serialize_many(cls, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量转换原始文档，用于列表页，格式与 serialize_raw 相同。
 
-            return {"id": data['id'], **data}
-        except Exception as e:
-            logger.error(f"Serialization error: {str(e)}")
-            raise ServiceException(code=StatusCode.SYSTEM_ERROR.get_code(), message=StatusCode.SYSTEM_ERROR.get_message())
+        :param docs: 原始文档，会被原地修改
+        :return: 序列化后的数据字典列表
+        """
+        return cls._document_serializer.serialize_raw_many(docs)
+
+
+class DocumentView(BaseModel):
+    """
+    文档只读视图基类。
+
+    由 BaseDocument 子类在创建时生成（User -> UserView），字段与文档类相同。
+    不继承 Beanie Document，加载时不保存状态快照、不维护 revision_id，实例不可修改。
+    """
+
+    model_config = ConfigDict(frozen=True, populate_by_name=True, arbitrary_types_allowed=True)
+
+    # 类变量：所属文档类的序列化器
+    _document_serializer: ClassVar["DocumentSerializer"]
+
+    def model_serialize(self, include_sensitive: bool = False) -> Dict[str, Any]:
+        """
+        与 BaseDocument.model_serialize 相同格式的序列化。
+
+        :param include_sensitive: 是否包含敏感字段
+        :return: 序列化后的数据字典
+        """
+        return self._document_serializer.serialize(self.__dict__, include_sensitive)
+
+
+def format_datetime(value: datetime) -> str:
+    """
+    将 datetime 格式化为 "%Y-%m-%d %H:%M:%S"，无时区时使用 isoformat（C 实现，比 strftime 快）。
+
+    :param value: 时间
+    :return: 格式化后的字符串
+    """
+    if value.tzinfo is None and value.year >= 1000:
+        return value.isoformat(" ", "seconds")
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class DocumentSerializer:
+    """
+    按文档类编译的序列化器。
+
+    在类创建时预先计算公开字段、全部字段及其中需要格式化的 datetime 字段，以及默认投影，
+    序列化时只按字段元组取值，不再遍历 model_fields、复制 __dict__ 或重复构建字典。
+    """
+
+    __slots__ = ("_public_fields", "_all_fields", "_datetime_fields", "_public_projection", "_sensitive_projection")
+
+    def __init__(self, document_class: type["BaseDocument"]):
+        """
+        初始化
+        :param document_class: 文档类
+        """
+        datetime_fields = frozenset(document_class.datetime_fields_to_format)
+        fields = [(name, model_field.exclude) for name, model_field in document_class.model_fields.items()
+                  if name != "id"]
+        # (字段名, 是否需要格式化)，保持模型字段顺序
+        self._public_fields = tuple((name, name in datetime_fields) for name, exclude in fields if not exclude)
+        self._all_fields = tuple((name, name in datetime_fields) for name, _ in fields)
+        self._datetime_fields = tuple(document_class.datetime_fields_to_format)
+        self._public_projection = self._build_projection(name for name, exclude in fields
+                                                         if name != "revision_id" and not exclude)
+        self._sensitive_projection = self._build_projection(name for name, _ in fields if name != "revision_id")
+
+    @staticmethod
+    def _build_projection(fields: Iterable[str]) -> Dict[str, int]:
+        """ 生成包含 _id 的投影 """
+        return {"_id": 1, **{field: 1 for field in fields}}
+
+    def projection(self, include_sensitive: bool = False) -> Dict[str, int]:
+        """
+        默认投影（全部公开字段或全部字段），调用方不应修改返回值
+        :param include_sensitive: 是否包含敏感字段
+        :return: 投影字典
+        """
+        return self._sensitive_projection if include_sensitive else self._public_projection
+
+    def serialize(self, values: Dict[str, Any], include_sensitive: bool = False) -> Dict[str, Any]:
+        """
+        序列化模型实例的字段字典（__dict__）
+        :param values: 字段名 -> 值
+        :param include_sensitive: 是否包含敏感字段
+        :return: 序列化后的数据字典，id 在首位
+        """
+        object_id = values.get("id")
+        data = {"id": str(object_id) if object_id else None}
+        for name, is_datetime in (self._all_fields if include_sensitive else self._public_fields):
+            value = values.get(name)
+            data[name] = format_datetime(value) if is_datetime and value is not None else value
+        return data
+
+    def serialize_raw(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        序列化 motor 返回的原始文档，只包含文档中已有的字段
+        :param doc: 原始文档，会被原地修改
+        :return: 序列化后的数据字典
+        """
+        if "_id" in doc:
+            doc = {"id": str(doc.pop("_id")), **doc}
+        for field in self._datetime_fields:
+            value = doc.get(field)
+            if isinstance(value, datetime):
+                doc[field] = format_datetime(value)
+        return doc
+
+    def serialize_raw_many(self, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量序列化原始文档
+        :param docs: 原始文档，会被原地修改
+        :return: 序列化后的数据字典列表
+        """
+        datetime_fields = self._datetime_fields
+        result = []
+        append = result.append
+        for doc in docs:
+            # 与 serialize_raw 相同，循环内使用局部变量
+            if "_id" in doc:
+                doc = {"id": str(doc.pop("_id")), **doc}
+            for field in datetime_fields:
+                value = doc.get(field)
+                if isinstance(value, datetime):
+                    doc[field] = format_datetime(value)
+            append(doc)
+        return result
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：token_revocation_model.py
+@Author  ：晴天
+@Date    ：2025-04-17 10:26:52
+"""
+from pydantic import Field
+from pymongo import IndexModel
+from datetime import datetime, timezone
+from app.models.base import BaseDocument
+
+
+class TokenRevocation(BaseDocument):
+    """
+    token 吊销记录表模型，继承自 BaseDocument
+
+    每条记录对应一次吊销事件，应用启动时全量加载、运行期间增量同步到内存吊销索引：
+    user：用户级，版本号低于 version 的 token 失效（退出所有设备）
+    role：角色级，签发时间早于 not_before 的该角色 token 失效（按角色批量吊销）
+    session：会话级，sid 对应的 token 失效（退出当前设备、刷新 token 后结束原会话）
+    """
+
+    # 吊销类型：user / role / session
+    kind: str = Field(..., description="吊销类型：user / role / session")
+    # 吊销对象：user_id / role_id / sid
+    key: str = Field(..., description="吊销对象，按类型分别为 user_id / role_id / sid")
+    # 用户级吊销的最小有效版本号
+    version: int | None = Field(default=None, description="用户级吊销的最小有效 token 版本号")
+    # 角色级吊销的最早有效签发时间（秒）
+    not_before: int | None = Field(default=None, description="角色级吊销的最早有效签发时间戳（秒）")
+    # 过期时间，之后被吊销的 token 已自然过期，记录由 TTL 索引自动清理
+    expire_at: datetime = Field(..., description="记录过期时间（UTC），由 TTL 索引自动清理")
+    # 创建日期时间
+    create_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="记录创建日期时间（UTC）")
+    # 最后修改日期时间，用于增量同步
+    last_modify_date: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="最后修改日期时间（UTC），用于增量同步")
+
+    class Settings:
+        """Beanie 配置"""
+        name = "token_revocation"
+        indexes = [
+            IndexModel([("kind", 1), ("key", 1)], name="uniq_kind_key", unique=True),
+            IndexModel([("expire_at", 1)], name="ttl_expire_at", expireAfterSeconds=0),
+            IndexModel([("last_modify_date", 1)], name="last_modify_date"),
+        ]
@@ -7,6 +7,7 @@
 @Date    ：2025-04-04 16:12:37
 """
 from pydantic import Field
+from pymongo import IndexModel
 from typing import ClassVar
 from datetime import datetime
 from app.models.base import BaseDocument
@@ -39,6 +40,8 @@ class User(BaseDocument):
     is_active: bool = Field(default=True, description="记录是否激活，True 表示激活（有效），False 表示禁用")
     # 逻辑删除标志，True 表示记录已被删除（软删除），False 表示未删除
     is_deleted: bool = Field(default=False, description="记录是否逻辑删除，True 表示已删除（软删除），False 表示未删除")
+    # 逻辑删除时间，超过归档阈值的已删除用户移到 user_archive 集合
+    delete_date: datetime | None = Field(default=None, description="逻辑删除日期时间，未删除时为空，用于判断是否需要归档")
     # 创建时间戳，以毫秒为单位，用于记录创建的精确时间
     create_time: int = Field(default_factory=lambda: int(datetime.now().timestamp() * 1000), description="记录创建时间戳（毫秒），表示记录创建的精确时间")
     # 创建日期时间，使用 ISODate 格式，便于人类阅读和查询
@@ -51,11 +54,11 @@ class User(BaseDocument):
     last_modify_time: int = Field(default_factory=lambda: int(datetime.now().timestamp() * 1000), description="最后修改时间戳（毫秒），表示记录最后一次修改的精确时间")
     # 最后修改日期时间，使用 ISODate 格式，记录最后修改的时间
     last_modify_date: datetime = Field(default_factory=datetime.now, description="最后修改日期时间，ISODate 格式，表示记录最后修改的时间")
-    # 敏感字段，序列化时排除
-    access_token: str | None = Field(default=None, description="用户访问令牌，用于身份验证，可为空", exclude=True)
-    # 敏感字段，序列化时排除
-    refresh_token: str | None = Field(default=None, description="用户刷新令牌，用于更新访问令牌，可为空", exclude=True)
+    # token 版本号，退出所有设备时递增，签发的 token 携带该版本号，敏感字段，序列化时排除
+    token_version: int = Field(default=0, ge=0, description="token 版本号，退出所有设备时递增，低于该版本号的 token 失效", exclude=True)
 
+    # 需要格式化的 datetime 字段，增加删除时间
+    datetime_fields_to_format: ClassVar[list[str]] = ["create_date", "last_modify_date", "delete_date"]
     # 启用字段排序，确保字段按照定义的顺序存储
     enforce_field_order: ClassVar[bool] = True  # 启用字段排序
 
@@ -63,12 +66,19 @@ class User(BaseDocument):
         """Beanie 配置"""
         name = "user"
         indexes = [
-            "email",
-            "user_id",
-            "display_id",
+            # 未删除用户的邮箱、用户ID、展示ID唯一，注册直接插入，由唯一索引拒绝重复
+            IndexModel([("email", 1)], name="uniq_email_active", unique=True,
+                       partialFilterExpression={"is_deleted": False}),
+            IndexModel([("user_id", 1)], name="uniq_user_id_active", unique=True,
+                       partialFilterExpression={"is_deleted": False}),
+            IndexModel([("display_id", 1)], name="uniq_display_id_active", unique=True,
+                       partialFilterExpression={"is_deleted": False}),
             [("email", 1), ("user_id", 1)],  # 复合索引
-            [("create_date", -1)],  # 按创建时间降序
+            [("create_date", -1), ("_id", -1)],  # 按创建时间排序，_id 保证游标分页顺序唯一，双向可用
             [("is_active", 1)],  # 按激活状态查询
             [("is_deleted", 1)],  # 按删除状态查询
+            # 归档扫描：只索引已删除的用户，按删除时间分批，_id 保证断点位置唯一
+            IndexModel([("delete_date", 1), ("_id", 1)], name="archive_scan",
+                       partialFilterExpression={"is_deleted": True}),
         ]
         use_state_management = True  # 启用状态管理
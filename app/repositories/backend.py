@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：backend.py
+@Author  ：晴天
+@Date    ：2025-04-23 17:25:31
+"""
+from bson import ObjectId
+from datetime import datetime
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.user_cache import user_cache
+from beanie.odm.enums import SortDirection
+from app.repositories.user_repo import UserRepository
+from app.repositories.cached_user_repo import CachedUserRepository
+from app.repositories.id_block_repo import IdBlockRepository
+from app.repositories.token_revocation_repo import TokenRevocationRepository
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol, Tuple
+from app.repositories.memory_repo import MemoryUserRepository, MemoryTokenRevocationRepository, MemoryIdBlockRepository
+
+# 支持的存储后端：mongo 为 Beanie / motor，memory 为进程内存储，不连接数据库
+REPOSITORY_BACKENDS = ("mongo", "memory")
+
+
+class UserRepositoryProtocol(Protocol):
+    """ 用户存储接口，服务层只依赖该接口，具体实现由 REPOSITORY_BACKEND 选择 """
+
+    async def get_user_by_email(self, email: str, include_sensitive: bool = False,
+                                fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """ 根据邮箱获取用户 """
+        ...
+
+    async def get_user_by_id(self, user_id: str, include_sensitive: bool = False,
+                             fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """ 根据用户ID获取用户 """
+        ...
+
+    async def get_user_by_display_id(self, display_id: str, include_sensitive: bool = False,
+                                     fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """ 根据用户展示ID获取用户 """
+        ...
+
+    async def get_users_by_ids(self, user_ids: List[str], include_sensitive: bool = False,
+                               fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """ 根据用户ID批量获取用户 """
+        ...
+
+    async def get_users_by_emails(self, emails: List[str], include_sensitive: bool = False,
+                                  fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """ 根据邮箱批量获取用户 """
+        ...
+
+    async def get_users_by_display_ids(self, display_ids: List[str], include_sensitive: bool = False,
+                                       fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """ 根据用户展示ID批量获取用户 """
+        ...
+
+    async def create(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """ 创建用户，唯一字段冲突时抛出 DuplicateKeyError """
+        ...
+
+    async def update_user_by_id(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any] | None:
+        """ 根据用户ID更新用户 """
+        ...
+
+    async def update_user_if(self, user_id: str, conditions: Dict[str, Any], user_data: Dict[str, Any],
+                             projection: List[str] = None) -> Dict[str, Any] | None:
+        """ 条件更新用户 """
+        ...
+
+    async def get_user_if(self, user_id: str, conditions: Dict[str, Any], fields: List[str]) -> Dict[str, Any] | None:
+        """ 条件读取用户 """
+        ...
+
+    async def bulk_update_users(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """ 批量更新多个用户 """
+        ...
+
+    async def increment_token_version(self, user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """ 递增用户 token 版本号 """
+        ...
+
+    async def soft_delete_user(self, user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """ 逻辑删除用户并递增 token 版本号 """
+        ...
+
+    async def restore_user(self, user_id: str, user_data: Dict[str, Any] = None) -> Dict[str, Any] | None:
+        """ 恢复已删除的用户，唯一字段冲突时抛出 DuplicateKeyError """
+        ...
+
+    async def user_pagination_list(self, page: int = 1, page_size: int = 10, sort_field: List[str] = None,
+                                   sort_by: SortDirection = SortDirection.DESCENDING,
+                                   filters: Dict[str, Any] = None, with_total: bool = True) -> Dict[str, Any]:
+        """ 获取用户分页列表 """
+        ...
+
+    async def user_cursor_list(self, page_size: int = 10, sort_by: SortDirection = SortDirection.DESCENDING,
+                               after: Tuple[datetime, ObjectId] | None = None,
+                               filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """ 获取用户游标分页列表 """
+        ...
+
+    def iter_users(self, sort_by: SortDirection = SortDirection.DESCENDING, filters: Dict[str, Any] = None,
+                   batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """ 按批遍历用户 """
+        ...
+
+
+class TokenRevocationRepositoryProtocol(Protocol):
+    """ token 吊销记录存储接口 """
+
+    async def upsert(self, kind: str, key: str, expire_at: datetime, version: int | None = None,
+                     not_before: int | None = None) -> None:
+        """ 写入或更新吊销记录 """
+        ...
+
+    async def insert_once(self, kind: str, key: str, expire_at: datetime) -> bool:
+        """ 写入吊销记录，记录已存在时返回 False """
+        ...
+
+    async def find_modified_since(self, since: datetime | None = None) -> List[Dict[str, Any]]:
+        """ 获取指定时间之后变更且未过期的吊销记录 """
+        ...
+
+
+class IdBlockRepositoryProtocol(Protocol):
+    """ ID号段存储接口 """
+
+    async def reserve(self, name: str, size: int) -> int:
+        """ 原子地预留一段连续序号，返回起始序号 """
+        ...
+
+
+# 内存后端的数据在进程内共享，只创建一次
+_memory_user_repo: Optional[MemoryUserRepository] = None
+_memory_id_block_repo: Optional[MemoryIdBlockRepository] = None
+
+
+def create_user_repo() -> UserRepositoryProtocol:
+    """
+    按配置创建用户存储，mongo 后端启用用户缓存时返回带缓存的实现
+    :return: UserRepositoryProtocol
+    """
+    global _memory_user_repo
+    if config.REPOSITORY_BACKEND not in REPOSITORY_BACKENDS:
+        raise ValueError(f"Invalid repository backend: {config.REPOSITORY_BACKEND}")
+    if config.REPOSITORY_BACKEND == "memory":
+        if _memory_user_repo is None:
+            _memory_user_repo = MemoryUserRepository()
+            metrics.register_collector("memory_user_repo", _memory_user_repo.stats)
+        return _memory_user_repo
+    return CachedUserRepository() if user_cache.enabled else UserRepository()
+
+
+def create_token_revocation_repo() -> TokenRevocationRepositoryProtocol:
+    """
+    按配置创建 token 吊销记录存储
+    :return: TokenRevocationRepositoryProtocol
+    """
+    if config.REPOSITORY_BACKEND == "memory":
+        return MemoryTokenRevocationRepository()
+    return TokenRevocationRepository()
+
+
+def create_id_block_repo() -> IdBlockRepositoryProtocol:
+    """
+    按配置创建ID号段存储
+    :return: IdBlockRepositoryProtocol
+    """
+    global _memory_id_block_repo
+    if config.REPOSITORY_BACKEND == "memory":
+        if _memory_id_block_repo is None:
+            _memory_id_block_repo = MemoryIdBlockRepository()
+        return _memory_id_block_repo
+    return IdBlockRepository()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：cached_user_repo.py
+@Author  ：晴天
+@Date    ：2025-04-22 16:20:09
+"""
+from typing import Dict, Any, List
+from app.core.user_cache import user_cache
+from app.repositories.user_repo import UserRepository
+
+# 只更新这些字段时不失效缓存，缓存中的最后修改信息允许在过期前保持旧值
+METADATA_FIELDS = frozenset({"last_modify_by", "last_modify_time", "last_modify_date"})
+
+
+class CachedUserRepository(UserRepository):
+    """
+    带缓存的用户数据库操作封装
+
+    按用户ID读取完整文档时走两级缓存，指定字段投影的读取直接访问数据库；
+    创建用户时写穿缓存，其余按用户ID的写操作完成后失效缓存。
+    """
+
+    @staticmethod
+    async def get_user_by_id(user_id: str, include_sensitive: bool = False,
+                             fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """
+        根据用户ID获取用户，优先读取缓存
+        :param user_id: 用户ID
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，指定时不走缓存
+        :return: 用户信息
+        """
+        if fields is not None:
+            return await UserRepository.get_user_by_id(user_id, include_sensitive, fields)
+        return await user_cache.get(user_id, include_sensitive,
+                                    lambda: UserRepository.get_user_by_id(user_id, include_sensitive))
+
+    @staticmethod
+    async def get_users_by_ids(user_ids: List[str], include_sensitive: bool = False,
+                               fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据用户ID批量获取用户，公开信息优先读取缓存
+        :param user_ids: 用户ID列表
+        :param include_sensitive: 是否包含敏感信息，包含时不走缓存
+        :param fields: 需要返回的字段，指定时不走缓存
+        :return: 用户ID -> 用户信息
+        """
+        if include_sensitive or fields is not None:
+            return await UserRepository.get_users_by_ids(user_ids, include_sensitive, fields)
+        return await user_cache.get_many(user_ids, UserRepository.get_users_by_ids)
+
+    @staticmethod
+    async def create(user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        创建用户并写入缓存
+        :param user_data: 用户数据
+        :return: 用户信息
+        """
+        user = await UserRepository.create(user_data)
+        await user_cache.set(user)
+        return user
+
+    @staticmethod
+    async def update_user_by_id(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        根据用户ID更新用户并失效缓存
+        :param user_id: 用户ID
+        :param user_data: 用户数据
+        :return: 用户信息
+        """
+        try:
+            return await UserRepository.update_user_by_id(user_id, user_data)
+        finally:
+            await user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def update_user_if(
+            user_id: str,
+            conditions: Dict[str, Any],
+            user_data: Dict[str, Any],
+            projection: List[str] = None
+    ) -> Dict[str, Any] | None:
+        """
+        条件更新用户并失效缓存
+        :param user_id: 用户ID
+        :param conditions: 附加的查询条件
+        :param user_data: 用户数据
+        :param projection: 需要返回的字段
+        :return: 更新后的字段，条件不满足或用户不存在时返回 None
+        """
+        try:
+            return await UserRepository.update_user_if(user_id, conditions, user_data, projection)
+        finally:
+            await user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def bulk_update_users(updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        批量更新多个用户，更新了最后修改信息之外字段的用户失效缓存
+        :param updates: 用户ID -> 需要 $set 的字段
+        :return: 匹配到的用户数
+        """
+        try:
+            return await UserRepository.bulk_update_users(updates)
+        finally:
+            for user_id, user_data in updates.items():
+                if not METADATA_FIELDS.issuperset(user_data):
+                    await user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def increment_token_version(user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        递增用户 token 版本号并失效缓存
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 递增后的版本号，用户不存在时返回 None
+        """
+        try:
+            return await UserRepository.increment_token_version(user_id, user_data)
+        finally:
+            await user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def soft_delete_user(user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        逻辑删除用户并失效缓存
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 递增后的 token 版本号，用户不存在或已删除时返回 None
+        """
+        try:
+            return await UserRepository.soft_delete_user(user_id, user_data)
+        finally:
+            await user_cache.invalidate(user_id)
+
+    @staticmethod
+    async def restore_user(user_id: str, user_data: Dict[str, Any] = None) -> Dict[str, Any] | None:
+        """
+        恢复已删除的用户并失效缓存
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 恢复后的用户信息
+        """
+        try:
+            return await UserRepository.restore_user(user_id, user_data)
+        finally:
+            await user_cache.invalidate(user_id)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：id_block_repo.py
+@Author  ：晴天
+@Date    ：2025-04-26 10:14:37
+"""
+from datetime import datetime
+from app.core.logger import logger
+from app.models.user_model import User
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# 号段集合：每种号段一条记录，_id 为号段名称，next 为下一个未分配的序号
+ID_BLOCK_COLLECTION = "id_block"
+
+
+class IdBlockRepository:
+    """ID号段数据库操作封装"""
+
+    @staticmethod
+    def collection() -> AsyncIOMotorCollection:
+        """ 号段集合，与 user 位于同一数据库 """
+        return User.get_motor_collection().database[ID_BLOCK_COLLECTION]
+
+    @staticmethod
+    async def reserve(name: str, size: int) -> int:
+        """
+        原子地预留一段连续序号，多个进程、多台主机并发预留时得到互不重叠的号段
+        :param name: 号段名称，例如 display_id
+        :param size: 预留数量
+        :return: 号段起始序号，号段为 [起始序号, 起始序号 + size)
+        """
+        now = datetime.now()
+        update = {"$inc": {"next": size}, "$set": {"last_modify_date": now}, "$setOnInsert": {"create_date": now}}
+        for attempt in range(2):
+            try:
+                block = await IdBlockRepository.collection().find_one_and_update(
+                    {"_id": name}, update, upsert=True, return_document=ReturnDocument.AFTER,
+                )
+                return block["next"] - size
+            except DuplicateKeyError:
+                # 并发首次预留时只有一个 upsert 能插入，另一个重试即可更新已插入的记录
+                if attempt:
+                    raise
+            except Exception as e:
+                logger.error(f"预留号段失败: {e}")
+                raise
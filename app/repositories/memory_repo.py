@@ -0,0 +1,555 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：memory_repo.py
+@Author  ：晴天
+@Date    ：2025-04-23 16:40:52
+"""
+import bisect
+from bson import ObjectId
+from datetime import datetime, timezone
+from app.core.logger import logger
+from app.models.user_model import User
+from beanie.odm.enums import SortDirection
+from pymongo.errors import DuplicateKeyError
+from app.utils.cursor_util import encode_cursor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+from app.schemas.pagination import PaginationResult, CursorPaginationResult
+
+# 与 User 模型唯一索引对应的字段，只对未删除的用户生效
+UNIQUE_FIELDS = ("email", "user_id", "display_id")
+
+
+def _compare(value: Any, condition: Any) -> bool:
+    """
+    判断字段值是否满足条件，支持等值与 $eq / $ne / $gt / $gte / $lt / $lte / $in
+    :param value: 字段值
+    :param condition: 条件
+    :return: 是否满足
+    """
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq":
+            matched = value == operand
+        elif op == "$ne":
+            matched = value != operand
+        elif op == "$in":
+            matched = value in operand
+        elif value is None:
+            matched = False
+        elif op == "$gt":
+            matched = value > operand
+        elif op == "$gte":
+            matched = value >= operand
+        elif op == "$lt":
+            matched = value < operand
+        elif op == "$lte":
+            matched = value <= operand
+        else:
+            raise ValueError(f"Unsupported query operator: {op}")
+        if not matched:
+            return False
+    return True
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """
+    判断文档是否满足查询条件
+    :param doc: 文档
+    :param query: 查询条件，字段之间为与关系
+    :return: 是否满足
+    """
+    return all(_compare(doc.get(field), condition) for field, condition in query.items())
+
+
+def _sort_key(value: Any) -> Tuple[bool, Any]:
+    """
+    排序键，与 MongoDB 一致缺失或为 None 的值排在最前，避免与其它值比较
+    :param value: 字段值
+    :return: (是否有值, 字段值)
+    """
+    return value is not None, value
+
+
+def _project(doc: Dict[str, Any], projection: Dict[str, int]) -> Dict[str, Any]:
+    """
+    按投影复制文档
+    :param doc: 文档
+    :param projection: User.projection 生成的投影
+    :return: 新的字典
+    """
+    return {field: doc[field] for field, included in projection.items() if included and field in doc}
+
+
+class MemoryUserRepository:
+    """
+    内存用户存储
+
+    与 UserRepository 接口一致，数据保存在进程内：主存储为 _id -> 文档，
+    email / user_id / display_id 为字典索引（只包含未删除的用户，与部分唯一索引一致），
+    create_date 为按 (create_date, _id) 排序的列表，分页和游标分页通过二分查找定位。
+    所有方法内部没有 await，在单个事件循环内天然原子。
+    用于压测 HTTP 层、区分框架开销与数据库延迟，数据不持久化，进程之间不共享。
+    """
+
+    def __init__(self):
+        """ 初始化 """
+        self._docs: Dict[ObjectId, Dict[str, Any]] = {}
+        self._unique: Dict[str, Dict[str, ObjectId]] = {field: {} for field in UNIQUE_FIELDS}
+        self._order: List[Tuple[datetime, ObjectId]] = []
+
+    def _find(self, field: str, value: Any) -> Dict[str, Any] | None:
+        """ 按唯一字段查找未删除的用户 """
+        object_id = self._unique[field].get(value)
+        return self._docs.get(object_id) if object_id is not None else None
+
+    def _index(self, doc: Dict[str, Any]) -> None:
+        """ 将未删除的文档写入唯一索引，冲突时抛出与 MongoDB 相同的 DuplicateKeyError """
+        if doc["is_deleted"]:
+            return
+        for field in UNIQUE_FIELDS:
+            existing = self._unique[field].get(doc[field])
+            if existing is not None and existing != doc["_id"]:
+                raise DuplicateKeyError(f"E11000 duplicate key error, index: uniq_{field}_active", code=11000,
+                                        details={"keyPattern": {field: 1}, "keyValue": {field: doc[field]}})
+        for field in UNIQUE_FIELDS:
+            self._unique[field][doc[field]] = doc["_id"]
+
+    def _unindex(self, doc: Dict[str, Any]) -> None:
+        """ 从唯一索引中移除文档 """
+        for field in UNIQUE_FIELDS:
+            if self._unique[field].get(doc[field]) == doc["_id"]:
+                del self._unique[field][doc[field]]
+
+    def _update(self, doc: Dict[str, Any], changes: Dict[str, Any], inc: Dict[str, int] | None = None) -> None:
+        """
+        更新文档并维护索引，唯一字段冲突时文档保持不变
+        :param doc: 文档，原地修改
+        :param changes: $set 的字段
+        :param inc: $inc 的字段
+        :return: None
+        """
+        updated = {**doc, **changes}
+        for field, value in (inc or {}).items():
+            updated[field] = updated.get(field, 0) + value
+        self._unindex(doc)
+        try:
+            self._index(updated)
+        except DuplicateKeyError:
+            self._index(doc)
+            raise
+        doc.update(updated)
+
+    def _scan(self, sort_by: SortDirection, query: Dict[str, Any],
+              start: int | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        按 (create_date, _id) 顺序遍历满足条件的文档
+        :param sort_by: 排序方式
+        :param query: 查询条件
+        :param start: 排序索引中的起始位置，为空时从头开始
+        :return: 文档迭代器
+        """
+        descending = sort_by == SortDirection.DESCENDING
+        order = self._order
+        if descending:
+            positions = range(len(order) - 1 if start is None else start, -1, -1)
+        else:
+            positions = range(0 if start is None else start, len(order))
+        for position in positions:
+            doc = self._docs[order[position][1]]
+            if _matches(doc, query):
+                yield doc
+
+    async def get_user_by_email(self, email: str, include_sensitive: bool = False,
+                                fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """
+        根据邮箱获取用户
+        :param email: 用户邮箱
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 用户信息，不存在时返回 None
+        """
+        doc = self._find("email", email)
+        return User.serialize_raw(_project(doc, User.projection(fields, include_sensitive))) if doc else None
+
+    async def get_user_by_id(self, user_id: str, include_sensitive: bool = False,
+                             fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """
+        根据用户ID获取用户
+        :param user_id: 用户ID
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 用户信息，不存在时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        return User.serialize_raw(_project(doc, User.projection(fields, include_sensitive))) if doc else None
+
+    async def get_user_by_display_id(self, display_id: str, include_sensitive: bool = False,
+                                     fields: List[str] | None = None) -> Dict[str, Any] | None:
+        """
+        根据用户展示ID获取用户
+        :param display_id: 用户展示ID
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 用户信息，不存在时返回 None
+        """
+        doc = self._find("display_id", display_id)
+        return User.serialize_raw(_project(doc, User.projection(fields, include_sensitive))) if doc else None
+
+    def _get_users_by(self, field: str, values: List[str], include_sensitive: bool = False,
+                      fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """ 按唯一字段批量获取用户 """
+        if fields is not None and field not in fields:
+            fields = [*fields, field]
+        projection = User.projection(fields, include_sensitive)
+        result = {}
+        for value in dict.fromkeys(values):
+            doc = self._find(field, value)
+            if doc is not None:
+                result[value] = User.serialize_raw(_project(doc, projection))
+        return result
+
+    async def get_users_by_ids(self, user_ids: List[str], include_sensitive: bool = False,
+                               fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据用户ID批量获取用户
+        :param user_ids: 用户ID列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 用户ID -> 用户信息
+        """
+        return self._get_users_by("user_id", user_ids, include_sensitive, fields)
+
+    async def get_users_by_emails(self, emails: List[str], include_sensitive: bool = False,
+                                  fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据邮箱批量获取用户
+        :param emails: 邮箱列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 邮箱 -> 用户信息
+        """
+        return self._get_users_by("email", emails, include_sensitive, fields)
+
+    async def get_users_by_display_ids(self, display_ids: List[str], include_sensitive: bool = False,
+                                       fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据用户展示ID批量获取用户
+        :param display_ids: 用户展示ID列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段
+        :return: 用户展示ID -> 用户信息
+        """
+        return self._get_users_by("display_id", display_ids, include_sensitive, fields)
+
+    async def create(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        创建用户，唯一字段冲突时抛出 DuplicateKeyError
+        :param user_data: 用户数据
+        :return: 用户信息
+        """
+        # User 未经 init_beanie 不能实例化，按模型字段补齐默认值
+        doc: Dict[str, Any] = {"_id": ObjectId()}
+        for name, model_field in User.model_fields.items():
+            if name in ("id", "revision_id"):
+                continue
+            if name in user_data:
+                doc[name] = user_data[name]
+            elif model_field.is_required():
+                raise ValueError(f"Missing user field: {name}")
+            else:
+                doc[name] = model_field.get_default(call_default_factory=True)
+        try:
+            self._index(doc)
+        except DuplicateKeyError as e:
+            logger.error(f"创建用户失败: {e}")
+            raise
+        self._docs[doc["_id"]] = doc
+        bisect.insort(self._order, (doc["create_date"], doc["_id"]))
+        return User.serialize_raw(_project(doc, User.projection()))
+
+    async def update_user_by_id(self, user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        根据用户ID更新用户
+        :param user_id: 用户ID
+        :param user_data: 用户数据
+        :return: 更新后的用户信息，用户不存在时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        if doc is None:
+            return None
+        self._update(doc, user_data)
+        return User.serialize_raw(_project(doc, User.projection()))
+
+    async def update_user_if(self, user_id: str, conditions: Dict[str, Any], user_data: Dict[str, Any],
+                             projection: List[str] = None) -> Dict[str, Any] | None:
+        """
+        条件更新用户，用户存在且满足附加条件时才更新
+        :param user_id: 用户ID
+        :param conditions: 附加的查询条件，例如 {"token_version": {"$lte": 3}}
+        :param user_data: 用户数据
+        :param projection: 需要返回的字段
+        :return: 更新后的字段，条件不满足或用户不存在时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        if doc is None or not _matches(doc, conditions):
+            return None
+        self._update(doc, user_data)
+        return {field: doc.get(field) for field in projection or []}
+
+    async def get_user_if(self, user_id: str, conditions: Dict[str, Any], fields: List[str]) -> Dict[str, Any] | None:
+        """
+        条件读取用户
+        :param user_id: 用户ID
+        :param conditions: 附加的查询条件，例如 {"token_version": {"$lte": 3}}
+        :param fields: 需要返回的字段
+        :return: 用户字段，条件不满足或用户不存在时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        if doc is None or not _matches(doc, conditions):
+            return None
+        return {field: doc.get(field) for field in fields}
+
+    async def bulk_update_users(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        批量更新多个用户，用于延迟写入的元数据，带 last_modify_time 的更新只在文档的修改时间更早时生效
+        :param updates: 用户ID -> 需要更新的字段
+        :return: 匹配到的用户数，已删除、不存在或已有更新的修改的用户跳过
+        """
+        matched = 0
+        for user_id, user_data in updates.items():
+            doc = self._find("user_id", user_id)
+            query = {"last_modify_time": {"$lt": user_data["last_modify_time"]}} if "last_modify_time" in user_data else {}
+            if doc is not None and _matches(doc, query):
+                self._update(doc, user_data)
+                matched += 1
+        return matched
+
+    async def increment_token_version(self, user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        递增用户 token 版本号
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 递增后的版本号，用户不存在时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        if doc is None:
+            return None
+        self._update(doc, user_data or {}, inc={"token_version": 1})
+        return doc["token_version"]
+
+    async def soft_delete_user(self, user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        逻辑删除用户，同时递增 token 版本号
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 递增后的 token 版本号，用户不存在或已删除时返回 None
+        """
+        doc = self._find("user_id", user_id)
+        if doc is None:
+            return None
+        self._update(doc, {**(user_data or {}), "is_deleted": True, "delete_date": datetime.now()},
+                     inc={"token_version": 1})
+        return doc["token_version"]
+
+    async def restore_user(self, user_id: str, user_data: Dict[str, Any] = None) -> Dict[str, Any] | None:
+        """
+        恢复已删除的用户
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据
+        :return: 恢复后的用户信息，用户不存在或未删除时返回 None
+        """
+        # 内存后端不归档，取消最近一次删除
+        deleted = [doc for doc in self._docs.values() if doc["user_id"] == user_id and doc["is_deleted"]]
+        if not deleted:
+            return None
+        doc = max(deleted, key=lambda doc: doc.get("delete_date") or datetime.min)
+        self._update(doc, {**(user_data or {}), "is_deleted": False, "delete_date": None})
+        return User.serialize_raw(_project(doc, User.projection()))
+
+    async def user_pagination_list(self, page: int = 1, page_size: int = 10, sort_field: List[str] = None,
+                                   sort_by: SortDirection = SortDirection.DESCENDING,
+                                   filters: Dict[str, Any] = None, with_total: bool = True) -> Dict[str, Any]:
+        """
+        分页获取用户列表
+        :param page: 页码
+        :param page_size: 每页数量
+        :param sort_field: 排序字段，为空时按 (create_date, _id) 排序
+        :param sort_by: 排序方式
+        :param filters: 过滤条件，例如 {"is_active": True}
+        :param with_total: 是否返回总数
+        :return: 分页结果
+        """
+        query = {"is_deleted": False, **(filters or {})}
+        skip = (page - 1) * page_size
+        if sort_field:
+            # 非默认排序没有索引，全量排序
+            docs = sorted((doc for doc in self._docs.values() if _matches(doc, query)),
+                          key=lambda doc: tuple(_sort_key(doc.get(field)) for field in sort_field),
+                          reverse=sort_by == SortDirection.DESCENDING)
+            users = docs[skip:skip + page_size]
+        else:
+            users = []
+            for position, doc in enumerate(self._scan(sort_by, query)):
+                if position >= skip + page_size:
+                    break
+                if position >= skip:
+                    users.append(doc)
+        total = None
+        if with_total:
+            # 只按未删除过滤时唯一索引的大小即为总数
+            total = len(self._unique["user_id"]) if not filters else sum(1 for _ in self._scan(sort_by, query))
+        next_cursor = None
+        if not sort_field and len(users) == page_size:
+            next_cursor = encode_cursor(users[-1]["create_date"], users[-1]["_id"], sort_by.value)
+        projection = User.projection()
+        user_list = User.serialize_many(_project(doc, projection) for doc in users)
+        return PaginationResult(list=user_list, total=total, total_estimated=False if with_total else None,
+                                page=page, page_size=page_size, next_cursor=next_cursor).model_dump()
+
+    async def user_cursor_list(self, page_size: int = 10, sort_by: SortDirection = SortDirection.DESCENDING,
+                               after: Tuple[datetime, ObjectId] | None = None,
+                               filters: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        游标分页获取用户列表
+        :param page_size: 每页数量
+        :param sort_by: 排序方式
+        :param after: 上一页最后一条记录的 (create_date, _id)，为空时从第一条开始
+        :param filters: 过滤条件，例如 {"is_active": True}
+        :return: 分页结果
+        """
+        query = {"is_deleted": False, **(filters or {})}
+        start = None
+        if after is not None:
+            # 从游标位置之后开始，跳过游标本身
+            if sort_by == SortDirection.DESCENDING:
+                start = bisect.bisect_left(self._order, after) - 1
+            else:
+                start = bisect.bisect_right(self._order, after)
+        users = []
+        for doc in self._scan(sort_by, query, start):
+            users.append(doc)
+            if len(users) > page_size:
+                break
+        next_cursor = None
+        if len(users) > page_size:
+            users = users[:page_size]
+            next_cursor = encode_cursor(users[-1]["create_date"], users[-1]["_id"], sort_by.value)
+        projection = User.projection()
+        user_list = User.serialize_many(_project(doc, projection) for doc in users)
+        return CursorPaginationResult(list=user_list, page_size=page_size, next_cursor=next_cursor).model_dump()
+
+    async def iter_users(self, sort_by: SortDirection = SortDirection.DESCENDING, filters: Dict[str, Any] = None,
+                         batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        按 (create_date, _id) 顺序分批遍历用户
+        :param sort_by: 排序方式
+        :param filters: 过滤条件，与 user_pagination_list 相同
+        :param batch_size: 每批文档数
+        :return: 异步迭代器，每次产出一批序列化后的用户
+        """
+        query = {"is_deleted": False, **(filters or {})}
+        projection = User.projection()
+        # 遍历开始时的快照，遍历期间新增的用户不会出现
+        order = list(self._order)
+        if sort_by == SortDirection.DESCENDING:
+            order.reverse()
+        batch: List[Dict[str, Any]] = []
+        for _, object_id in order:
+            doc = self._docs[object_id]
+            if _matches(doc, query):
+                batch.append(User.serialize_raw(_project(doc, projection)))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def stats(self) -> Dict[str, int]:
+        """
+        获取统计信息
+        :return: 文档数与未删除的用户数
+        """
+        return {"documents": len(self._docs), "active": len(self._unique["user_id"])}
+
+
+class MemoryTokenRevocationRepository:
+    """ 内存吊销记录存储，与 TokenRevocationRepository 接口一致，(kind, key) 唯一 """
+
+    def __init__(self):
+        """ 初始化 """
+        self._records: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    async def upsert(self, kind: str, key: str, expire_at: datetime, version: int | None = None,
+                     not_before: int | None = None) -> None:
+        """
+        写入或合并吊销记录，版本号、签发时间与过期时间取较大值
+        :param kind: 吊销类型
+        :param key: 吊销对象
+        :param expire_at: 过期时间（UTC）
+        :param version: 最小有效版本号
+        :param not_before: 最早有效签发时间（秒）
+        :return: None
+        """
+        now = datetime.now(timezone.utc)
+        record = self._records.setdefault((kind, key), {"kind": kind, "key": key, "version": None,
+                                                        "not_before": None, "expire_at": expire_at,
+                                                        "create_date": now})
+        record["expire_at"] = max(record["expire_at"], expire_at)
+        if version is not None:
+            record["version"] = max(record["version"] or 0, version)
+        if not_before is not None:
+            record["not_before"] = max(record["not_before"] or 0, not_before)
+        record["last_modify_date"] = now
+
+    async def insert_once(self, kind: str, key: str, expire_at: datetime) -> bool:
+        """
+        写入吊销记录，记录已存在时返回 False
+        :param kind: 吊销类型
+        :param key: 吊销对象
+        :param expire_at: 过期时间（UTC）
+        :return: 是否写入成功
+        """
+        if (kind, key) in self._records:
+            return False
+        now = datetime.now(timezone.utc)
+        self._records[(kind, key)] = {"kind": kind, "key": key, "version": None, "not_before": None,
+                                      "expire_at": expire_at, "create_date": now, "last_modify_date": now}
+        return True
+
+    async def find_modified_since(self, since: datetime | None = None) -> List[Dict[str, Any]]:
+        """
+        获取指定时间之后变更且未过期的吊销记录
+        :param since: 起始时间（UTC），为空时返回全部
+        :return: 吊销记录列表
+        """
+        # 与 TTL 索引一致，顺带清理已过期的记录
+        now = datetime.now(timezone.utc)
+        records = []
+        for key, record in list(self._records.items()):
+            if record["expire_at"] <= now:
+                del self._records[key]
+            elif since is None or record["last_modify_date"] >= since:
+                records.append(dict(record))
+        return records
+
+
+class MemoryIdBlockRepository:
+    """ 内存号段存储，与 IdBlockRepository 接口一致 """
+
+    def __init__(self):
+        """ 初始化 """
+        self._next: Dict[str, int] = {}
+
+    async def reserve(self, name: str, size: int) -> int:
+        """
+        预留一段连续序号
+        :param name: 号段名称，例如 display_id
+        :param size: 预留数量
+        :return: 号段起始序号，号段为 [起始序号, 起始序号 + size)
+        """
+        start = self._next.get(name, 0)
+        self._next[name] = start + size
+        return start
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：token_revocation_repo.py
+@Author  ：晴天
+@Date    ：2025-04-17 10:48:15
+"""
+from typing import Dict, Any, List
+from app.core.logger import logger
+from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
+from app.database.read_routing import read_router
+from app.models.token_revocation_model import TokenRevocation
+
+
+class TokenRevocationRepository:
+    """token 吊销记录数据库操作封装"""
+
+    @staticmethod
+    async def upsert(kind: str, key: str, expire_at: datetime, version: int | None = None,
+                     not_before: int | None = None) -> None:
+        """
+        写入或更新吊销记录，version / not_before / expire_at 只增不减
+        :param kind: 吊销类型
+        :param key: 吊销对象
+        :param expire_at: 过期时间（UTC）
+        :param version: 最小有效版本号
+        :param not_before: 最早有效签发时间（秒）
+        :return: None
+        """
+        now = datetime.now(timezone.utc)
+        update: Dict[str, Any] = {
+            "$set": {"last_modify_date": now},
+            "$max": {"expire_at": expire_at},
+            "$setOnInsert": {"create_date": now},
+        }
+        if version is not None:
+            update["$max"]["version"] = version
+        if not_before is not None:
+            update["$max"]["not_before"] = not_before
+        try:
+            await TokenRevocation.get_motor_collection().update_one({"kind": kind, "key": key}, update, upsert=True)
+        except Exception as e:
+            logger.error(f"写入吊销记录失败: {e}")
+            raise
+
+    @staticmethod
+    async def insert_once(kind: str, key: str, expire_at: datetime) -> bool:
+        """
+        写入吊销记录，记录已存在时返回 False，用于刷新 token 时原子地结束会话
+        :param kind: 吊销类型
+        :param key: 吊销对象
+        :param expire_at: 过期时间（UTC）
+        :return: 是否写入成功
+        """
+        try:
+            await TokenRevocation(kind=kind, key=key, expire_at=expire_at).insert()
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            logger.error(f"写入吊销记录失败: {e}")
+            raise
+
+    @staticmethod
+    async def find_modified_since(since: datetime | None = None) -> List[Dict[str, Any]]:
+        """
+        获取指定时间之后变更且未过期的吊销记录
+        :param since: 起始时间（UTC），为空时返回全部
+        :return: 吊销记录列表
+        """
+        query: Dict[str, Any] = {"expire_at": {"$gt": datetime.now(timezone.utc)}}
+        if since is not None:
+            query["last_modify_date"] = {"$gte": since}
+        projection = {"_id": 0, "kind": 1, "key": 1, "version": 1, "not_before": 1,
+                      "expire_at": 1, "last_modify_date": 1}
+        try:
+            cursor = read_router.collection(TokenRevocation.get_motor_collection(),
+                                            "TokenRevocationRepository.find_modified_since").find(query, projection)
+            return await cursor.to_list(length=None)
+        except Exception as e:
+            logger.error(f"查询吊销记录失败: {e}")
+            raise
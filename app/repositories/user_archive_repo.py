@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：user_archive_repo.py
+@Author  ：晴天
+@Date    ：2025-04-24 15:12:06
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+from app.core.logger import logger
+from app.models.user_model import User
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+# 归档集合：结构与 user 相同，额外记录 archive_date
+USER_ARCHIVE_COLLECTION = "user_archive"
+# 归档进度集合：每个归档任务一条记录，_id 为任务名
+ARCHIVE_CHECKPOINT_COLLECTION = "archive_checkpoint"
+
+
+class UserArchiveRepository:
+    """用户归档数据库操作封装"""
+
+    @staticmethod
+    def archive_collection() -> AsyncIOMotorCollection:
+        """ 归档集合，与 user 位于同一数据库 """
+        return User.get_motor_collection().database[USER_ARCHIVE_COLLECTION]
+
+    @staticmethod
+    def checkpoint_collection() -> AsyncIOMotorCollection:
+        """ 归档进度集合 """
+        return User.get_motor_collection().database[ARCHIVE_CHECKPOINT_COLLECTION]
+
+    @staticmethod
+    async def acquire_lease(job: str, owner: str, ttl: float) -> Dict[str, Any] | None:
+        """
+        获取归档任务租约，多进程部署时同一时间只有一个进程执行归档
+        :param job: 任务名
+        :param owner: 当前进程标识
+        :param ttl: 租约有效期（秒），执行期间需要续约
+        :return: 进度记录，租约被其它进程持有时返回 None
+        """
+        now = datetime.now()
+        try:
+            return await UserArchiveRepository.checkpoint_collection().find_one_and_update(
+                {"_id": job, "$or": [{"owner": owner}, {"lease_until": {"$lt": now}}]},
+                {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=ttl)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # 记录存在但租约未过期，upsert 插入同一 _id 失败
+            return None
+        except Exception as e:
+            logger.error(f"获取归档租约失败: {e}")
+            raise
+
+    @staticmethod
+    async def save_checkpoint(job: str, owner: str, checkpoint: Dict[str, Any] | None, ttl: float) -> bool:
+        """
+        保存归档进度并续约
+        :param job: 任务名
+        :param owner: 当前进程标识
+        :param checkpoint: 进度，例如 {"cutoff": 截止时间, "after": [delete_date, _id]}，为空表示本轮完成
+        :param ttl: 租约有效期（秒）
+        :return: 是否仍持有租约
+        """
+        try:
+            result = await UserArchiveRepository.checkpoint_collection().update_one(
+                {"_id": job, "owner": owner},
+                {"$set": {"checkpoint": checkpoint, "lease_until": datetime.now() + timedelta(seconds=ttl),
+                          "last_modify_date": datetime.now()}},
+            )
+            return result.matched_count == 1
+        except Exception as e:
+            logger.error(f"保存归档进度失败: {e}")
+            raise
+
+    @staticmethod
+    async def release_lease(job: str, owner: str) -> None:
+        """
+        释放归档任务租约，进度保留
+        :param job: 任务名
+        :param owner: 当前进程标识
+        :return: None
+        """
+        try:
+            await UserArchiveRepository.checkpoint_collection().update_one(
+                {"_id": job, "owner": owner}, {"$set": {"lease_until": datetime.min}}
+            )
+        except Exception as e:
+            logger.error(f"释放归档租约失败: {e}")
+            raise
+
+    @staticmethod
+    async def archive_batch(cutoff: datetime, after: Tuple[datetime, Any] | None,
+                            batch_size: int) -> Tuple[int, Tuple[datetime, Any] | None]:
+        """
+        将一批删除时间早于 cutoff 的用户从 user 移到 user_archive
+        先按 _id 覆盖写入归档集合，再从 user 删除仍处于删除状态的文档，两步都可以重复执行；
+        删除前被恢复或修改为未删除的文档留在 user 中，其归档副本随即移除
+        :param cutoff: 删除时间阈值
+        :param after: 上一批最后一条的 (delete_date, _id)，为空时从头开始
+        :param batch_size: 每批文档数
+        :return: (移出的文档数, 本批最后一条的 (delete_date, _id))，没有更多文档时后者为 None
+        """
+        query: Dict[str, Any] = {"is_deleted": True, "delete_date": {"$lt": cutoff}}
+        if after is not None:
+            delete_date, object_id = after
+            query["$or"] = [
+                {"delete_date": {"$gt": delete_date}},
+                {"delete_date": delete_date, "_id": {"$gt": object_id}},
+            ]
+        users = User.get_motor_collection()
+        archive = UserArchiveRepository.archive_collection()
+        try:
+            docs: List[Dict[str, Any]] = await users.find(
+                query, sort=[("delete_date", 1), ("_id", 1)], limit=batch_size
+            ).to_list(length=batch_size)
+            if not docs:
+                return 0, None
+            archive_date = datetime.now()
+            await archive.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, {**doc, "archive_date": archive_date}, upsert=True) for doc in docs],
+                ordered=False,
+            )
+            ids = [doc["_id"] for doc in docs]
+            result = await users.delete_many({"_id": {"$in": ids}, "is_deleted": True})
+            if result.deleted_count < len(ids):
+                kept = [doc["_id"] async for doc in users.find({"_id": {"$in": ids}}, projection={"_id": 1})]
+                await archive.delete_many({"_id": {"$in": kept}})
+            return result.deleted_count, (docs[-1]["delete_date"], docs[-1]["_id"])
+        except Exception as e:
+            logger.error(f"归档用户失败: {e}")
+            raise
+
+    @staticmethod
+    async def restore_user(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        将归档的用户移回 user 并取消删除
+        先插入 user 再删除归档副本；插入时 _id 已存在说明上次恢复中断在两步之间，直接删除归档副本
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据，例如最后修改信息
+        :return: 恢复后的原始文档，用户不在归档中时返回 None
+        :raises DuplicateKeyError: 邮箱等唯一字段已被其它未删除用户占用
+        """
+        archive = UserArchiveRepository.archive_collection()
+        try:
+            doc = await archive.find_one({"user_id": user_id}, sort=[("archive_date", -1)])
+            if doc is None:
+                return None
+            doc.pop("archive_date", None)
+            doc.update({**user_data, "is_deleted": False, "delete_date": None})
+            try:
+                await User.get_motor_collection().insert_one(doc)
+            except DuplicateKeyError as e:
+                if "_id" not in (e.details or {}).get("keyPattern", {}):
+                    raise
+            await archive.delete_one({"_id": doc["_id"]})
+            return doc
+        except DuplicateKeyError:
+            raise
+        except Exception as e:
+            logger.error(f"恢复归档用户失败: {e}")
+            raise
@@ -6,61 +6,167 @@
 @Author  ：晴天
 @Date    ：2025-04-04 17:23:35
 """
-from typing import Dict, Any, List
+import asyncio
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import ExecutionTimeout
+from typing import Dict, Any, List, Tuple, AsyncIterator
 from app.core.logger import logger
 from app.models.user_model import User
 from beanie.odm.enums import SortDirection
-from app.schemas.pagination import PaginationResult
+from app.core.count_cache import user_count_cache
+from app.core.deadline import max_time_ms, max_time_command, deadline_exceeded
+from app.database.read_routing import read_router
+from motor.motor_asyncio import AsyncIOMotorCollection
+from app.utils.cursor_util import encode_cursor
+from app.schemas.pagination import PaginationResult, CursorPaginationResult
+from app.repositories.user_archive_repo import UserArchiveRepository
 
 
 class UserRepository:
     """用户数据库操作封装"""
 
     @staticmethod
-    async def get_user_by_email(email: str, include_sensitive: bool = False) -> Dict[str, Any] | None:
+    def _read_collection(operation: str) -> AsyncIOMotorCollection:
+        """
+        按读路由获取用户集合，读偏好通过 DB_READ_ROUTES 按方法配置
+        :param operation: 方法名，例如 get_user_by_id
+        :return: motor 集合
+        """
+        return read_router.collection(User.get_motor_collection(), f"UserRepository.{operation}")
+
+    @staticmethod
+    async def get_user_by_email(email: str, include_sensitive: bool = False,
+                                fields: List[str] | None = None) -> Dict[str, Any] | None:
         """
         根据邮箱获取用户
         :param email: 用户邮箱
-        :param include_sensitive: 是否包含敏感信息
-        :return: 用户信息
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "password"]，为空时返回全部字段
+        :return: 用户信息，直接读取原始文档，不经过模型校验
         """
         try:
-            user = await User.find_one(User.email == email, User.is_deleted == False)
-            return user.model_serialize(include_sensitive=include_sensitive) if user else None
+            user = await UserRepository._read_collection("get_user_by_email").find_one(
+                {"email": email, "is_deleted": False}, projection=User.projection(fields, include_sensitive),
+                max_time_ms=max_time_ms(),
+            )
+            return User.serialize_raw(user) if user else None
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
         except Exception as e:
             logger.error(f"查询用户异常: {e}")
             raise
 
     @staticmethod
-    async def get_user_by_id(user_id: str, include_sensitive: bool = False) -> Dict[str, Any] | None:
+    async def get_user_by_id(user_id: str, include_sensitive: bool = False,
+                             fields: List[str] | None = None) -> Dict[str, Any] | None:
         """
         根据用户ID获取用户
         :param user_id: 用户ID
-        :param include_sensitive: 是否包含敏感信息
-        :return: 用户信息
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "password"]，为空时返回全部字段
+        :return: 用户信息，直接读取原始文档，不经过模型校验
         """
         try:
-            user = await User.find_one(User.user_id == user_id, User.is_deleted == False)
-            return user.model_serialize(include_sensitive=include_sensitive) if user else None
+            user = await UserRepository._read_collection("get_user_by_id").find_one(
+                {"user_id": user_id, "is_deleted": False}, projection=User.projection(fields, include_sensitive),
+                max_time_ms=max_time_ms(),
+            )
+            return User.serialize_raw(user) if user else None
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
         except Exception as e:
             logger.error(f"查询用户异常: {e}")
             raise
 
     @staticmethod
-    async def get_user_by_display_id(display_id: str, include_sensitive: bool = False) -> Dict[str, Any] | None:
+    async def get_user_by_display_id(display_id: str, include_sensitive: bool = False,
+                                     fields: List[str] | None = None) -> Dict[str, Any] | None:
         """
         根据用户展示ID获取用户
         :param display_id: 用户展示ID
-        :param include_sensitive: 是否包含敏感信息
-        :return: 用户信息
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "password"]，为空时返回全部字段
+        :return: 用户信息，直接读取原始文档，不经过模型校验
         """
         try:
-            user = await User.find_one(User.display_id == display_id, User.is_deleted == False)
-            return user.model_serialize(include_sensitive=include_sensitive) if user else None
+            user = await UserRepository._read_collection("get_user_by_display_id").find_one(
+                {"display_id": display_id, "is_deleted": False}, projection=User.projection(fields, include_sensitive),
+                max_time_ms=max_time_ms(),
+            )
+            return User.serialize_raw(user) if user else None
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
         except Exception as e:
             logger.error(f"查询用户异常: {e}")
             raise
 
+    @staticmethod
+    async def _get_users_by(operation: str, field: str, values: List[str], include_sensitive: bool = False,
+                            fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        按字段批量获取用户，一次 $in 查询
+        :param operation: 调用方的方法名，用于读路由
+        :param field: 查询字段，例如 user_id
+        :param values: 字段值列表，重复值只查询一次
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，为空时返回全部字段；查询字段总是返回
+        :return: 字段值 -> 用户信息，不存在的值不出现在结果中
+        """
+        values = list(dict.fromkeys(values))
+        if not values:
+            return {}
+        if fields is not None and field not in fields:
+            fields = [*fields, field]
+        try:
+            cursor = UserRepository._read_collection(operation).find(
+                {field: {"$in": values}, "is_deleted": False}, projection=User.projection(fields, include_sensitive),
+                max_time_ms=max_time_ms(),
+            )
+            return {user[field]: User.serialize_raw(user) async for user in cursor}
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"批量查询用户异常: {e}")
+            raise
+
+    @staticmethod
+    async def get_users_by_ids(user_ids: List[str], include_sensitive: bool = False,
+                               fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据用户ID批量获取用户
+        :param user_ids: 用户ID列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "nickname"]，为空时返回全部字段
+        :return: 用户ID -> 用户信息
+        """
+        return await UserRepository._get_users_by("get_users_by_ids", "user_id", user_ids, include_sensitive, fields)
+
+    @staticmethod
+    async def get_users_by_emails(emails: List[str], include_sensitive: bool = False,
+                                  fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据邮箱批量获取用户
+        :param emails: 邮箱列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "nickname"]，为空时返回全部字段
+        :return: 邮箱 -> 用户信息
+        """
+        return await UserRepository._get_users_by("get_users_by_emails", "email", emails, include_sensitive, fields)
+
+    @staticmethod
+    async def get_users_by_display_ids(display_ids: List[str], include_sensitive: bool = False,
+                                       fields: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        """
+        根据用户展示ID批量获取用户
+        :param display_ids: 用户展示ID列表
+        :param include_sensitive: 是否包含敏感信息，fields 为空时生效
+        :param fields: 需要返回的字段，例如 ["user_id", "nickname"]，为空时返回全部字段
+        :return: 用户展示ID -> 用户信息
+        """
+        return await UserRepository._get_users_by("get_users_by_display_ids", "display_id", display_ids, include_sensitive, fields)
+
     @staticmethod
     async def create(user_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -70,7 +176,10 @@ class UserRepository:
         """
         try:
             user = User(**user_data)
+            # 写入不支持 maxTimeMS，截止时间已过时不再写入
+            max_time_ms()
             await user.create()
+            user_count_cache.apply_change(None, user.model_dump())
             return user.model_serialize()
         except Exception as e:
             logger.error(f"创建用户失败: {e}")
@@ -79,36 +188,205 @@ class UserRepository:
     @staticmethod
     async def update_user_by_id(user_id: str, user_data: Dict[str, Any]) -> Dict[str, Any] | None:
         """
-        根据用户ID更新用户
+        根据用户ID更新用户，查找与更新在一次 findAndModify 中完成
         :param user_id: 用户ID
         :param user_data: 用户数据
         :return: 用户信息
         """
         try:
-            user = await User.find_one(User.user_id == user_id, User.is_deleted == False)
-            if not user:
-                return None
-            await user.set(user_data)
-            return user.model_serialize()
+            user = await User.get_motor_collection().find_one_and_update(
+                {"user_id": user_id, "is_deleted": False},
+                {"$set": user_data},
+                return_document=ReturnDocument.AFTER,
+                **max_time_command(),
+            )
+            # 只读视图校验，不经过 Beanie 文档的状态管理
+            return User.view(user).model_serialize() if user else None
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
         except Exception as e:
             logger.error(f"更新用户失败: {e}")
             raise
 
+    @staticmethod
+    async def update_user_if(
+            user_id: str,
+            conditions: Dict[str, Any],
+            user_data: Dict[str, Any],
+            projection: List[str] = None
+    ) -> Dict[str, Any] | None:
+        """
+        条件更新用户：只有在用户满足 conditions 时才写入，判断与写入是同一个原子操作
+        :param user_id: 用户ID
+        :param conditions: 附加的查询条件，例如 {"token_version": {"$lte": 3}}
+        :param user_data: 用户数据
+        :param projection: 需要返回的字段，例如 ["nickname", "role_id"]
+        :return: 更新后的字段，条件不满足或用户不存在时返回 None
+        """
+        try:
+            return await User.get_motor_collection().find_one_and_update(
+                {"user_id": user_id, "is_deleted": False, **conditions},
+                {"$set": user_data},
+                projection={"_id": 0, **{field: 1 for field in projection or []}},
+                return_document=ReturnDocument.AFTER,
+                **max_time_command(),
+            )
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"条件更新用户失败: {e}")
+            raise
+
+    @staticmethod
+    async def get_user_if(user_id: str, conditions: Dict[str, Any], fields: List[str]) -> Dict[str, Any] | None:
+        """
+        条件读取用户，用于不需要写入的校验（例如刷新 token 时校验版本号），读主节点
+        :param user_id: 用户ID
+        :param conditions: 附加的查询条件，例如 {"token_version": {"$lte": 3}}
+        :param fields: 需要返回的字段，例如 ["nickname", "role_id"]
+        :return: 用户字段，条件不满足或用户不存在时返回 None
+        """
+        try:
+            return await UserRepository._read_collection("get_user_if").find_one(
+                {"user_id": user_id, "is_deleted": False, **conditions},
+                projection={"_id": 0, **{field: 1 for field in fields}},
+                max_time_ms=max_time_ms(),
+            )
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"条件查询用户异常: {e}")
+            raise
+
+    @staticmethod
+    async def bulk_update_users(updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        批量更新多个用户，一次 bulk_write，用于延迟写入的元数据；
+        带 last_modify_time 的更新只在文档的修改时间更早时生效，避免延迟写入覆盖期间更新的数据
+        :param updates: 用户ID -> 需要 $set 的字段
+        :return: 匹配到的用户数，已删除、不存在或已有更新的修改的用户跳过
+        """
+        if not updates:
+            return 0
+        requests = []
+        for user_id, user_data in updates.items():
+            query = {"user_id": user_id, "is_deleted": False}
+            if "last_modify_time" in user_data:
+                query["last_modify_time"] = {"$lt": user_data["last_modify_time"]}
+            requests.append(UpdateOne(query, {"$set": user_data}))
+        try:
+            result = await User.get_motor_collection().bulk_write(requests, ordered=False)
+            return result.matched_count
+        except Exception as e:
+            logger.error(f"批量更新用户失败: {e}")
+            raise
+
+    @staticmethod
+    async def increment_token_version(user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        递增用户 token 版本号，使之前签发的 token 全部失效
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据，例如最后修改信息
+        :return: 递增后的版本号，用户不存在时返回 None
+        """
+        try:
+            update: Dict[str, Any] = {"$inc": {"token_version": 1}}
+            if user_data:
+                update["$set"] = user_data
+            user = await User.get_motor_collection().find_one_and_update(
+                {"user_id": user_id, "is_deleted": False},
+                update,
+                projection={"_id": 0, "token_version": 1},
+                return_document=ReturnDocument.AFTER,
+                **max_time_command(),
+            )
+            return user.get("token_version") if user else None
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"更新用户token版本号失败: {e}")
+            raise
+
+    @staticmethod
+    async def soft_delete_user(user_id: str, user_data: Dict[str, Any] = None) -> int | None:
+        """
+        逻辑删除用户，同时递增 token 版本号，使已签发的 token 可以一并吊销
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据，例如最后修改信息
+        :return: 递增后的 token 版本号，用户不存在或已删除时返回 None
+        """
+        try:
+            # 记录删除时间，归档任务按该时间判断是否移到 user_archive
+            changes = {**(user_data or {}), "is_deleted": True, "delete_date": datetime.now()}
+            before = await User.get_motor_collection().find_one_and_update(
+                {"user_id": user_id, "is_deleted": False},
+                {"$set": changes, "$inc": {"token_version": 1}},
+                projection=User.projection(include_sensitive=True),
+                return_document=ReturnDocument.BEFORE,
+                **max_time_command(),
+            )
+            if not before:
+                return None
+            user_count_cache.apply_change(before, {**before, **changes})
+            return before.get("token_version", 0) + 1
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"删除用户失败: {e}")
+            raise
+
+    @staticmethod
+    async def restore_user(user_id: str, user_data: Dict[str, Any] = None) -> Dict[str, Any] | None:
+        """
+        恢复已删除的用户，尚未归档的直接取消删除，已归档的从 user_archive 移回
+        :param user_id: 用户ID
+        :param user_data: 同时写入的用户数据，例如最后修改信息
+        :return: 恢复后的用户信息，用户不存在或未删除时返回 None
+        :raises DuplicateKeyError: 邮箱等唯一字段已被其它未删除用户占用
+        """
+        changes = {**(user_data or {}), "is_deleted": False, "delete_date": None}
+        try:
+            before = await User.get_motor_collection().find_one_and_update(
+                {"user_id": user_id, "is_deleted": True},
+                {"$set": changes},
+                projection=User.projection(include_sensitive=True),
+                sort=[("delete_date", -1)],
+                return_document=ReturnDocument.BEFORE,
+                **max_time_command(),
+            )
+            if before:
+                after = {**before, **changes}
+                user_count_cache.apply_change(before, after)
+            else:
+                after = await UserArchiveRepository.restore_user(user_id, changes)
+                if not after:
+                    return None
+                user_count_cache.apply_change(None, after)
+            projection = User.projection()
+            return User.serialize_raw({field: value for field, value in after.items() if projection.get(field)})
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"恢复用户失败: {e}")
+            raise
+
     @staticmethod
     async def user_pagination_list(
             page: int = 1,
             page_size: int = 10,
             sort_field: List[str] = None,
             sort_by: SortDirection = SortDirection.DESCENDING,
-            filters: Dict[str, Any] = None
+            filters: Dict[str, Any] = None,
+            with_total: bool = True
     ) -> Dict[str, Any]:
         """
-        获取用户分页列表
+        获取用户分页列表，总数与当前页并发查询
         :param page: 页码
         :param page_size: 每页数量
         :param sort_field: 排序字段，例如 create_date
         :param sort_by: 排序方式 DESCENDING: 降序, ASCENDING: 升序，默认: SortDirection.DESCENDING
         :param filters: 过滤条件，例如 {"is_active": True}
+        :param with_total: 是否返回总数
         :return: 分页结果
         """
         try:
@@ -116,23 +394,115 @@ class UserRepository:
             query_filters = {"is_deleted": False}
             if filters:
                 query_filters.update(filters)
-            # 创建查询
-            query = User.find(query_filters)
-            # 应用排序
+            collection = UserRepository._read_collection("user_pagination_list")
+            # 应用排序，默认按 (create_date, _id) 排序，与游标分页一致
             if sort_field:
-                for field in sort_field:
-                    query = query.sort((field, sort_by))
+                sort = [(field, sort_by.value) for field in sort_field]
             else:
-                # 默认按创建时间降序
-                query = query.sort([("create_date", sort_by)])
-            # 计算总数
-            total = await query.count()
-            # 应用分页
+                sort = [("create_date", sort_by.value), ("_id", sort_by.value)]
+            # 应用分页，总数走计数缓存，与当前页并发查询
             skip = (page - 1) * page_size
-            users = await query.skip(skip).limit(page_size).to_list()
+            time_limit = max_time_ms()
+            cursor = collection.find(query_filters, projection=User.projection(), sort=sort, skip=skip,
+                                     limit=page_size, max_time_ms=time_limit)
+            total, total_estimated = None, None
+            if with_total:
+                (total, total_estimated), users = await asyncio.gather(
+                    user_count_cache.count(collection, query_filters, time_limit),
+                    cursor.to_list(length=page_size),
+                )
+            else:
+                users = await cursor.to_list(length=page_size)
+            # 默认排序下返回下一页游标，客户端可以从任意一页切换到游标分页
+            next_cursor = None
+            if not sort_field and len(users) == page_size:
+                next_cursor = encode_cursor(users[-1]["create_date"], users[-1]["_id"], sort_by.value)
             # 序列化结果
-            user_list = [user.model_serialize() for user in users]
-            return PaginationResult(list=user_list, total=total, page=page, page_size=page_size).model_dump()
+            user_list = User.serialize_many(users)
+            return PaginationResult(list=user_list, total=total, total_estimated=total_estimated, page=page,
+                                    page_size=page_size, next_cursor=next_cursor).model_dump()
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
         except Exception as e:
             logger.error(f"获取用户分页列表失败: {e}")
             raise
+
+    @staticmethod
+    async def user_cursor_list(
+            page_size: int = 10,
+            sort_by: SortDirection = SortDirection.DESCENDING,
+            after: Tuple[datetime, ObjectId] | None = None,
+            filters: Dict[str, Any] = None
+    ) -> Dict[str, Any]:
+        """
+        获取用户游标分页列表，按 (create_date, _id) 排序，通过范围查询定位下一页，不使用 skip
+        :param page_size: 每页数量
+        :param sort_by: 排序方式 DESCENDING: 降序, ASCENDING: 升序，默认: SortDirection.DESCENDING
+        :param after: 上一页最后一条记录的 (create_date, _id)，为空时从第一条开始
+        :param filters: 过滤条件，例如 {"is_active": True}
+        :return: 分页结果
+        """
+        try:
+            direction = sort_by.value
+            query_filters: Dict[str, Any] = {"is_deleted": False}
+            if filters:
+                query_filters.update(filters)
+            if after is not None:
+                create_date, object_id = after
+                op = "$gt" if direction == SortDirection.ASCENDING.value else "$lt"
+                query_filters["$or"] = [
+                    {"create_date": {op: create_date}},
+                    {"create_date": create_date, "_id": {op: object_id}},
+                ]
+            # 多取一条判断是否还有下一页
+            cursor = UserRepository._read_collection("user_cursor_list").find(
+                query_filters, projection=User.projection(),
+                sort=[("create_date", direction), ("_id", direction)], limit=page_size + 1,
+                max_time_ms=max_time_ms(),
+            )
+            users = await cursor.to_list(length=page_size + 1)
+            next_cursor = None
+            if len(users) > page_size:
+                users = users[:page_size]
+                next_cursor = encode_cursor(users[-1]["create_date"], users[-1]["_id"], direction)
+            user_list = User.serialize_many(users)
+            return CursorPaginationResult(list=user_list, page_size=page_size, next_cursor=next_cursor).model_dump()
+        except ExecutionTimeout as e:
+            raise deadline_exceeded() from e
+        except Exception as e:
+            logger.error(f"获取用户游标分页列表失败: {e}")
+            raise
+
+    @staticmethod
+    async def iter_users(
+            sort_by: SortDirection = SortDirection.DESCENDING,
+            filters: Dict[str, Any] = None,
+            batch_size: int = 500
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        按批遍历用户，从 motor 游标逐批读取，内存中最多保留一批
+        :param sort_by: 排序方式，按 (create_date, _id) 排序
+        :param filters: 过滤条件，与 user_pagination_list 相同，例如 {"is_active": True}
+        :param batch_size: 每批文档数，同时作为游标的 batch_size
+        :return: 异步迭代器，每次产出一批序列化后的用户
+        """
+        query_filters = {"is_deleted": False}
+        if filters:
+            query_filters.update(filters)
+        cursor = UserRepository._read_collection("iter_users").find(
+            query_filters, projection=User.projection(),
+            sort=[("create_date", sort_by.value), ("_id", sort_by.value)], batch_size=batch_size,
+            max_time_ms=max_time_ms(),
+        )
+        try:
+            batch: List[Dict[str, Any]] = []
+            async for user in cursor:
+                batch.append(user)
+                if len(batch) >= batch_size:
+                    yield User.serialize_many(batch)
+                    batch = []
+            if batch:
+                yield User.serialize_many(batch)
+        finally:
+            # 客户端断开时生成器被关闭，及时释放服务端游标
+            await cursor.close()
@@ -7,7 +7,7 @@
 @Date    ：2025-04-14 15:46:07
 """
 from pydantic import BaseModel
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 
 
@@ -15,6 +15,20 @@ class PaginationResult(BaseModel):
     """ 分页查询结果类型 """
 
     list: List[Dict[str, Any]]
-    total: int
+    # 总数，with_total=False 时为空
+    total: Optional[int] = None
+    # 总数是否为估算值：集合级估算值，或达到计数上限时的下限值
+    total_estimated: Optional[bool] = None
     page: int
-    page_size: int
\ No newline at end of file
+    page_size: int
+    # 下一页游标，传入后切换为游标分页
+    next_cursor: Optional[str] = None
+
+
+class CursorPaginationResult(BaseModel):
+    """ 游标分页查询结果类型 """
+
+    list: List[Dict[str, Any]]
+    page_size: int
+    # 下一页游标，没有更多数据时为空
+    next_cursor: Optional[str] = None
@@ -175,3 +175,26 @@ class RefreshToken(BaseModel):
                 "refresh_token": "refresh_token"
             }
         }
+
+
+class RevokeRole(BaseModel):
+    """ 按角色吊销token """
+    role_id: str
+
+    @field_validator('role_id')
+    def check_role_id(cls, v: str):
+        """
+        验证角色ID
+        :param v: 角色ID
+        :return: 通过验证的合法角色ID
+        """
+        if not v:
+            raise ValidationException(code=status.HTTP_400_BAD_REQUEST, message='角色ID不能为空')
+        return v
+
+    class Config:
+        json_schema_extra = {
+            'example': {
+                "role_id": "user"
+            }
+        }
@@ -6,10 +6,16 @@
 @Author  ：晴天
 @Date    ：2025-04-10 10:35:14
 """
+import orjson
+import msgpack
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Mapping
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from starlette.background import BackgroundTask
 from app.enums.status_code import StatusCode
+from app.core.content_negotiation import MSGPACK, RESPONSE_MEDIA_TYPES, current_response_format
 
 
 class Response(BaseModel):
@@ -26,7 +32,7 @@ class Response(BaseModel):
     message: str = Field(default=StatusCode.SUCCESS.get_message(), description="状态描述信息")
     data: Optional[Dict[str, Any]] = Field(default=None, description="业务数据")
     errors: Optional[Dict[str, Any]] = Field(default=None, description="业务数据")
-    timestamp: datetime = Field(default=datetime.now(), description="响应生成时间")
+    timestamp: datetime = Field(default_factory=datetime.now, description="响应生成时间")
 
     class Config:
         json_schema_extra = {
@@ -38,3 +44,68 @@ class Response(BaseModel):
                 "timestamp": "2023-10-01T12:34:56.789Z"
             }
         }
+
+
+# 接口文档中声明可按 Accept 返回 MessagePack，结构与 Response 相同
+MSGPACK_RESPONSES: Dict[int | str, Dict[str, Any]] = {200: {"content": {"application/msgpack": {}}}}
+
+
+def _orjson_default(value: Any) -> Any:
+    """ orjson 不支持的类型（pydantic 模型、ObjectId 等）交给 jsonable_encoder """
+    return jsonable_encoder(value)
+
+
+def _msgpack_default(value: Any) -> Any:
+    """ datetime 与 JSON 响应一致输出为 ISO 字符串，其它 msgpack 不支持的类型交给 jsonable_encoder """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+
+class ApiResponse(ORJSONResponse):
+    """
+    通用响应，与 Response 模型的结构相同，值为 None 的字段省略（等同 response_model_exclude_none=True）。
+
+    路由返回 ApiResponse 时 FastAPI 直接发送，不再按 response_model 校验和 jsonable_encoder 转换，
+    信封用 orjson 一次序列化；response_model=Response 只用于生成接口文档。
+    data 为服务层返回的可信数据，datetime 由 orjson 输出为 ISO 格式，其它 orjson 不支持的类型回退到 jsonable_encoder。
+    请求协商为 MessagePack 时（Accept: application/msgpack）同一信封以 MessagePack 编码，datetime 同样为 ISO 字符串。
+    """
+
+    def __init__(self, data: Any = None, code: int = StatusCode.SUCCESS.get_code(),
+                 message: str = StatusCode.SUCCESS.get_message(), errors: Optional[Dict[str, Any]] = None,
+                 status_code: int = 200, headers: Optional[Mapping[str, str]] = None,
+                 background: Optional[BackgroundTask] = None, response_format: Optional[str] = None):
+        """
+        初始化
+        :param data: 业务数据
+        :param code: 业务状态码
+        :param message: 状态描述信息
+        :param errors: 错误详情
+        :param status_code: HTTP 状态码
+        :param headers: 响应头
+        :param background: 响应发送后执行的后台任务
+        :param response_format: 响应格式，默认取当前请求协商的格式
+        """
+        content: Dict[str, Any] = {"code": code, "message": message}
+        if data is not None:
+            content["data"] = data
+        if errors is not None:
+            content["errors"] = errors
+        # 每个响应单独计算生成时间
+        content["timestamp"] = datetime.now()
+        self.response_format = response_format or current_response_format()
+        # 同一路径按 Accept 返回不同格式，缓存需要区分
+        headers = {**headers, "vary": "Accept"} if headers else {"vary": "Accept"}
+        super().__init__(content, status_code=status_code, headers=headers,
+                         media_type=RESPONSE_MEDIA_TYPES[self.response_format], background=background)
+
+    def render(self, content: Any) -> bytes:
+        """
+        序列化响应体
+        :param content: 响应内容
+        :return: JSON 或 MessagePack 字节串
+        """
+        if self.response_format == MSGPACK:
+            return msgpack.packb(content, default=_msgpack_default)
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
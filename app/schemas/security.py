@@ -6,6 +6,7 @@
 @Author  ：晴天
 @Date    ：2025-04-10 16:24:46
 """
+from typing import Optional
 from pydantic import BaseModel, Field
 
 
@@ -27,3 +28,9 @@ class DecodeTokenData(BaseModel):
     user_id: str = Field(..., description="用户id")
     nickname: str = Field(..., description="用户昵称")
     type: str = Field(..., description="token类型")
+    role_id: Optional[str] = Field(default=None, description="用户角色ID")
+    ver: int = Field(default=0, description="token版本号，低于用户当前吊销版本号时失效")
+    sid: Optional[str] = Field(default=None, description="会话ID，同一次登录签发的 token 共用")
+    jti: Optional[str] = Field(default=None, description="token唯一标识")
+    iat: Optional[int] = Field(default=None, description="签发时间戳（秒）")
+    exp: Optional[int] = Field(default=None, description="过期时间戳（秒）")
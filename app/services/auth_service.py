@@ -7,46 +7,39 @@
 @Date    ：2025-04-04 17:46:42
 """
 from app.core.logger import logger
-from typing import Dict, Any, Callable
+from app.core.config import config
+from app.core.metrics import metrics
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Any
 from app.utils.date_util import date_util
 from app.core.security import jwt_manager
+from app.core.revocation import revocation_index
+from app.core.principal_cache import principal_cache
+from app.core.write_behind import user_write_behind
 from app.enums.status_code import StatusCode
 from app.schemas.security import DecodeTokenData
 from app.exceptions.custom import BusinessException
-from app.repositories.user_repo import UserRepository
-from app.utils.encrypt_util import encrypt_password, verify_password
+from app.repositories.backend import UserRepositoryProtocol
+from app.utils.encrypt_util import async_verify_password
+from app.core.password_policy import password_policy
+from app.utils.single_flight import SingleFlight
 from app.utils.user_id_util import generate_user_id, generate_display_id
 from app.schemas.request.auth import RegisterUser, LoginUser, RefreshToken
 
+# 同一刷新 token 的并发刷新请求合并为一次
+refresh_token_flight = SingleFlight("refresh_token", max_keys=config.SINGLE_FLIGHT_MAX_KEYS)
+metrics.register_collector("single_flight.refresh_token", refresh_token_flight.stats)
+
+# 注册时用户ID或展示ID与已有用户冲突（例如旧格式的随机ID）时重新生成的次数
+REGISTER_ID_ATTEMPTS = 3
+
 
 class AuthService:
     """ 用户服务 """
 
-    def __init__(self, repo: UserRepository):
+    def __init__(self, repo: UserRepositoryProtocol):
         self._repo = repo
 
-    @staticmethod
-    async def _generate_unique_id(generate_func: Callable[[], str], check_func: Callable[[str], Any],
-                                  id_name: str, max_attempts: int = 5) -> str:
-        """
-        生成唯一的 ID
-        :param generate_func: 生成 ID 的函数
-        :param check_func: 检查 ID 是否存在的函数
-        :param id_name: ID 的名称（用于日志和错误信息）
-        :param max_attempts: 最大重试次数
-        :return: 唯一的 ID
-        """
-        for _ in range(max_attempts):
-            new_id = generate_func()
-            if not await check_func(new_id):
-                return new_id
-            logger.info(f'{id_name}:{new_id} 已存在，重新生成')
-        logger.error(f'无法生成唯一的 {id_name}')
-        raise BusinessException(
-            code=StatusCode.SYSTEM_ERROR.get_code(),
-            message=StatusCode.SYSTEM_ERROR.get_message()
-        )
-
     async def register(self, user_data: RegisterUser, request_info: dict = None) -> Dict[str, Any]:
         """
         注册用户
@@ -54,37 +47,33 @@ class AuthService:
          :param request_info: 请求信息
         :return: 用户信息
         """
+        user_data.password = await password_policy.hash_password(user_data.password)
         try:
-            email_is_exist = await self._repo.get_user_by_email(user_data.email)
-        except Exception as e:
-            logger.error(f"根据邮箱获取用户异常: {e}")
-            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
-                                    message=StatusCode.SYSTEM_ERROR.get_message())
-        if email_is_exist:
-            logger.error(f'该邮箱已注册: {user_data.email}')
-            raise BusinessException(code=StatusCode.EMAIL_ALREADY_REGISTERED.get_code(),
-                                    message=StatusCode.EMAIL_ALREADY_REGISTERED.get_message())
-        user_data.password = encrypt_password(user_data.password)
-        user_id = await self._generate_unique_id(
-            generate_func=generate_user_id,
-            check_func=self._repo.get_user_by_id,
-            id_name='user_id',
-        )
-        display_id = await self._generate_unique_id(
-            generate_func=generate_display_id,
-            check_func=self._repo.get_user_by_id,
-            id_name='display_id',
-        )
-        user_info = {
-            **user_data.model_dump(),
-            "user_id": user_id,
-            "display_id": display_id,
-            "create_ip": request_info.get("client_ip", None),
-            'create_by': user_id,
-        }
-        try:
-            user = await self._repo.create(user_info)
-            return user
+            for attempt in range(1, REGISTER_ID_ATTEMPTS + 1):
+                # 用户ID由本进程的 Snowflake 生成器分配，展示ID来自数据库预留的号段，发号时无需查库检查冲突
+                user_id = generate_user_id()
+                user_info = {
+                    **user_data.model_dump(),
+                    "user_id": user_id,
+                    "display_id": await generate_display_id(),
+                    "create_ip": request_info.get("client_ip", None),
+                    'create_by': user_id,
+                }
+                try:
+                    # 直接插入，邮箱重复由唯一索引拒绝，并发注册同一邮箱时只有一个成功
+                    return await self._repo.create(user_info)
+                except DuplicateKeyError as e:
+                    if "email" in (e.details or {}).get("keyPattern", {}):
+                        logger.error(f'该邮箱已注册: {user_data.email}')
+                        raise BusinessException(code=StatusCode.EMAIL_ALREADY_REGISTERED.get_code(),
+                                                message=StatusCode.EMAIL_ALREADY_REGISTERED.get_message())
+                    # ID 与已有用户冲突，重新生成后再插入
+                    metrics.inc("register.id_conflict")
+                    logger.warning(f"注册用户ID冲突，第 {attempt} 次: {e}")
+            raise BusinessException(code=StatusCode.USER_ALREADY_EXIST.get_code(),
+                                    message=StatusCode.USER_ALREADY_EXIST.get_message())
+        except BusinessException:
+            raise
         except Exception as e:
             logger.error(f"注册用户异常: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
@@ -97,7 +86,9 @@ class AuthService:
         :return: 用户信息
         """
         try:
-            user = await self._repo.get_user_by_email(user_data.email, True)
+            user = await self._repo.get_user_by_email(
+                user_data.email, fields=['user_id', 'password', 'nickname', 'role_id', 'token_version']
+            )
         except Exception as e:
             logger.error(f"根据邮箱获取用户异常: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
@@ -107,18 +98,43 @@ class AuthService:
             raise BusinessException(code=StatusCode.EMAIL_NOT_REGISTERED.get_code(),
                                     message=StatusCode.EMAIL_NOT_REGISTERED.get_message())
 
-        password_verify = verify_password(user_data.password, user.get('password', None))
+        password_verify = await async_verify_password(user_data.password, user.get('password', None))
         if not password_verify:
             logger.error(f'账号密码错误: {user_data.email}')
             raise BusinessException(code=StatusCode.USERNAME_OR_PASSWORD_ERROR.get_code(),
                                     message=StatusCode.USERNAME_OR_PASSWORD_ERROR.get_message())
+        update_data = {
+            'last_modify_by': user.get('user_id'), 'last_modify_time': date_util.get_now_timestamp(),
+            'last_modify_date': date_util.now()
+        }
+        # 已存储的密文低于当前哈希策略时，借助本次登录的明文透明升级
+        if password_policy.needs_rehash(user.get('password')):
+            try:
+                update_data['password'] = await password_policy.hash_password(user_data.password)
+            except Exception as e:
+                logger.warning(f"密码重新哈希失败，跳过: {e}")
+        updated = user
+        if 'password' in update_data:
+            try:
+                # 以校验时的密文为条件写入，期间密码被修改或用户被删除时不生效，同时取回最新的 token 版本号
+                updated = await self._repo.update_user_if(
+                    user.get('user_id'), {'password': user.get('password')}, update_data,
+                    projection=['nickname', 'role_id', 'token_version']
+                )
+            except Exception as e:
+                logger.error(f"登录用户异常: {e}")
+                raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                        message=StatusCode.SYSTEM_ERROR.get_message())
+            if not updated:
+                logger.error(f'登录期间用户密码已变更: {user_data.email}')
+                raise BusinessException(code=StatusCode.USERNAME_OR_PASSWORD_ERROR.get_code(),
+                                        message=StatusCode.USERNAME_OR_PASSWORD_ERROR.get_message())
+        else:
+            # 最后修改信息延迟批量写入，不占用登录请求的数据库往返
+            await user_write_behind.write(user.get('user_id'), update_data)
         try:
-            payload = {'user_id': user.get('user_id'), 'nickname': user.get('nickname')}
-            token = jwt_manager.create_token(payload)
-            await self._repo.update_user_by_id(user.get('user_id'), {
-                'last_modify_by': user.get('user_id'), 'last_modify_time': date_util.get_now_timestamp(),
-                'last_modify_date': date_util.now(), 'access_token': token.access_token, 'refresh_token': token.refresh_token
-            })
+            payload = {'user_id': user.get('user_id'), 'nickname': updated.get('nickname'), 'role_id': updated.get('role_id')}
+            token = jwt_manager.create_token(payload, token_version=updated.get('token_version', 0))
             return token.model_dump()
         except Exception as e:
             logger.error(f"登录用户异常: {e}")
@@ -127,50 +143,118 @@ class AuthService:
 
     async def logout(self, current_user: DecodeTokenData) -> bool:
         """
-        退出登录
+        退出登录（当前设备），吊销当前会话
         :param current_user: 当前用户
         :return: 用户信息
         """
         try:
-            await self._repo.update_user_by_id(current_user.user_id, {
+            await revocation_index.revoke_session(current_user)
+            await user_write_behind.write(current_user.user_id, {
                 'last_modify_by': current_user.user_id, 'last_modify_time': date_util.get_now_timestamp(),
-                'last_modify_date': date_util.now(), 'access_token': None, 'refresh_token': None
+                'last_modify_date': date_util.now()
             })
+            principal_cache.invalidate_user(current_user.user_id)
             return True
         except Exception as e:
             logger.error(f"退出登录异常: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
                                     message=StatusCode.SYSTEM_ERROR.get_message())
 
+    async def logout_all(self, current_user: DecodeTokenData) -> bool:
+        """
+        退出所有设备，递增用户 token 版本号
+        :param current_user: 当前用户
+        :return: 是否成功
+        """
+        try:
+            token_version = await self._repo.increment_token_version(current_user.user_id, {
+                'last_modify_by': current_user.user_id, 'last_modify_time': date_util.get_now_timestamp(),
+                'last_modify_date': date_util.now()
+            })
+        except Exception as e:
+            logger.error(f"更新用户token版本号异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        if token_version is None:
+            raise BusinessException(code=StatusCode.USER_NOT_EXIST.get_code(),
+                                    message=StatusCode.USER_NOT_EXIST.get_message())
+        try:
+            await revocation_index.revoke_user(current_user.user_id, token_version)
+            principal_cache.invalidate_user(current_user.user_id)
+            return True
+        except Exception as e:
+            logger.error(f"退出所有设备异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+
+    @staticmethod
+    async def revoke_role(role_id: str) -> bool:
+        """
+        按角色批量吊销已签发的 token
+        :param role_id: 角色ID
+        :return: 是否成功
+        """
+        try:
+            await revocation_index.revoke_role(role_id)
+            return True
+        except Exception as e:
+            logger.error(f"按角色吊销token异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+
     async def refresh_token(self, token: RefreshToken) -> Dict[str, Any]:
         """
-        刷新token
+        刷新token，客户端并发提交同一个刷新 token 时只执行一次，所有请求得到同一组新 token
         :param token: 当前用户
         :return: 返回新的Token
         """
-        refresh_token = jwt_manager.decode_token(token.refresh_token)
-        if refresh_token.type != 'refresh':
+        key = ("refresh", principal_cache.token_digest(token.refresh_token))
+        return await refresh_token_flight.do(key, lambda: self._refresh_token(token.refresh_token))
+
+    async def _refresh_token(self, token: str) -> Dict[str, Any]:
+        """
+        刷新token
+        :param token: 刷新 token
+        :return: 返回新的Token
+        """
+        refresh_token = jwt_manager.decode_token(token)
+        if refresh_token.type != 'refresh' or revocation_index.is_revoked(refresh_token):
             raise BusinessException(code=StatusCode.TOKEN_INVALID.get_code(),
                                     message=StatusCode.TOKEN_INVALID.get_message())
 
         try:
-            user = await self._repo.get_user_by_id(refresh_token.user_id, True)
+            # 校验用户存在且 token 版本号未失效，读主节点
+            user = await self._repo.get_user_if(
+                refresh_token.user_id, {'token_version': {'$lte': refresh_token.ver}},
+                fields=['nickname', 'role_id', 'token_version']
+            )
         except Exception as e:
-            logger.error(f"根据用户ID获取用户: {e}")
+            logger.error(f"更新用户异常: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
                                     message=StatusCode.SYSTEM_ERROR.get_message())
-        if not user or token.refresh_token != user.get('refresh_token'):
+        if not user:
             raise BusinessException(code=StatusCode.TOKEN_INVALID.get_code(),
                                     message=StatusCode.TOKEN_INVALID.get_message())
 
         try:
-            payload = {'user_id': refresh_token.user_id, 'nickname': refresh_token.nickname}
-            new_token = jwt_manager.create_token(payload)
-            await self._repo.update_user_by_id(refresh_token.user_id, {
-                'last_modify_by': refresh_token.user_id, 'last_modify_time': date_util.get_now_timestamp(),
-                'last_modify_date': date_util.now(), 'access_token': new_token.access_token,
-                'refresh_token': new_token.refresh_token
-            })
+            # 结束原会话，刷新 token 只能使用一次，并发刷新时只有一个成功
+            retired = await revocation_index.retire_session(refresh_token)
+        except Exception as e:
+            logger.error(f"结束会话异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        if not retired:
+            raise BusinessException(code=StatusCode.TOKEN_INVALID.get_code(),
+                                    message=StatusCode.TOKEN_INVALID.get_message())
+        await user_write_behind.write(refresh_token.user_id, {
+            'last_modify_by': refresh_token.user_id, 'last_modify_time': date_util.get_now_timestamp(),
+            'last_modify_date': date_util.now()
+        })
+
+        try:
+            payload = {'user_id': refresh_token.user_id, 'nickname': user.get('nickname'), 'role_id': user.get('role_id')}
+            new_token = jwt_manager.create_token(payload, token_version=user.get('token_version', 0))
+            principal_cache.invalidate_user(refresh_token.user_id)
             return new_token.model_dump()
         except Exception as e:
             logger.error(f"刷新token异常: {e}")
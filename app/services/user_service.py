@@ -6,19 +6,74 @@
 @Author  ：晴天
 @Date    ：2025-04-14 14:49:09
 """
-from typing import Any, Dict
+import io
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
 from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from app.core.revocation import revocation_index
+from app.core.principal_cache import principal_cache
+from pymongo.errors import DuplicateKeyError
+from app.utils.date_util import date_util
+from app.models.user_model import User
 from beanie.odm.enums import SortDirection
 from app.enums.status_code import StatusCode
 from app.exceptions.custom import BusinessException
-from app.repositories.user_repo import UserRepository
+from app.utils.cursor_util import decode_cursor
+from app.utils.data_loader import DataLoader
+from app.utils.single_flight import SingleFlight
+from app.repositories.backend import UserRepositoryProtocol
+
+# 同一用户的并发查询合并为一次
+user_info_flight = SingleFlight("user_info", max_keys=config.SINGLE_FLIGHT_MAX_KEYS)
+metrics.register_collector("single_flight.user_info", user_info_flight.stats)
+
+# 表格软件会把以这些字符开头的单元格当作公式执行（CSV 注入）
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_safe_row(user: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    转义 CSV 行中可能被当作公式的字符串，前面加单引号按文本显示
+    :param user: 用户文档
+    :return: 转义后的用户文档
+    """
+    return {key: "'" + value if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES) else value
+            for key, value in user.items()}
 
 
 class UserService:
     """ 用户服务 """
 
-    def __init__(self, repo: UserRepository):
+    def __init__(self, repo: UserRepositoryProtocol, user_loader: Optional[DataLoader[str, Dict[str, Any]]] = None):
         self._user_repo = repo
+        self._user_loader = user_loader
+
+    async def _get_user_by_id(self, user_id: str) -> Dict[str, Any] | None:
+        """ 有请求级加载器时合并到同一次批量查询 """
+        if self._user_loader is not None:
+            return await self._user_loader.load(user_id)
+        return await self._user_repo.get_user_by_id(user_id)
+
+    async def get_users_info(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量获取用户信息，一次查询
+        :param user_ids: 用户id列表
+        :return: 用户信息列表，按 user_ids 顺序，不存在的用户跳过
+        """
+        try:
+            if self._user_loader is not None:
+                users = await self._user_loader.load_many(user_ids)
+            else:
+                found = await self._user_repo.get_users_by_ids(user_ids)
+                users = [found.get(user_id) for user_id in user_ids]
+        except Exception as e:
+            logger.error(f"批量获取用户信息失败: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        return [user for user in users if user is not None]
 
     async def get_user_info(self, user_id: str) -> Dict[str, Any]:
         """
@@ -27,7 +82,7 @@ class UserService:
         :return: 用户信息
         """
         try:
-            user = await self._user_repo.get_user_by_id(user_id)
+            user = await user_info_flight.do(("user_info", user_id), lambda: self._get_user_by_id(user_id))
         except Exception as e:
             logger.error(f"获取用户信息失败: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
@@ -38,23 +93,149 @@ class UserService:
                                     message=StatusCode.USER_NOT_EXIST.get_message())
         return user
 
-    async def get_user_pagination_list(self, page: int = 1, page_size: int = 10, sort_by: int = 0) -> Dict[str, Any]:
+    async def get_user_pagination_list(self, page: int = 1, page_size: int = 10, sort_by: int = 0,
+                                       cursor: Optional[str] = None, with_total: bool = True) -> Dict[str, Any]:
         """
-        获取用户分页列表
+        获取用户分页列表，传入 cursor 时使用游标分页并忽略 page，否则使用页码分页
         :param page: 页码
         :param page_size: 每页数量
         :param sort_by: 排序方式
+        :param cursor: 上一页返回的 next_cursor
+        :param with_total: 页码分页时是否返回总数
         :return: 用户分页列表
         """
+        if cursor:
+            try:
+                create_date, object_id, direction = decode_cursor(cursor)
+            except ValueError as e:
+                logger.warning(f"分页游标无效: {e}")
+                raise BusinessException(code=StatusCode.CURSOR_INVALID.get_code(),
+                                        message=StatusCode.CURSOR_INVALID.get_message())
+            try:
+                # 排序方向以游标为准，保证翻页过程中顺序不变
+                return await self._user_repo.user_cursor_list(
+                    page_size=page_size,
+                    sort_by=SortDirection(direction),
+                    after=(create_date, object_id)
+                )
+            except Exception as e:
+                logger.error(f"获取用户游标分页列表失败: {e}")
+                raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                        message=StatusCode.SYSTEM_ERROR.get_message())
+
+        if (page - 1) * page_size > config.PAGINATION_MAX_SKIP:
+            logger.warning(f"分页过深: page={page}, page_size={page_size}")
+            raise BusinessException(code=StatusCode.PAGE_DEPTH_EXCEEDED.get_code(),
+                                    message=StatusCode.PAGE_DEPTH_EXCEEDED.get_message())
         sort_by = SortDirection.DESCENDING if sort_by < 1 else SortDirection.ASCENDING
         try:
             users = await self._user_repo.user_pagination_list(
                 page=page,
                 page_size=page_size,
-                sort_by=sort_by
+                sort_by=sort_by,
+                with_total=with_total
             )
             return users
         except Exception as e:
             logger.error(f"获取用户分页列表失败: {e}")
             raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
                                     message=StatusCode.SYSTEM_ERROR.get_message())
+
+    async def export_users(self, export_format: str = "ndjson", sort_by: int = 0, filters: Dict[str, Any] = None,
+                           batch_size: int = config.EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+        """
+        导出用户，逐批序列化为 NDJSON 或 CSV，每批产出一个数据块
+        :param export_format: 导出格式 ndjson / csv
+        :param sort_by: 排序方式 0: 降序, 1: 升序
+        :param filters: 过滤条件，与 get_user_pagination_list 相同
+        :param batch_size: 每批文档数
+        :return: 异步迭代器，产出编码后的数据块
+        """
+        sort_by = SortDirection.DESCENDING if sort_by < 1 else SortDirection.ASCENDING
+        columns = ["id" if field == "_id" else field for field in User.projection()]
+        exported = 0
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            # UTF-8 BOM，便于表格软件识别中文
+            yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+        try:
+            async for batch in self._user_repo.iter_users(sort_by=sort_by, filters=filters, batch_size=batch_size):
+                if export_format == "csv":
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(_csv_safe_row(user) for user in batch)
+                    chunk = buffer.getvalue()
+                else:
+                    chunk = "".join(json.dumps(user, ensure_ascii=False) + "\n" for user in batch)
+                exported += len(batch)
+                yield chunk.encode("utf-8")
+        except Exception as e:
+            # 响应头已发送，无法再返回错误码，记录日志并中断输出
+            logger.error(f"导出用户失败，已导出 {exported} 条: {e}")
+            raise
+        metrics.inc("user_export.rows", exported)
+        logger.info(f"导出用户完成，格式: {export_format}，数量: {exported}")
+
+    async def delete_user(self, user_id: str, operator_id: str) -> bool:
+        """
+        逻辑删除用户并吊销其已签发的 token，删除的用户超过保留期后由归档任务移到 user_archive
+        :param user_id: 用户id
+        :param operator_id: 操作人用户id
+        :return: 是否删除成功
+        """
+        try:
+            token_version = await self._user_repo.soft_delete_user(user_id, {
+                'last_modify_by': operator_id, 'last_modify_time': date_util.get_now_timestamp(),
+                'last_modify_date': date_util.now()
+            })
+        except Exception as e:
+            logger.error(f"删除用户异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        if token_version is None:
+            logger.error(f"待删除的用户不存在: {user_id}")
+            raise BusinessException(code=StatusCode.USER_NOT_EXIST.get_code(),
+                                    message=StatusCode.USER_NOT_EXIST.get_message())
+        try:
+            await revocation_index.revoke_user(user_id, token_version)
+            principal_cache.invalidate_user(user_id)
+        except Exception as e:
+            logger.error(f"吊销已删除用户的token异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        logger.info(f"删除用户成功: {user_id}，操作人: {operator_id}")
+        return True
+
+    async def restore_user(self, user_id: str, operator_id: str) -> Dict[str, Any]:
+        """
+        恢复已删除的用户，已归档的用户从 user_archive 移回
+        :param user_id: 用户id
+        :param operator_id: 操作人用户id
+        :return: 恢复后的用户信息
+        """
+        try:
+            user = await self._user_repo.restore_user(user_id, {
+                'last_modify_by': operator_id, 'last_modify_time': date_util.get_now_timestamp(),
+                'last_modify_date': date_util.now()
+            })
+        except DuplicateKeyError as e:
+            # 删除期间邮箱等唯一字段已被新注册的用户占用
+            if "email" in (e.details or {}).get("keyPattern", {}):
+                logger.error(f"恢复用户失败，邮箱已被占用: {user_id}")
+                raise BusinessException(code=StatusCode.EMAIL_ALREADY_REGISTERED.get_code(),
+                                        message=StatusCode.EMAIL_ALREADY_REGISTERED.get_message())
+            logger.error(f"恢复用户失败，用户ID冲突: {e}")
+            raise BusinessException(code=StatusCode.USER_ALREADY_EXIST.get_code(),
+                                    message=StatusCode.USER_ALREADY_EXIST.get_message())
+        except Exception as e:
+            logger.error(f"恢复用户异常: {e}")
+            raise BusinessException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                    message=StatusCode.SYSTEM_ERROR.get_message())
+        if not user:
+            logger.error(f"待恢复的用户不存在: {user_id}")
+            raise BusinessException(code=StatusCode.USER_NOT_EXIST.get_code(),
+                                    message=StatusCode.USER_NOT_EXIST.get_message())
+        logger.info(f"恢复用户成功: {user_id}，操作人: {operator_id}")
+        return user
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：cache_util.py
+@Author  ：晴天
+@Date    ：2025-04-16 10:36:20
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    带过期时间的 LRU 缓存
+
+    每个条目单独设置过期时间，容量超出时淘汰最久未使用的条目。
+    仅在单个事件循环内使用，不做线程同步。
+    """
+
+    def __init__(self, max_size: int, default_ttl: float,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        """
+        初始化
+        :param max_size: 最大条目数
+        :param default_ttl: 默认过期时间（秒）
+        :param on_evict: 条目被淘汰、过期或删除时的回调，参数为 (key, value)
+        """
+        self._max_size = max_size
+        self._default_ttl = default_ttl
+        self._on_evict = on_evict
+        self._data: OrderedDict[Hashable, Tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[1] > time.monotonic()
+
+    def _remove(self, key: Hashable) -> None:
+        """ 移除条目并触发回调 """
+        value, _ = self._data.pop(key)
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        获取缓存
+        :param key: 键
+        :param default: 未命中时的返回值
+        :return: 缓存值
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        if item[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存
+        :param key: 键
+        :param value: 值
+        :param ttl: 过期时间（秒），为空时使用默认值
+        :return: None
+        """
+        ttl = self._default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, time.monotonic() + ttl)
+        while len(self._data) > self._max_size:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        删除缓存
+        :param key: 键
+        :return: 是否存在并删除
+        """
+        if key not in self._data:
+            return False
+        self._remove(key)
+        return True
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """
+        获取未过期的条目快照，不影响 LRU 顺序和命中统计
+        :return: [(key, value)]
+        """
+        now = time.monotonic()
+        return [(key, value) for key, (value, expire_at) in self._data.items() if expire_at > now]
+
+    def clear(self) -> None:
+        """ 清空缓存 """
+        for key in list(self._data.keys()):
+            self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        :return: 统计信息
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：cursor_util.py
+@Author  ：晴天
+@Date    ：2025-04-21 09:36:42
+"""
+import json
+import base64
+from bson import ObjectId
+from datetime import datetime
+from typing import Tuple
+
+
+def encode_cursor(create_date: datetime, object_id: ObjectId, direction: int) -> str:
+    """
+    将分页位置编码为不透明的游标
+    :param create_date: 当前页最后一条记录的创建时间
+    :param object_id: 当前页最后一条记录的 _id
+    :param direction: 排序方向 1: 升序, -1: 降序
+    :return: 游标字符串
+    """
+    payload = json.dumps({"d": create_date.isoformat(), "i": str(object_id), "s": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId, int]:
+    """
+    解码游标
+    :param cursor: 游标字符串
+    :return: (创建时间, _id, 排序方向)
+    :raises ValueError: 游标格式错误
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        direction = int(payload["s"])
+        if direction not in (1, -1):
+            raise ValueError(f"invalid direction: {direction}")
+        return datetime.fromisoformat(payload["d"]), ObjectId(payload["i"]), direction
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {e}") from e
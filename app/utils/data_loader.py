@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：data_loader.py
+@Author  ：晴天
+@Date    ：2025-04-22 10:17:35
+"""
+import asyncio
+from app.core.metrics import metrics
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class DataLoader(Generic[K, V]):
+    """
+    批量加载器
+
+    同一事件循环轮次内的 load 调用先放入队列，在下一轮通过 call_soon 合并为一次 batch_fn 调用，
+    重复的 key 只查询一次，结果按 key 缓存在加载器内。加载器应按请求创建，不在请求之间共享，避免读到过期数据。
+    多个调用方等待同一个 future，单个调用方被取消时通过 shield 隔离，不影响其它调用方；
+    批量查询失败或被取消时对应的 future 从缓存中移除，之后的 load 会重新查询。
+    """
+
+    def __init__(self, batch_fn: Callable[[List[K]], Awaitable[Dict[K, V]]], name: str = "loader",
+                 max_batch_size: int = 1000):
+        """
+        初始化
+        :param batch_fn: 批量查询函数，接收去重后的 key 列表，返回 key -> 值 的字典，缺失的 key 视为 None
+        :param name: 名称，用于指标
+        :param max_batch_size: 单次批量查询的最大 key 数量
+        """
+        self._batch_fn = batch_fn
+        self._name = name
+        self._max_batch_size = max_batch_size
+        self._futures: Dict[K, asyncio.Future] = {}
+        self._queue: List[K] = []
+        # 持有批量任务的引用，避免执行中被回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: K) -> Optional[V]:
+        """
+        加载单个 key
+        :param key: 键
+        :return: 值，不存在时返回 None
+        """
+        future = self._futures.get(key)
+        if future is None or future.cancelled():
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[K]) -> List[Optional[V]]:
+        """
+        加载多个 key，合并为一次批量查询
+        :param keys: 键列表
+        :return: 与 keys 顺序一致的值列表
+        """
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, key: K) -> None:
+        """
+        清除已缓存的 key，数据被修改后调用
+        :param key: 键
+        :return: None
+        """
+        future = self._futures.get(key)
+        if future is not None and future.done():
+            del self._futures[key]
+
+    def _dispatch(self) -> None:
+        """ 取出当前队列并按 max_batch_size 分批执行 """
+        queue, self._queue = self._queue, []
+        for i in range(0, len(queue), self._max_batch_size):
+            task = asyncio.ensure_future(self._run_batch(queue[i:i + self._max_batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, keys: List[K]) -> None:
+        """ 执行一次批量查询并设置各 key 的结果 """
+        metrics.inc(f"data_loader.{self._name}.batches")
+        metrics.observe(f"data_loader.{self._name}.batch_size", len(keys))
+        try:
+            results: Dict[K, Any] = await self._batch_fn(keys)
+            for key in keys:
+                future = self._futures.get(key)
+                if future is not None and not future.done():
+                    future.set_result(results.get(key))
+        except Exception as e:
+            for key in keys:
+                # 失败的 key 不缓存，之后可以重试
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        finally:
+            # 批量任务被取消时仍有未完成的 future，取消并移除，等待方不会永久挂起
+            for key in keys:
+                future = self._futures.get(key)
+                if future is not None and not future.done():
+                    future.cancel()
+                    del self._futures[key]
@@ -6,29 +6,231 @@
 @Author  ：晴天
 @Date    ：2025-04-07 18:10:15
 """
+import os
+import hmac
+import math
+import time
+import base64
 import bcrypt
+import asyncio
+import hashlib
+from app.core.logger import logger
+from app.core.config import config
+from app.core.metrics import metrics
+from typing import Any, Callable, Optional, Tuple
+from fastapi import HTTPException, status
+from app.enums.status_code import StatusCode
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 
 
-def encrypt_password(password):
+# 支持的哈希算法
+HASH_ALGORITHMS = ("bcrypt", "scrypt")
+# scrypt 固定参数，成本因子为 N 的以 2 为底的对数（ln）
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_SALT_SIZE = 16
+SCRYPT_KEY_SIZE = 32
+
+
+def _b64encode(data: bytes) -> str:
+    """ 无填充的 base64 编码 """
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(data: str) -> bytes:
+    """ 无填充的 base64 解码 """
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _scrypt(password: bytes, salt: bytes, ln: int, r: int, p: int) -> bytes:
+    """ 计算 scrypt 摘要 """
+    n = 1 << ln
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, dklen=SCRYPT_KEY_SIZE,
+                          maxmem=256 * r * (n + p + 2))
+
+
+def encrypt_password(password, algorithm: str = "bcrypt", cost: Optional[int] = None):
     """
-    对密码进行加密
+    对密码进行加密，算法与成本因子写入密文，便于后续校验和按策略升级
+    bcrypt 密文格式：$2b$<cost>$<salt+hash>
+    scrypt 密文格式：$scrypt$ln=<cost>,r=<r>,p=<p>$<salt>$<hash>
     :param password: 待加密的密码
+    :param algorithm: 哈希算法 bcrypt / scrypt，默认: bcrypt
+    :param cost: 成本因子，bcrypt 为 rounds，scrypt 为 ln；为空时使用库默认值
     :return: 密文
     """
     password = password.encode('utf-8')  # 将密码编码为字节
-    salt = bcrypt.gensalt()  # 生成一个随机的盐值
+    if algorithm == "scrypt":
+        ln = cost or 14
+        salt = os.urandom(SCRYPT_SALT_SIZE)
+        digest = _scrypt(password, salt, ln, SCRYPT_R, SCRYPT_P)
+        return f"$scrypt$ln={ln},r={SCRYPT_R},p={SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+    salt = bcrypt.gensalt(rounds=cost) if cost else bcrypt.gensalt()  # 生成一个随机的盐值
     hashed_password = bcrypt.hashpw(password, salt)  # 使用盐值对密码进行哈希计算
     return hashed_password.decode('utf-8')  # 将加密后的密码转换为字符串格式并返回
 
 
+def parse_password_hash(hashed_password: str) -> Tuple[str, int]:
+    """
+    解析密文使用的算法和成本因子
+    :param hashed_password: 密文密码
+    :return: (算法, 成本因子)
+    """
+    if hashed_password.startswith("$scrypt$"):
+        params = dict(item.split("=", 1) for item in hashed_password.split("$")[2].split(","))
+        return "scrypt", int(params["ln"])
+    # bcrypt: $2b$12$...
+    return "bcrypt", int(hashed_password.split("$")[2])
+
+
 def verify_password(password, hashed_password):
     """
-    验证密码是否匹配
+    验证密码是否匹配，按密文前缀选择算法
     :param password: 明文密码
     :param hashed_password: 密文密码
     :return: True/False
     """
     password = password.encode('utf-8')  # 将输入的密码编码为字节
+    if hashed_password.startswith("$scrypt$"):
+        _, _, params, salt, digest = hashed_password.split("$")
+        params = dict(item.split("=", 1) for item in params.split(","))
+        expected = _scrypt(password, _b64decode(salt), int(params["ln"]), int(params["r"]), int(params["p"]))
+        return hmac.compare_digest(expected, _b64decode(digest))
     hashed_password = hashed_password.encode('utf-8')  # 将加密后的密码编码为字节
     return bcrypt.checkpw(password, hashed_password)
 
+
+def benchmark_password_hash(algorithm: str, cost: int) -> float:
+    """
+    测量一次哈希的耗时，供启动时校准成本因子使用
+    :param algorithm: 哈希算法
+    :param cost: 成本因子
+    :return: 耗时（秒）
+    """
+    start = time.perf_counter()
+    encrypt_password("calibration-password", algorithm, cost)
+    return time.perf_counter() - start
+
+
+class PasswordHashPool:
+    """
+    密码哈希工作池
+
+    将 bcrypt 计算放到线程池或进程池中执行，避免阻塞事件循环。
+    通过信号量限制同时提交的任务数，排队超过 queue_timeout 秒直接返回服务繁忙。
+    """
+
+    def __init__(self, executor_type: str = config.PASSWORD_HASH_EXECUTOR,
+                 max_workers: int = config.PASSWORD_HASH_WORKERS,
+                 max_concurrency: int = config.PASSWORD_HASH_MAX_CONCURRENCY,
+                 queue_timeout: float = config.PASSWORD_HASH_QUEUE_TIMEOUT):
+        """ 初始化 """
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Invalid password hash executor: {executor_type}")
+        self._executor_type = executor_type
+        self._max_workers = max_workers
+        self._max_concurrency = max_concurrency
+        self._queue_timeout = queue_timeout
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+
+    def _get_executor(self) -> Executor:
+        """ 延迟创建执行器 """
+        if self._executor is None:
+            if self._executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                    thread_name_prefix="password-hash")
+        return self._executor
+
+    def _update_gauges(self) -> None:
+        """ 更新排队与执行中的任务数 """
+        metrics.set_gauge("password_hash.queue_depth", self._waiting)
+        metrics.set_gauge("password_hash.in_flight", self._in_flight)
+
+    async def run(self, func: Callable[..., Any], *args: Any, operation: str) -> Any:
+        """
+        在工作池中执行哈希函数
+        :param func: 待执行的函数，进程池模式下必须可被 pickle
+        :param args: 函数参数
+        :param operation: 操作名称，用于指标，如 hash / verify
+        :return: 函数返回值
+        :raises HTTPException: 排队超时，返回 503 并通过 Retry-After 提示重试时间
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._waiting += 1
+        self._update_gauges()
+        wait_start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self._queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("password_hash.rejected")
+            logger.warning(f"Password hash queue wait timeout, waiting: {self._waiting}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=StatusCode.SERVICE_UNAVAILABLE.get_message(),
+                headers={"Retry-After": str(max(1, math.ceil(self._queue_timeout)))},
+            )
+        finally:
+            self._waiting -= 1
+            self._update_gauges()
+        metrics.observe("password_hash.queue_wait_ms", (time.perf_counter() - wait_start) * 1000)
+
+        self._in_flight += 1
+        self._update_gauges()
+        start = time.perf_counter()
+
+        def release(future: asyncio.Future) -> None:
+            """ 工作池中的任务真正结束后才释放名额，调用方被取消时任务仍在执行，不能提前释放 """
+            if not future.cancelled():
+                # 调用方已取消时没有人读取结果，标记异常已处理
+                future.exception()
+            self._semaphore.release()
+            self._in_flight -= 1
+            self._update_gauges()
+            metrics.observe(f"password_hash.{operation}_latency_ms", (time.perf_counter() - start) * 1000)
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        except BaseException:
+            self._semaphore.release()
+            self._in_flight -= 1
+            self._update_gauges()
+            raise
+        future.add_done_callback(release)
+        # 调用方被取消（例如客户端断开）时不取消工作池中的任务，名额由 release 在任务结束时归还
+        return await asyncio.shield(future)
+
+    def shutdown(self) -> None:
+        """ 关闭执行器 """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hash_pool = PasswordHashPool()
+
+
+async def async_encrypt_password(password: str, algorithm: str = "bcrypt", cost: Optional[int] = None) -> str:
+    """
+    在工作池中对密码进行加密
+    :param password: 待加密的密码
+    :param algorithm: 哈希算法
+    :param cost: 成本因子
+    :return: 密文
+    """
+    return await password_hash_pool.run(encrypt_password, password, algorithm, cost, operation="hash")
+
+
+async def async_verify_password(password: str, hashed_password: str) -> bool:
+    """
+    在工作池中验证密码是否匹配
+    :param password: 明文密码
+    :param hashed_password: 密文密码
+    :return: True/False
+    """
+    return await password_hash_pool.run(verify_password, password, hashed_password, operation="verify")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：single_flight.py
+@Author  ：晴天
+@Date    ：2025-04-20 10:08:51
+"""
+import asyncio
+from app.core.metrics import metrics
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    并发请求合并
+
+    相同 key 的并发调用只执行一次，其余调用等待并共享同一个结果或异常，调用结束后立即移除，不缓存结果。
+    实际执行放在独立的 Task 中，发起者的请求被取消不会影响其它等待者。
+    进行中的 key 数量达到 max_keys 时新的调用不再合并、直接执行，内存占用有上限。
+    仅在单个事件循环内使用。
+    """
+
+    def __init__(self, name: str, max_keys: int = 10000):
+        """
+        初始化
+        :param name: 名称，用于指标
+        :param max_keys: 最多同时进行的 key 数量
+        """
+        self._name = name
+        self._max_keys = max_keys
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0
+        self.shared = 0
+        self.bypassed = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        """ 执行结束后移除 key，并取走异常避免无人等待时产生警告 """
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行或加入相同 key 的进行中调用
+        :param key: 合并的键，应包含操作和主体，例如 ("refresh", user_id, token_digest)
+        :param func: 无参协程函数
+        :return: func 的返回值，多个调用者共享同一个对象，不应修改
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            metrics.inc(f"single_flight.{self._name}.shared")
+            return await asyncio.shield(task)
+        if len(self._calls) >= self._max_keys:
+            self.bypassed += 1
+            metrics.inc(f"single_flight.{self._name}.bypassed")
+            return await func()
+        task = asyncio.ensure_future(func())
+        self._calls[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        self.executed += 1
+        metrics.inc(f"single_flight.{self._name}.executed")
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取统计信息
+        :return: 执行、合并、绕过次数与合并率
+        """
+        total = self.executed + self.shared + self.bypassed
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "shared": self.shared,
+            "bypassed": self.bypassed,
+            "coalesce_rate": round(self.shared / total, 4) if total else 0.0,
+        }
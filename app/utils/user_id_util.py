@@ -1,45 +1,195 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 """
-@Project ：FAstAPI-Template 
+@Project ：FAstAPI-Template
 @File    ：user_id_util.py
 @Author  ：晴天
 @Date    ：2025-04-07 17:28:59
 """
+import os
 import time
-import random
-import socket
-import hashlib
+import asyncio
+import threading
+from typing import IO, Awaitable, Callable, Optional
+from app.core.logger import logger
+from app.core.config import config
+from app.enums.status_code import StatusCode
+from app.exceptions.custom import ServiceException
+from app.repositories.backend import create_id_block_repo
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
+# 用户ID（Snowflake）：41 位毫秒时间戳 | 10 位工作进程ID | 12 位序列号
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+# 展示ID：10 位十进制数字 = DISPLAY_ID_MIN + 全局序号，序号按号段从数据库预留
+DISPLAY_ID_MIN = 10 ** 9
+DISPLAY_ID_MAX = 10 ** 10
+DISPLAY_ID_BLOCK = "display_id"
 
-def get_server_id():
-    # 可以返回服务器的唯一标识符，例如主机名的一部分
-    return str(socket.gethostname()).encode('utf-8')
+# 用户ID在同一毫秒序列号用尽时最多预支的毫秒数
+USER_ID_MAX_BORROW_MS = 1000
+# 展示ID每次向数据库预留的序号数
+DISPLAY_ID_BLOCK_SIZE = 1000
 
 
-def generate_id() -> str:
+class WorkerLock:
     """
-    生成用户ID
-    :return: 返回用户ID
+    工作进程ID锁
+
+    在 ID_WORKER_LOCK_DIR 下为每个工作进程ID维护 worker-<id>.lock，对其加独占文件锁表示该ID已被占用，
+    锁在进程退出时由操作系统释放。文件锁只能区分同一主机上的进程，多主机部署需要为每台主机配置不同的
+    ID_WORKER_BASE 或 ID_WORKER_ID；无法确认只有一台主机时拒绝启动，而不是让各主机从 0 开始占用相同的ID。
+    """
+
+    def __init__(self, worker_id: int, f: IO):
+        """ 初始化 """
+        self.worker_id = worker_id
+        self._file = f
+
+    @classmethod
+    def claim(cls) -> "WorkerLock":
+        """
+        获取一个空闲的工作进程ID
+        配置了 ID_WORKER_ID 时只使用该ID；否则依次尝试 ID_WORKER_BASE 开始的 ID_WORKER_SLOTS 个ID，
+        只有声明 ID_SINGLE_HOST 时才默认从 0 开始；没有 fcntl 时无法加锁，必须为每个进程配置 ID_WORKER_ID
+        :return: WorkerLock
+        """
+        if config.ID_WORKER_ID is not None:
+            candidates = [config.ID_WORKER_ID]
+        elif fcntl is None:
+            raise RuntimeError("fcntl is unavailable, id workers cannot be locked, set ID_WORKER_ID for each process")
+        elif config.ID_WORKER_BASE is not None:
+            candidates = [config.ID_WORKER_BASE + slot for slot in range(config.ID_WORKER_SLOTS)]
+        elif config.ID_SINGLE_HOST:
+            candidates = list(range(config.ID_WORKER_SLOTS))
+        else:
+            raise RuntimeError("Neither ID_WORKER_BASE nor ID_WORKER_ID is set, hosts would claim the same id workers; "
+                               "set a distinct ID_WORKER_BASE per host, or ID_SINGLE_HOST=true for a single host")
+        os.makedirs(config.ID_WORKER_LOCK_DIR, exist_ok=True)
+        for worker_id in candidates:
+            fd = os.open(os.path.join(config.ID_WORKER_LOCK_DIR, f"worker-{worker_id}.lock"), os.O_RDWR | os.O_CREAT)
+            f = os.fdopen(fd, "r+")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    continue
+            return cls(worker_id, f)
+        raise RuntimeError(f"No free id worker in {candidates}, check ID_WORKER_ID / ID_WORKER_SLOTS")
+
+
+class IdGenerator:
+    """
+    ID生成器
+
+    用户ID为 Snowflake 结构，按时间递增，不需要任何协调；同一毫秒内序列号用尽时预支下一毫秒，时钟回拨时沿用上次的时间戳，
+    预支最多 USER_ID_MAX_BORROW_MS，进程启动时从 当前时间 + USER_ID_MAX_BORROW_MS 开始，跳过上一个进程可能预支的区间。
+    展示ID保持 10 位数字，由全局序号组成：每个进程一次向数据库原子地预留 DISPLAY_ID_BLOCK_SIZE 个序号，
+    之后在内存中连续发号，每个号段只有一次数据库往返；唯一性只依赖数据库中的号段记录，不依赖本地文件，
+    进程重启、换主机或工作进程ID重复都不会重复发号，重启时未用完的号段直接放弃。
     """
-    # 获取当前时间的微秒时间戳
-    timestamp = int(time.time() * 1_000_000)  # 转为微秒
-    # 生成随机数字，增加到8位
-    random_digits = random.randint(10000000, 99999999)
 
-    # 拼接时间戳、随机数和服务器标识符信息
-    server_id = get_server_id()
-    unique_string = f"{timestamp}{random_digits}{server_id}"
+    def __init__(self, lock: WorkerLock, reserve: Callable[[str, int], Awaitable[int]],
+                 epoch_ms: int = config.ID_EPOCH_MS):
+        """
+        初始化
+        :param lock: 工作进程ID锁
+        :param reserve: 号段预留函数，参数为号段名称与数量，返回起始序号
+        :param epoch_ms: 起始时间（毫秒）
+        """
+        if not 0 <= lock.worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Invalid id worker: {lock.worker_id}, must be in [0, {MAX_WORKER_ID}]")
+        self.worker_id = lock.worker_id
+        self.pid = os.getpid()
+        self._worker_lock = lock
+        self._reserve = reserve
+        self._epoch_ms = epoch_ms
+        self._lock = threading.Lock()
+        self._last_ms = self._now_ms() + USER_ID_MAX_BORROW_MS
+        self._sequence = -1
+        self._display_next = 0
+        self._display_end = 0
+        self._display_reserving: Optional[asyncio.Lock] = None
 
-    # 计算SHA256哈希并转为数字
-    hash_object = hashlib.sha256(unique_string.encode())
-    hash_hex = hash_object.hexdigest()
+    def _now_ms(self) -> int:
+        """ 距起始时间的毫秒数 """
+        return int(time.time() * 1000) - self._epoch_ms
 
-    # 截取前10位作为用户ID
-    user_id = int(hash_hex, 16) % 10 ** 10  # 取模确保ID为10位数字
+    def next_user_id(self) -> int:
+        """
+        生成用户ID
+        :return: 64 位整数
+        """
+        with self._lock:
+            now_ms = self._now_ms()
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            elif self._sequence < SEQUENCE_MASK:
+                self._sequence += 1
+            elif self._last_ms - now_ms < USER_ID_MAX_BORROW_MS:
+                self._last_ms, self._sequence = self._last_ms + 1, 0
+            else:
+                logger.warning("Id generator borrowed too far ahead of the clock")
+                raise ServiceException(code=StatusCode.SERVICE_UNAVAILABLE.get_code(),
+                                       message=StatusCode.SERVICE_UNAVAILABLE.get_message())
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
 
-    return str(user_id)
+    def _take_display_unit(self) -> Optional[int]:
+        """ 从当前号段取一个序号，号段用尽时返回 None """
+        with self._lock:
+            if self._display_next >= self._display_end:
+                return None
+            unit = self._display_next
+            self._display_next += 1
+            return unit
+
+    async def next_display_id(self) -> int:
+        """
+        生成展示ID，当前号段用尽时向数据库预留新的号段，同一进程内并发的请求只预留一次
+        :return: 10 位整数
+        """
+        unit = self._take_display_unit()
+        while unit is None:
+            if self._display_reserving is None:
+                self._display_reserving = asyncio.Lock()
+            async with self._display_reserving:
+                unit = self._take_display_unit()
+                if unit is None:
+                    start = await self._reserve(DISPLAY_ID_BLOCK, DISPLAY_ID_BLOCK_SIZE)
+                    with self._lock:
+                        self._display_next, self._display_end = start, start + DISPLAY_ID_BLOCK_SIZE
+                    unit = self._take_display_unit()
+        display_id = DISPLAY_ID_MIN + unit
+        if display_id >= DISPLAY_ID_MAX:
+            logger.error("Display id space exhausted, a longer format is required")
+            raise ServiceException(code=StatusCode.SYSTEM_ERROR.get_code(),
+                                   message=StatusCode.SYSTEM_ERROR.get_message())
+        return display_id
+
+
+_generator: Optional[IdGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def get_id_generator() -> IdGenerator:
+    """
+    获取当前进程的ID生成器，首次使用时创建；fork 出的子进程重新获取工作进程ID
+    :return: IdGenerator
+    """
+    global _generator
+    if _generator is None or _generator.pid != os.getpid():
+        with _generator_lock:
+            if _generator is None or _generator.pid != os.getpid():
+                _generator = IdGenerator(WorkerLock.claim(), create_id_block_repo().reserve)
+                logger.info(f"Id generator initialized, worker id: {_generator.worker_id}")
+    return _generator
 
 
 def generate_user_id() -> str:
@@ -47,18 +197,17 @@ def generate_user_id() -> str:
     生成用户ID
     :return: 返回用户ID
     """
-    return generate_id()
+    return str(get_id_generator().next_user_id())
 
 
-def generate_display_id() -> str:
+async def generate_display_id() -> str:
     """
-    生成用户ID
-    :return: 返回用户ID
+    生成用户展示ID
+    :return: 返回用户展示ID
     """
-    return generate_id()
+    return str(await get_id_generator().next_display_id())
 
 
 if __name__ == '__main__':
     pass
-    # print('host_id: ', get_server_id().decode('utf-8'))
-    # print('user_id: ', generate_user_id())
\ No newline at end of file
+    # print('user_id: ', generate_user_id())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：read_routing_check.py
+@Author  ：晴天
+@Date    ：2025-04-23 14:12:40
+"""
+import sys
+import asyncio
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from beanie import init_beanie
+from app.core.config import config
+from app.models.user_model import User
+from pymongo.write_concern import WriteConcern
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.repositories.user_repo import UserRepository
+from app.database.read_routing import read_router, read_route_listener
+
+# 校验 UserRepository 的读路由：逐个调用读方法，根据 ReadRouteListener 记录的节点地址判断实际由主节点还是从节点执行，
+# 与 DB_READ_ROUTES 配置的读偏好比对，不一致时以非零状态退出。数据写入独立的 <DB_NAME>_routing 库，结束后删除。
+#
+# 本地副本集（三个节点，无认证）：
+#   mkdir -p /tmp/rs0-0 /tmp/rs0-1 /tmp/rs0-2
+#   mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-0 --bind_ip localhost --fork --logpath /tmp/rs0-0.log
+#   mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-1 --bind_ip localhost --fork --logpath /tmp/rs0-1.log
+#   mongod --replSet rs0 --port 27019 --dbpath /tmp/rs0-2 --bind_ip localhost --fork --logpath /tmp/rs0-2.log
+#   mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [{_id: 0, host: "localhost:27017"},
+#       {_id: 1, host: "localhost:27018"}, {_id: 2, host: "localhost:27019"}]})'
+# 运行：python benchmarks/read_routing_check.py "mongodb://localhost:27017,localhost:27018/?replicaSet=rs0"
+# 不传连接串时使用 DB_URI（配置 DB_REPLICA_SET 后带 replicaSet 参数）。
+# 单节点部署下 secondaryPreferred 会回落到主节点，校验结果为 fallback 而不是失败。
+
+USER_ID = "1234567890123456789"
+DISPLAY_ID = "1234567890"
+EMAIL = "routing@example.com"
+SEED_DOC = {
+    "_id": ObjectId(), "email": EMAIL, "user_id": USER_ID, "display_id": DISPLAY_ID, "nickname": "routing",
+    "password": "$2b$12$" + "a" * 53, "role_id": "user", "is_active": True, "is_deleted": False,
+    "create_time": 1745000000000, "create_date": datetime(2025, 4, 23, 14, 12, 40), "token_version": 0,
+}
+
+CASES = {
+    "get_user_by_email": lambda: UserRepository.get_user_by_email(EMAIL),
+    "get_users_by_emails": lambda: UserRepository.get_users_by_emails([EMAIL]),
+    "get_user_by_id": lambda: UserRepository.get_user_by_id(USER_ID),
+    "get_user_by_display_id": lambda: UserRepository.get_user_by_display_id(DISPLAY_ID),
+    "get_users_by_ids": lambda: UserRepository.get_users_by_ids([USER_ID]),
+    "get_users_by_display_ids": lambda: UserRepository.get_users_by_display_ids([DISPLAY_ID]),
+    "user_pagination_list": lambda: UserRepository.user_pagination_list(with_total=False),
+    "user_cursor_list": lambda: UserRepository.user_cursor_list(),
+}
+
+
+async def served_by(client: AsyncIOMotorClient, case) -> set:
+    """ 执行一次读操作，返回执行读命令的节点类型 """
+    before = read_route_listener.stats()
+    await case()
+    after = read_route_listener.stats()
+    addresses = [address for address, count in after.items() if count > before.get(address, 0)]
+    servers = {f"{sd.address[0]}:{sd.address[1]}": sd.server_type_name
+               for sd in client.topology_description.server_descriptions().values()}
+    return {servers.get(address, "Unknown") for address in addresses}
+
+
+async def main(uri: str) -> int:
+    client = AsyncIOMotorClient(uri, event_listeners=[read_route_listener])
+    database = client[f"{config.DB_NAME}_routing"]
+    failures = 0
+    try:
+        await init_beanie(database=database, document_models=[User])
+        # 多数节点确认后再读，保证从节点上已有数据
+        collection = User.get_motor_collection().with_options(write_concern=WriteConcern(w="majority"))
+        await collection.insert_one(dict(SEED_DOC))
+        has_secondary = any(sd.server_type_name == "RSSecondary"
+                            for sd in client.topology_description.server_descriptions().values())
+        print(f"topology: {client.topology_description.topology_type_name}, secondaries: {has_secondary}")
+        for name, case in CASES.items():
+            mode = read_router.mode(f"UserRepository.{name}")
+            server_types = await served_by(client, case)
+            if mode == "primary":
+                result = "ok" if server_types <= {"RSPrimary", "Standalone", "Mongos"} else "FAIL"
+            elif not has_secondary:
+                result = "fallback"
+            elif mode in ("secondary", "secondaryPreferred"):
+                result = "ok" if server_types == {"RSSecondary"} else "FAIL"
+            else:
+                result = "ok"
+            failures += result == "FAIL"
+            print(f"  {name:<28}{mode:<22}{','.join(sorted(server_types)):<16}{result}")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else config.DB_URI)))
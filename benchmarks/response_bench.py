@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：response_bench.py
+@Author  ：晴天
+@Date    ：2025-04-25 14:36:18
+"""
+import os
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# 使用内存存储，只测 HTTP 层，不连接数据库
+os.environ.setdefault("REPOSITORY_BACKEND", "memory")
+os.environ.setdefault("PASSWORD_HASH_COST", "10")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from fastapi import Depends
+from main import app
+from app.schemas.response import Response
+from app.schemas.security import DecodeTokenData
+from app.services.user_service import UserService
+from app.api.dependencies import get_current_user, get_user_service
+
+# 对比 /api/user/get-info 两种响应方式的每秒请求数（进程内 ASGI 调用，不含网络，包含全部中间件）：
+#   legacy: 返回 Response 模型，FastAPI 按 response_model 校验、jsonable_encoder 转换后用标准库 json 序列化
+#   api_response: 返回 ApiResponse，orjson 直接序列化，跳过 response_model 处理（当前实现）
+# 运行：python benchmarks/response_bench.py [请求数]
+
+
+@app.get('/api/bench/legacy-get-info', response_model=Response, response_model_exclude_none=True)
+async def legacy_get_info(current_user: DecodeTokenData = Depends(get_current_user),
+                          user_service: UserService = Depends(get_user_service)):
+    """ 改动前的 get-info 写法 """
+    result = await user_service.get_user_info(user_id=current_user.user_id)
+    return Response(data=result)
+
+
+async def run(client: httpx.AsyncClient, path: str, headers: dict, number: int) -> float:
+    """ 顺序发送请求，返回每秒请求数 """
+    for _ in range(100):
+        await client.get(path, headers=headers)  # 预热
+    start = time.perf_counter()
+    for _ in range(number):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+    return number / (time.perf_counter() - start)
+
+
+async def main(number: int) -> None:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            user = {"email": "bench@example.com", "password": "Passw0rd!", "nickname": "bench",
+                    "head_file_url": "https://example.com/avatar.png", "gender": 1, "birthday": "2000-01-01"}
+            await client.post("/api/auth/register", json=user)
+            login = await client.post("/api/auth/login", json={"email": user["email"], "password": user["password"]})
+            headers = {"Authorization": f"Bearer {login.json()['data']['access_token']}"}
+            legacy = await client.get("/api/bench/legacy-get-info", headers=headers)
+            current = await client.get("/api/user/get-info", headers=headers)
+            # 除生成时间外两种方式的响应体相同
+            assert {**legacy.json(), "timestamp": None} == {**current.json(), "timestamp": None}
+
+            results = {
+                "legacy": await run(client, "/api/bench/legacy-get-info", headers, number),
+                "api_response": await run(client, "/api/user/get-info", headers, number),
+            }
+    print(f"GET /api/user/get-info x {number}")
+    for name, rps in results.items():
+        print(f"  {name:<14}{rps:>10.0f} req/s{rps / results['legacy']:>8.2f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
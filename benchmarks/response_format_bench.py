@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：response_format_bench.py
+@Author  ：晴天
+@Date    ：2025-04-25 18:05:27
+"""
+import sys
+import timeit
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+import msgpack
+from bson import ObjectId
+from typing import Any, Dict
+from app.models.user_model import User
+from app.schemas.response import ApiResponse
+from app.schemas.pagination import PaginationResult
+from app.core.content_negotiation import JSON, MSGPACK
+
+# 对比同一响应信封两种格式的体积与编解码耗时，不需要数据库：
+#   info: /api/user/get-info 的单个用户
+#   list: /api/user/get-user-list 的一页用户（含分页字段）
+# encode 为 ApiResponse 构造（含信封与序列化），decode 为客户端解析响应体
+# 运行：python benchmarks/response_format_bench.py [每页数量...]
+
+
+def make_doc(i: int) -> Dict[str, Any]:
+    """ 生成一条原始用户文档 """
+    created = datetime(2025, 4, 20, 16, 24, 3) + timedelta(seconds=i)
+    return {
+        "_id": ObjectId(), "email": f"bench{i}@example.com", "user_id": str(10 ** 18 + i), "display_id": str(i),
+        "nickname": "bench", "head_file_url": "https://example.com/avatar.png", "gender": 1, "birthday": "2000-01-01",
+        "create_ip": "127.0.0.1", "role_id": "user", "is_active": True, "is_deleted": False, "delete_date": None,
+        "create_time": 1745000000000 + i, "create_date": created, "create_by": "system", "last_modify_by": "system",
+        "last_modify_time": 1745000000000 + i, "last_modify_date": created, "token_version": 0,
+    }
+
+
+def main(page_sizes: list[int]) -> None:
+    decoders = {JSON: orjson.loads, MSGPACK: msgpack.unpackb}
+    payloads = {"info": User.serialize_raw(make_doc(0))}
+    for size in page_sizes:
+        payloads[f"list {size}"] = PaginationResult(
+            list=User.serialize_many([make_doc(i) for i in range(size)]), total=100000, total_estimated=False,
+            page=1, page_size=size, next_cursor="a" * 40,
+        ).model_dump()
+
+    for name, data in payloads.items():
+        bodies = {fmt: ApiResponse(data=data, response_format=fmt).body for fmt in decoders}
+        # 除生成时间外两种格式解析后的内容相同
+        assert ({**decoders[JSON](bodies[JSON]), "timestamp": None}
+                == {**decoders[MSGPACK](bodies[MSGPACK]), "timestamp": None})
+        number = max(10, 2000000 // len(bodies[JSON]))
+        print(f"{name} x {number}")
+        for fmt, decode in decoders.items():
+            encode_us = min(timeit.repeat(lambda: ApiResponse(data=data, response_format=fmt),
+                                          number=number, repeat=5)) / number * 1e6
+            decode_us = min(timeit.repeat(lambda: decode(bodies[fmt]), number=number, repeat=5)) / number * 1e6
+            size = len(bodies[fmt])
+            print(f"  {fmt:<8}{size:>10} B{size / len(bodies[JSON]):>7.2f}x"
+                  f"{encode_us:>12.1f} us encode{decode_us:>12.1f} us decode")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100])
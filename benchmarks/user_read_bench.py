@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：user_read_bench.py
+@Author  ：晴天
+@Date    ：2025-04-20 16:24:03
+"""
+import sys
+import time
+import timeit
+import asyncio
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from beanie import init_beanie
+from app.core.config import config
+from app.models.user_model import User
+from motor.motor_asyncio import AsyncIOMotorClient
+from beanie.odm.utils.parsing import parse_obj
+from app.repositories.user_repo import UserRepository
+
+# 对比 UserRepository 的三种读取路径，使用 DB_URI 指向的 MongoDB，数据写入独立的 <DB_NAME>_bench 库，结束后删除：
+#   beanie: User.find_one 解析完整文档（pydantic 校验 + 保存状态快照）后 model_serialize
+#   raw_full: motor 读取全部公开字段后 serialize_raw
+#   raw_projection: 只投影登录所需的 user_id / password 后 serialize_raw
+# 先测解码部分的 CPU 开销（不含网络），再测包含往返的端到端耗时
+# 运行：python benchmarks/user_read_bench.py [次数]
+
+USER_ID = "1234567890123456789"
+FULL_DOC = {
+    "_id": ObjectId(), "email": "bench@example.com", "user_id": USER_ID, "display_id": "1234567890",
+    "nickname": "bench", "head_file_url": "https://example.com/avatar.png", "gender": 1, "birthday": "2000-01-01",
+    "password": "$2b$12$" + "a" * 53, "create_ip": "127.0.0.1", "role_id": "user", "is_active": True,
+    "is_deleted": False, "create_time": 1745000000000, "create_date": datetime(2025, 4, 20, 16, 24, 3),
+    "create_by": "system", "last_modify_by": "system", "last_modify_time": 1745000000000,
+    "last_modify_date": datetime(2025, 4, 20, 16, 24, 3), "token_version": 0,
+}
+LOGIN_FIELDS = ["user_id", "password"]
+
+
+def report(title: str, results: dict) -> None:
+    """ 打印每次操作耗时及相对 beanie 路径的倍数 """
+    print(title)
+    baseline = results["beanie"]
+    for name, per_call in results.items():
+        print(f"  {name:<16}{per_call:>10.2f} us/op{baseline / per_call:>8.1f}x")
+
+
+def bench_decode(number: int) -> dict:
+    """ 只测解码 """
+    full_projection = User.projection()
+    login_projection = User.projection(LOGIN_FIELDS)
+    cases = {
+        "beanie": lambda: parse_obj(User, dict(FULL_DOC)).model_serialize(),
+        "raw_full": lambda: User.serialize_raw({k: v for k, v in FULL_DOC.items() if full_projection.get(k)}),
+        "raw_projection": lambda: User.serialize_raw({k: v for k, v in FULL_DOC.items() if login_projection.get(k)}),
+    }
+    return {name: min(timeit.repeat(case, number=number, repeat=5)) / number * 1e6 for name, case in cases.items()}
+
+
+async def bench_round_trip(number: int) -> dict:
+    """ 包含网络往返 """
+    async def beanie_read():
+        user = await User.find_one(User.user_id == USER_ID, User.is_deleted == False)
+        return user.model_serialize()
+
+    cases = {
+        "beanie": beanie_read,
+        "raw_full": lambda: UserRepository.get_user_by_id(USER_ID),
+        "raw_projection": lambda: UserRepository.get_user_by_id(USER_ID, fields=LOGIN_FIELDS),
+    }
+    results = {}
+    for name, case in cases.items():
+        await case()  # 预热连接
+        start = time.perf_counter()
+        for _ in range(number):
+            await case()
+        results[name] = (time.perf_counter() - start) / number * 1e6
+    return results
+
+
+async def main(number: int) -> None:
+    client = AsyncIOMotorClient(config.DB_URI)
+    database = client[f"{config.DB_NAME}_bench"]
+    try:
+        await init_beanie(database=database, document_models=[User])
+        await User.get_motor_collection().insert_one(dict(FULL_DOC))
+        report("decode only", bench_decode(number))
+        report("round trip", await bench_round_trip(max(1, number // 10)))
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
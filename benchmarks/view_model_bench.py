@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+"""
+@Project ：FAstAPI-Template
+@File    ：view_model_bench.py
+@Author  ：晴天
+@Date    ：2025-04-25 16:02:51
+"""
+import sys
+import time
+import asyncio
+import tracemalloc
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bson import ObjectId
+from beanie import init_beanie
+from typing import Any, Awaitable, Callable, Dict, List
+from app.core.config import config
+from app.models.user_model import User
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# 对比大页读取的内存与耗时，使用 DB_URI 指向的 MongoDB，数据写入独立的 <DB_NAME>_bench 库，结束后删除：
+#   beanie: User.find().to_list()，每个文档保存状态快照（use_state_management）
+#   readonly: User.find_readonly()，按模型校验为只读视图，没有状态快照
+#   raw: motor 读取后 serialize_many，不做校验（仓储层列表读取的路径）
+# retained 为结果仍被引用时的内存增量，peak 为读取过程中的峰值
+# 运行：python benchmarks/view_model_bench.py [页大小...]
+
+
+def make_doc(i: int) -> Dict[str, Any]:
+    """ 生成一条原始用户文档 """
+    created = datetime(2025, 4, 20, 16, 24, 3) + timedelta(seconds=i)
+    return {
+        "_id": ObjectId(), "email": f"bench{i}@example.com", "user_id": str(10 ** 18 + i), "display_id": str(i),
+        "nickname": "bench", "head_file_url": "https://example.com/avatar.png", "gender": 1, "birthday": "2000-01-01",
+        "password": "$2b$12$" + "a" * 53, "create_ip": "127.0.0.1", "role_id": "user", "is_active": True,
+        "is_deleted": False, "delete_date": None, "create_time": 1745000000000 + i, "create_date": created,
+        "create_by": "system", "last_modify_by": "system", "last_modify_time": 1745000000000 + i,
+        "last_modify_date": created, "token_version": 0,
+    }
+
+
+async def measure(load: Callable[[], Awaitable[List[Any]]]) -> Dict[str, float]:
+    """ 读取一页并记录耗时与内存 """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = await load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert result
+    return {"ms": elapsed * 1e3, "retained_mb": (current - before) / 2 ** 20, "peak_mb": (peak - before) / 2 ** 20}
+
+
+async def main(page_sizes: List[int]) -> None:
+    client = AsyncIOMotorClient(config.DB_URI)
+    database = client[f"{config.DB_NAME}_bench"]
+    try:
+        await init_beanie(database=database, document_models=[User])
+        await User.get_motor_collection().insert_many([make_doc(i) for i in range(max(page_sizes))])
+        query = {"is_deleted": False}
+        for size in page_sizes:
+            async def raw() -> List[Dict[str, Any]]:
+                cursor = User.get_motor_collection().find(query, projection=User.projection(), limit=size)
+                return User.serialize_many(await cursor.to_list(length=size))
+
+            cases = {
+                "beanie": lambda: User.find(query).limit(size).to_list(),
+                "readonly": lambda: User.find_readonly(query, limit=size),
+                "raw": raw,
+            }
+            print(f"page size {size}")
+            for name, load in cases.items():
+                await load()  # 预热
+                result = await measure(load)
+                print(f"  {name:<10}{result['ms']:>10.1f} ms{result['retained_mb']:>10.2f} MB retained"
+                      f"{result['peak_mb']:>10.2f} MB peak")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1000, 10000]))